@@ -0,0 +1,12 @@
+# accounts/context_processors.py
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import get_notification_counts
+
+
+def notifications(request):
+    """
+    notification_counts for the nav badges. Lazy, so pages that never show
+    it cost nothing, and cached on the request, so it is one query at most.
+    """
+    return {'notification_counts': SimpleLazyObject(lambda: get_notification_counts(request))}
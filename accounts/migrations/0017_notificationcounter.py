@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    NotificationCounter = apps.get_model('accounts', 'NotificationCounter')
+    Message = apps.get_model('jobs', 'Message')
+    CandidateMatch = apps.get_model('accounts', 'CandidateMatch')
+
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in User.objects.values_list('id', flat=True)]
+    )
+
+    unread_counts = (
+        Message.objects.filter(recipient=OuterRef('user'), is_read=False)
+        .order_by().values('recipient').annotate(total=Count('pk')).values('total')
+    )
+    unseen_counts = (
+        CandidateMatch.objects.filter(search__recruiter=OuterRef('user'), seen=False)
+        .order_by().values('search__recruiter').annotate(total=Count('pk')).values('total')
+    )
+    NotificationCounter.objects.update(
+        unread_messages=Coalesce(Subquery(unread_counts), 0),
+        unseen_matches=Coalesce(Subquery(unseen_counts), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_alter_candidatematch_search'),
+        ('jobs', '0013_emailoutbox_lock_token'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_messages', models.PositiveIntegerField(default=0)),
+                ('unseen_matches', models.PositiveIntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_counter', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
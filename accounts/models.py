@@ -2,7 +2,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db.models.signals import post_save  # ADD THIS IMPORT
+from django.db.models.signals import post_delete, post_save  # ADD THIS IMPORT
 from django.dispatch import receiver  # ADD THIS IMPORT
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut
@@ -161,3 +161,38 @@ class CandidateMatch(models.Model):
 
     def __str__(self):
         return f"Match for {self.search.id} - {self.candidate.username}"
+
+
+class NotificationCounter(models.Model):
+    """
+    Per-user badge counts, kept up to date as messages and matches are
+    created, read and seen, so pages can show them without COUNT queries.
+    Kept off UserProfile so saving a stale profile cannot overwrite them.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_counter')
+    unread_messages = models.PositiveIntegerField(default=0)
+    unseen_matches = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Notifications for {self.user.username}"
+
+
+@receiver(post_save, sender=User)
+def create_notification_counter(sender, instance, created, **kwargs):
+    if created:
+        NotificationCounter.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=CandidateMatch)
+def count_new_match(sender, instance, created, **kwargs):
+    """Count a new unseen match for the recruiter who saved the search"""
+    if created and not instance.seen:
+        from .notifications import change_count
+        change_count('unseen_matches', 1, user__saved_searches=instance.search_id)
+
+
+@receiver(post_delete, sender=CandidateMatch)
+def uncount_deleted_match(sender, instance, **kwargs):
+    if not instance.seen:
+        from .notifications import change_count
+        change_count('unseen_matches', -1, user__saved_searches=instance.search_id)
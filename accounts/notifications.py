@@ -0,0 +1,60 @@
+# accounts/notifications.py
+from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+
+from .models import NotificationCounter
+
+COUNT_FIELDS = ('unread_messages', 'unseen_matches')
+EMPTY_COUNTS = {field: 0 for field in COUNT_FIELDS}
+
+
+def change_count(field, delta, **lookup):
+    """
+    Add delta to one counter field for the users matching lookup
+    (e.g. user_id=3) in one UPDATE, never going below zero
+    """
+    if delta:
+        NotificationCounter.objects.filter(**lookup).update(
+            **{field: Greatest(F(field) + Value(delta), Value(0))}
+        )
+
+
+def change_counts(field, deltas):
+    """
+    Apply {user_id: change} to one counter field in one UPDATE
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    NotificationCounter.objects.filter(user_id__in=deltas).update(**{
+        field: Greatest(
+            Case(
+                *[
+                    When(user_id=user_id, then=F(field) + Value(delta))
+                    for user_id, delta in deltas.items()
+                ],
+                default=F(field),
+                output_field=models.IntegerField(),
+            ),
+            Value(0),
+        )
+    })
+
+
+def get_notification_counts(request):
+    """
+    The signed-in user's badge counts, read once per request and cached on it.
+    Anonymous users and users without a counter row get zeros.
+    Returns: {'unread_messages': n, 'unseen_matches': n}
+    """
+    if not hasattr(request, '_notification_counts'):
+        counts = None
+        if request.user.is_authenticated:
+            counts = (
+                NotificationCounter.objects.filter(user=request.user)
+                .values(*COUNT_FIELDS).first()
+            )
+        request._notification_counts = counts or dict(EMPTY_COUNTS)
+    return request._notification_counts
+
@@ -1,3 +1,6 @@
+import copy
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from .forms import CustomUserCreationForm, CustomErrorList, SimpleProfileForm, JobSeekerProfileForm, RecruiterProfileForm, RecruiterEmailForm
 from django.contrib.auth import login as auth_login, authenticate
@@ -8,10 +11,12 @@ from django.contrib.auth.models import User
 from django.contrib import messages
 from .models import UserProfile
 from jobs.models import Application
+from jobs.mail_pool import get_smtp_pool
 from jobs.utils import test_email_connection
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from .models import SavedCandidateSearch, CandidateMatch
+from .notifications import change_count
 
 
 def login(request):
@@ -166,17 +171,19 @@ def save_profile(request):
 
 @login_required
 def user_applications(request):
-    applications = Application.objects.filter(applicant=request.user)
+    applications = Application.objects.filter(applicant=request.user).with_candidate()
     context = {"applications": applications}
     return render(request, "accounts/applications.html", context)
 
 
 # NEW: Email setup view for recruiters
 @login_required
-def setup_recruiter_email(request):
+async def setup_recruiter_email(request):
+    # Async so the SMTP connection test does not hold a worker thread
     # Use the regular UserProfile, not a separate RecruiterProfile
+    user = await request.auser()
     try:
-        profile = request.user.profile
+        profile = await UserProfile.objects.aget(user=user)
         # Check if user is actually a recruiter
         if profile.user_type != 'recruiter':
             messages.error(request, "This feature is only available for recruiters.")
@@ -188,8 +195,10 @@ def setup_recruiter_email(request):
 
     if request.method == 'POST':
         # Use RecruiterEmailForm (the one you imported) instead of RecruiterEmailSetupForm
+        # Validation writes the new settings onto profile; keep the old ones
+        previous_settings = copy.copy(profile)
         form = RecruiterEmailForm(request.POST, instance=profile)
-        if form.is_valid():
+        if await sync_to_async(form.is_valid)():
             # Use Gmail SMTP settings
             email_host = 'smtp.gmail.com'
             email_port = 587
@@ -198,7 +207,7 @@ def setup_recruiter_email(request):
             use_tls = True
             
             # Test the connection
-            success, message = test_email_connection(
+            success, message = await test_email_connection(
                 email_host, email_port, email_host_user, email_host_password, use_tls
             )
             
@@ -209,7 +218,10 @@ def setup_recruiter_email(request):
                 email_settings.email_port = email_port
                 email_settings.email_use_tls = use_tls
                 email_settings.email_configured = True  # FIXED: Use the new field name
-                email_settings.save()
+                await email_settings.asave()
+                # Connections logged in with the old settings must not be reused
+                get_smtp_pool().discard(previous_settings)
+                get_smtp_pool().discard(email_settings)
                 
                 messages.success(request, message)
                 return redirect('recruiter_dashboard')
@@ -222,7 +234,7 @@ def setup_recruiter_email(request):
         'form': form,
         'profile': profile
     }
-    return render(request, 'accounts/setup_recruiter_email.html', context)
+    return await sync_to_async(render)(request, 'accounts/setup_recruiter_email.html', context)
 
 @login_required
 def search_candidates(request):
@@ -250,10 +262,11 @@ def search_candidates(request):
 
     # If matched saved search exists, reset matches for that search only
     if saved_searches.exists():
-        CandidateMatch.objects.filter(
+        seen = CandidateMatch.objects.filter(
             search__in=saved_searches,
             seen=False
         ).update(seen=True)
+        change_count('unseen_matches', -seen, user_id=request.user.id)
 
     # Filter candidates
     candidates = UserProfile.objects.filter(user_type='user', profile_privacy='public')
@@ -323,10 +336,11 @@ def saved_candidate_searches(request):
 
     # Reset the match counter by marking all unseen matches as seen
     from accounts.models import CandidateMatch
-    CandidateMatch.objects.filter(
+    seen = CandidateMatch.objects.filter(
         search__recruiter=request.user,
         seen=False
     ).update(seen=True)
+    change_count('unseen_matches', -seen, user_id=request.user.id)
 
     return render(request, "accounts/saved_candidate_searches.html", {
         "searches": searches
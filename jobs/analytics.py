@@ -0,0 +1,161 @@
+# jobs/analytics.py
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import PipelineStageDailyStats
+
+DAY = 24 * 60 * 60
+
+# (rollup field, upper bound in seconds) - the last bucket is open ended
+TIME_BUCKETS = [
+    ('time_under_1d', DAY),
+    ('time_1d_3d', 3 * DAY),
+    ('time_3d_7d', 7 * DAY),
+    ('time_7d_14d', 14 * DAY),
+    ('time_14d_30d', 30 * DAY),
+    ('time_over_30d', None),
+]
+
+# Moving into this stage counts as a rejection rather than progress
+REJECTED_STAGE_NAME = 'Rejected'
+
+
+def time_bucket_field(seconds):
+    """Rollup field that counts a time-in-stage of this many seconds"""
+    for field, upper_bound in TIME_BUCKETS:
+        if upper_bound is None or seconds < upper_bound:
+            return field
+
+
+def exit_counter_field(from_stage_order, to_stage):
+    """Rollup field for an exit from a stage with from_stage_order into to_stage"""
+    if to_stage.name == REJECTED_STAGE_NAME:
+        return 'rejected_count'
+    if to_stage.order > from_stage_order:
+        return 'advanced_count'
+    return None
+
+
+def _increment_daily_stats(job_id, stage_id, day, increments):
+    """Add increments to the (stage, day) rollup row, creating it if needed"""
+    lookup = {'stage_id': stage_id, 'day': day}
+    updates = {field: F(field) + amount for field, amount in increments.items()}
+
+    if PipelineStageDailyStats.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            PipelineStageDailyStats.objects.create(job_id=job_id, **lookup, **increments)
+    except IntegrityError:
+        # Another request created the row first
+        PipelineStageDailyStats.objects.filter(**lookup).update(**updates)
+
+
+def record_stage_entries(stage, entered_at, count=1):
+    """Count applicants entering stage (e.g. a new application in the first stage)"""
+    _increment_daily_stats(
+        stage.job_id, stage.id, timezone.localdate(entered_at), {'entered_count': count}
+    )
+
+
+def record_stage_entry_counts(entry_counts):
+    """
+    Count many stage entries at once.
+    entry_counts: {(job_id, stage_id, day): number of applicants}
+    """
+    for (job_id, stage_id, day), count in entry_counts.items():
+        _increment_daily_stats(job_id, stage_id, day, {'entered_count': count})
+
+
+def record_transitions(exits, to_stage, moved_at):
+    """
+    Update rollups for applicants moved into to_stage at moved_at.
+    exits: iterable of (from_stage_id, from_stage_order, entered_from_stage_at)
+    """
+    day = timezone.localdate(moved_at)
+    exit_increments = defaultdict(Counter)
+    moved_count = 0
+
+    for from_stage_id, from_stage_order, entered_at in exits:
+        seconds = max(int((moved_at - entered_at).total_seconds()), 0)
+        increments = exit_increments[from_stage_id]
+        increments['exited_count'] += 1
+        increments['time_in_stage_seconds'] += seconds
+        increments[time_bucket_field(seconds)] += 1
+        counter_field = exit_counter_field(from_stage_order, to_stage)
+        if counter_field:
+            increments[counter_field] += 1
+        moved_count += 1
+
+    for from_stage_id, increments in exit_increments.items():
+        _increment_daily_stats(to_stage.job_id, from_stage_id, day, increments)
+    if moved_count:
+        _increment_daily_stats(to_stage.job_id, to_stage.id, day, {'entered_count': moved_count})
+
+
+def estimate_median_seconds(bucket_counts):
+    """
+    Approximate the median time-in-stage from TIME_BUCKETS counts by linear
+    interpolation inside the bucket holding the median.
+    """
+    total = sum(bucket_counts.get(field) or 0 for field, _ in TIME_BUCKETS)
+    if not total:
+        return None
+
+    target = total / 2
+    seen = 0
+    lower_bound = 0
+    for field, upper_bound in TIME_BUCKETS:
+        count = bucket_counts.get(field) or 0
+        if count and seen + count >= target:
+            if upper_bound is None:
+                return lower_bound
+            return lower_bound + (upper_bound - lower_bound) * (target - seen) / count
+        seen += count
+        lower_bound = upper_bound
+    return lower_bound
+
+
+def build_stage_funnel(job, since=None):
+    """
+    Funnel and time-in-stage numbers per stage, read only from the rollups.
+    Returns: list of dicts in stage order
+    """
+    stages = list(job.pipeline_stages.all())
+
+    rollups = PipelineStageDailyStats.objects.filter(job=job)
+    if since:
+        rollups = rollups.filter(day__gte=since)
+
+    sum_fields = ['entered_count', 'exited_count', 'advanced_count', 'rejected_count',
+                  'time_in_stage_seconds'] + [field for field, _ in TIME_BUCKETS]
+    totals_by_stage = {}
+    for row in rollups.order_by().values('stage_id').annotate(
+        **{f'total_{field}': Sum(field) for field in sum_fields}
+    ):
+        totals_by_stage[row['stage_id']] = {field: row[f'total_{field}'] for field in sum_fields}
+
+    funnel = []
+    for stage in stages:
+        totals = totals_by_stage.get(stage.id, {})
+        entered = totals.get('entered_count') or 0
+        exited = totals.get('exited_count') or 0
+        median_seconds = estimate_median_seconds(totals)
+        funnel.append({
+            'stage': stage,
+            'entered': entered,
+            'exited': exited,
+            'advanced': totals.get('advanced_count') or 0,
+            'rejected': totals.get('rejected_count') or 0,
+            'conversion_rate': (
+                round(100 * (totals.get('advanced_count') or 0) / entered, 1) if entered else None
+            ),
+            'median_days': round(median_seconds / DAY, 1) if median_seconds is not None else None,
+            'average_days': (
+                round((totals.get('time_in_stage_seconds') or 0) / exited / DAY, 1) if exited else None
+            ),
+        })
+    return funnel
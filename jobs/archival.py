@@ -0,0 +1,76 @@
+# jobs/archival.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.http import Http404
+from django.utils import timezone
+
+from .models import ArchivedMessage, EmailOutbox, Message, Thread
+
+ARCHIVE_CHUNK_SIZE = 500
+
+# Fields copied as-is from Message to ArchivedMessage
+ARCHIVED_FIELDS = [
+    'id', 'sender_id', 'recipient_id', 'application_id', 'thread_id', 'parent_id',
+    'subject', 'content', 'message_type', 'sent_at',
+    'email_sent', 'email_sent_at', 'email_failed', 'email_failure_reason',
+]
+
+
+def archive_after():
+    return timedelta(days=getattr(settings, 'MESSAGE_ARCHIVE_AFTER_DAYS', 365))
+
+
+def archivable_messages(cutoff):
+    """
+    Read messages sent before cutoff that can leave the hot table. Each
+    thread's last message stays so the inbox can still show it, as do
+    messages whose email is still waiting in the outbox.
+    """
+    return Message.objects.filter(is_read=True, sent_at__lt=cutoff).exclude(
+        Exists(Thread.objects.filter(last_message=OuterRef('pk')))
+    ).exclude(
+        Exists(EmailOutbox.objects.filter(
+            message=OuterRef('pk'), status__in=['pending', 'sending']
+        ))
+    )
+
+
+def archive_messages(older_than=None, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """
+    Move archivable messages to ArchivedMessage one chunk per transaction,
+    so the hot table is never locked for long.
+    Returns: number of messages archived
+    """
+    cutoff = timezone.now() - (older_than if older_than is not None else archive_after())
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                archivable_messages(cutoff).order_by('sent_at').values(*ARCHIVED_FIELDS)[:chunk_size]
+            )
+            if not rows:
+                return archived
+            ArchivedMessage.objects.bulk_create(
+                [ArchivedMessage(**row) for row in rows], ignore_conflicts=True
+            )
+            Message.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+
+
+def get_message_or_archived(message_id):
+    """
+    The message with this id from the hot table, or else from the archive
+    Returns: (message, archived)
+    """
+    message = Message.objects.with_parties().filter(id=message_id).first()
+    if message is not None:
+        return message, False
+    message = ArchivedMessage.objects.select_related(
+        'sender', 'recipient', 'application__job'
+    ).filter(id=message_id).first()
+    if message is None:
+        raise Http404('No message matches the given query.')
+    return message, True
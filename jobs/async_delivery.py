@@ -0,0 +1,108 @@
+# jobs/async_delivery.py
+import asyncio
+from collections import defaultdict
+from email.utils import parseaddr
+
+import aiosmtplib
+from asgiref.sync import sync_to_async
+
+from .mail_pool import connection_key
+from .outbox import claim_entries, prepare_entries, record_failure, record_sent
+
+# Concurrent SMTP sessions allowed against any one server
+MAX_CONNECTIONS_PER_HOST = 4
+SMTP_TIMEOUT = 30
+
+
+async def process_due_entries_async(
+    limit=200, max_connections_per_host=MAX_CONNECTIONS_PER_HOST, queryset=None
+):
+    """
+    Claim one batch of due entries (only from queryset if given) and
+    deliver it over concurrent SMTP sessions on one event loop. Each sender
+    gets up to max_connections_per_host sessions, and all senders on the
+    same server share that bound.
+    Returns: {status: count} for the batch
+    """
+    results = {'sent': 0, 'pending': 0, 'failed': 0}
+    entries = await sync_to_async(claim_entries)(limit, queryset=queryset)
+    if not entries:
+        return results
+    sendable, results['failed'] = await sync_to_async(prepare_entries)(entries)
+
+    queues = defaultdict(asyncio.Queue)  # pool key -> queue of (entry, email)
+    profiles = {}
+    for entry, email in sendable:
+        profile = entry.message.sender.profile
+        key = connection_key(profile)
+        profiles[key] = profile
+        queues[key].put_nowait((entry, email))
+
+    host_limits = defaultdict(lambda: asyncio.Semaphore(max_connections_per_host))
+    sessions = [
+        _run_session(profile, queues[key], host_limits[(profile.email_host, profile.email_port)])
+        for key, profile in profiles.items()
+        for _ in range(min(queues[key].qsize(), max_connections_per_host))
+    ]
+    sent, failures = [], []
+    for session_sent, session_failures in await asyncio.gather(*sessions):
+        sent += session_sent
+        failures += session_failures
+
+    await sync_to_async(record_sent)(sent)
+    results['sent'] = len(sent)
+    for entry, error_message in failures:
+        results[await sync_to_async(record_failure)(entry, error_message)] += 1
+    return results
+
+
+async def _run_session(profile, queue, host_limit):
+    """
+    Log in once and send from queue until it is empty. When the session
+    cannot start or is lost, whatever is left in the queue fails with the
+    same error so it is retried later.
+    Returns: (sent entries, [(entry, error message)])
+    """
+    sent, failures = [], []
+    async with host_limit:
+        if queue.empty():
+            # Another session for this sender already drained it
+            return sent, failures
+
+        client = aiosmtplib.SMTP(
+            hostname=profile.email_host,
+            port=profile.email_port,
+            timeout=SMTP_TIMEOUT,
+            use_tls=profile.email_port == 465,
+            start_tls=bool(profile.email_use_tls and profile.email_port != 465),
+        )
+        try:
+            await client.connect()
+            await client.login(profile.email_host_user, profile.get_email_password())
+            while not queue.empty():
+                entry, email = queue.get_nowait()
+                try:
+                    await client.send_message(
+                        email.message(),
+                        sender=parseaddr(email.from_email)[1],
+                        recipients=email.recipients(),
+                    )
+                except aiosmtplib.SMTPServerDisconnected as e:
+                    failures.append((entry, str(e)))
+                    raise
+                except aiosmtplib.SMTPException as e:
+                    # Rejected by the server; the session itself is still usable
+                    failures.append((entry, str(e)))
+                else:
+                    sent.append(entry)
+        except Exception as e:
+            while not queue.empty():
+                failures.append((queue.get_nowait()[0], str(e)))
+        finally:
+            if client.is_connected:
+                try:
+                    await client.quit()
+                except aiosmtplib.SMTPException:
+                    client.close()
+
+    return sent, failures
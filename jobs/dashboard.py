@@ -0,0 +1,110 @@
+# jobs/dashboard.py
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Window
+from django.db.models.functions import Round, RowNumber
+
+from .models import Application, Job
+
+# Seconds a recruiter's job cards and totals are served from the cache.
+# Signals on Job and Application drop the entry as soon as either changes.
+# The cache is the shared database backend (settings.CACHES), so that reaches
+# every worker process; the TTL only bounds how long anything the signals
+# miss can stay stale.
+RECRUITER_STATS_TTL = 60
+
+# The applicant map only changes with the recruiter's applications, which
+# invalidate it in every process the same way; the TTL catches applicants
+# who move city in the meantime
+APPLICANT_MAP_TTL = 60 * 60
+# Usernames listed in a map marker's popup
+MAP_SAMPLE_SIZE = 10
+# Decimal places coordinates are grouped by, about 11 meters
+MAP_PRECISION = 4
+
+
+def recruiter_stats_key(recruiter_id):
+    return f'recruiter-stats:{recruiter_id}'
+
+
+def applicant_map_key(recruiter_id):
+    return f'recruiter-applicant-map:{recruiter_id}'
+
+
+def invalidate_recruiter_stats(recruiter_id):
+    cache.delete_many([recruiter_stats_key(recruiter_id), applicant_map_key(recruiter_id)])
+
+
+def recruiter_stats(recruiter):
+    """
+    The recruiter's job cards and totals from one query: application_count
+    is the stored counter and first_application_id a correlated subquery,
+    so the cost is the same however many jobs they post.
+    Returns: {'jobs', 'total_jobs', 'total_applications', 'jobs_with_applicants'}
+    """
+    key = recruiter_stats_key(recruiter.id)
+    stats = cache.get(key)
+    if stats is None:
+        first_application = (
+            Application.objects.filter(job=OuterRef('pk'))
+            .order_by('-applied_at').values('pk')[:1]
+        )
+        jobs = list(
+            Job.objects.filter(employer=recruiter)
+            .annotate(first_application_id=Subquery(first_application))
+            .order_by('-posted_at')
+        )
+        stats = {
+            'jobs': jobs,
+            'total_jobs': len(jobs),
+            'total_applications': sum(job.application_count for job in jobs),
+            'jobs_with_applicants': [job for job in jobs if job.application_count],
+        }
+        cache.set(key, stats, RECRUITER_STATS_TTL)
+    return stats
+
+
+def applicant_locations(recruiter):
+    """
+    Applicants to the recruiter's jobs grouped by rounded profile
+    coordinates, counted with one GROUP BY. A second query picks up to
+    MAP_SAMPLE_SIZE usernames per location with a window function, so
+    popular locations never load every name.
+    Returns: {(lat, lng): {'count': applicants, 'applicants': [username]}}
+    """
+    key = applicant_map_key(recruiter.id)
+    locations = cache.get(key)
+    if locations is not None:
+        return locations
+
+    located_applicants = (
+        User.objects.filter(
+            Exists(Application.objects.filter(applicant=OuterRef('pk'), job__employer=recruiter)),
+            profile__latitude__isnull=False,
+            profile__longitude__isnull=False,
+        )
+        .exclude(Q(profile__latitude=0) | Q(profile__longitude=0))
+        .annotate(
+            lat=Round('profile__latitude', MAP_PRECISION),
+            lng=Round('profile__longitude', MAP_PRECISION),
+        )
+    )
+
+    locations = {
+        (row['lat'], row['lng']): {'count': row['count'], 'applicants': []}
+        for row in located_applicants.order_by().values('lat', 'lng').annotate(count=Count('id'))
+    }
+    samples = (
+        located_applicants.annotate(
+            position=Window(
+                RowNumber(), partition_by=[F('lat'), F('lng')], order_by=F('username').asc()
+            )
+        )
+        .filter(position__lte=MAP_SAMPLE_SIZE)
+        .values_list('lat', 'lng', 'username')
+    )
+    for lat, lng, username in samples:
+        locations[(lat, lng)]['applicants'].append(username)
+
+    cache.set(key, locations, APPLICANT_MAP_TTL)
+    return locations
@@ -0,0 +1,142 @@
+# jobs/downloads.py
+"""
+Serving stored resumes. By default Django streams the file itself,
+honouring single byte ranges and conditional GETs. With RESUME_SENDFILE
+set, the response only names the file and the front-end server sends it,
+so no app worker is held for the transfer.
+"""
+import mimetypes
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, quote_etag
+
+from .storage import hash_from_name
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class UnsatisfiableRange(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    The inclusive (start, end) a Range header asks for. Multiple or
+    malformed ranges get None, meaning send the whole file.
+    Raises: UnsatisfiableRange when the range starts past the end
+    """
+    match = RANGE_PATTERN.match(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # bytes=-N is the last N bytes
+        length = int(last)
+        if length == 0:
+            raise UnsatisfiableRange
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise UnsatisfiableRange
+    if end < start:
+        return None
+    return start, end
+
+
+class FileRange:
+    """length bytes of handle from start, read like a file by FileResponse"""
+
+    def __init__(self, handle, start, length):
+        handle.seek(start)
+        self.handle = handle
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.handle.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.handle.close()
+
+
+def resume_etag(field_file):
+    """Content-addressed resumes never change, so their hash is the ETag"""
+    content_hash = hash_from_name(field_file.name)
+    return quote_etag(content_hash) if content_hash else None
+
+
+def offload_response(field_file):
+    """
+    An empty response telling the front-end server which file to send.
+    RESUME_SENDFILE is 'x-sendfile' (Apache mod_xsendfile, lighttpd) or
+    'x-accel-redirect' (nginx, with an internal location at
+    RESUME_ACCEL_PREFIX aliased to MEDIA_ROOT).
+    """
+    response = HttpResponse()
+    backend = settings.RESUME_SENDFILE
+    if backend == 'x-sendfile':
+        response['X-Sendfile'] = field_file.path
+    elif backend == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = f"{settings.RESUME_ACCEL_PREFIX.rstrip('/')}/{field_file.name}"
+    else:
+        raise ImproperlyConfigured(
+            f"RESUME_SENDFILE must be 'x-sendfile', 'x-accel-redirect' or None, not {backend!r}"
+        )
+    return response
+
+
+def serve_resume(request, field_file, filename):
+    etag = resume_etag(field_file)
+    if etag:
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+
+    content_type = mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+
+    if getattr(settings, 'RESUME_SENDFILE', None):
+        response = offload_response(field_file)
+        response['Content-Type'] = content_type
+        response['Content-Disposition'] = content_disposition_header(False, filename)
+    else:
+        try:
+            handle = field_file.storage.open(field_file.name, 'rb')
+        except FileNotFoundError:
+            raise Http404('Resume file not found.')
+        size = handle.size
+
+        byte_range = None
+        # A stale If-Range means the client's partial copy is out of date
+        if request.headers.get('If-Range', etag) == etag:
+            try:
+                byte_range = parse_range(request.headers.get('Range', ''), size)
+            except UnsatisfiableRange:
+                handle.close()
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range is None:
+            response = FileResponse(handle, content_type=content_type, filename=filename)
+        else:
+            start, end = byte_range
+            response = FileResponse(
+                FileRange(handle, start, end - start + 1), content_type=content_type, filename=filename
+            )
+            response.status_code = 206
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        response['Accept-Ranges'] = 'bytes'
+
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
@@ -0,0 +1,125 @@
+# jobs/email_rendering.py
+import re
+import secrets
+from dataclasses import dataclass
+
+from django.template.defaultfilters import date as date_filter
+from django.template.loader import get_template
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import normalize_newlines
+
+CANDIDATE_EMAIL_TEMPLATE = 'jobs/email_candidate.html'
+SENT_AT_FORMAT = "F j, Y g:i A"
+PARAGRAPH_BREAK = re.compile(r'\n{2,}')
+
+
+@dataclass(frozen=True)
+class CandidateEmailDocument:
+    """
+    Structured form of a candidate email. The HTML and plain text parts are
+    both rendered from this, so the text part never has to be recovered by
+    stripping tags out of the HTML.
+    """
+    subject: str
+    paragraphs: tuple
+    sender_name: str
+    sent_at: str
+    job_title: str = None
+    company: str = None
+
+    @property
+    def shell_key(self):
+        """Documents with the same key share everything but subject and body"""
+        return (self.sender_name, self.sent_at, self.job_title, self.company)
+
+
+def document_for_message(message_instance):
+    """CandidateEmailDocument for a Message (sender and application.job loaded)"""
+    job = message_instance.application.job if message_instance.application else None
+    return CandidateEmailDocument(
+        subject=message_instance.subject,
+        paragraphs=split_paragraphs(message_instance.content),
+        sender_name=message_instance.sender.get_full_name() or message_instance.sender.username,
+        sent_at=date_filter(message_instance.sent_at, SENT_AT_FORMAT),
+        job_title=job.title if job else None,
+        company=job.company if job else None,
+    )
+
+
+def split_paragraphs(content):
+    """Paragraphs the way Django's |linebreaks splits them"""
+    return tuple(PARAGRAPH_BREAK.split(normalize_newlines(content)))
+
+
+def render_body_html(paragraphs):
+    return '\n\n'.join(
+        '<p>%s</p>' % escape(paragraph).replace('\n', '<br>') for paragraph in paragraphs
+    )
+
+
+def render_text(document):
+    lines = [
+        document.subject,
+        f'From: {document.sender_name} (via Jobify)',
+        f'Sent: {document.sent_at}',
+        '',
+        '\n\n'.join(document.paragraphs),
+    ]
+    if document.job_title:
+        lines += ['', 'Regarding your application for:', f'Position: {document.job_title}']
+        if document.company:
+            lines.append(f'Company: {document.company}')
+    lines += [
+        '',
+        'This email was sent through Jobify Platform',
+        'Please login to your Jobify account to respond to this message.',
+    ]
+    return '\n'.join(lines)
+
+
+class CandidateEmailRenderer:
+    """
+    Renders CandidateEmailDocuments to (text, html). The template is rendered
+    once per shell_key; each document's subject and body are filled into
+    that shell, so a batch of similar emails pays for one template render.
+    get_template goes through Django's cached loader, which reloads changed
+    templates under runserver.
+    """
+
+    def __init__(self, template_name=CANDIDATE_EMAIL_TEMPLATE):
+        self.template = get_template(template_name)
+        # A fresh random marker per renderer, so no sender name or job title
+        # can contain it
+        self.marker = secrets.token_hex(16)
+        self.slot_pattern = re.compile(rf'{self.marker}:(subject|body)')
+        self._shells = {}
+
+    def shell(self, document):
+        """
+        The rendered template for document.shell_key, split around its slots:
+        literal HTML at even positions, slot names at odd ones
+        """
+        key = document.shell_key
+        if key not in self._shells:
+            html = self.template.render({
+                'subject': f'{self.marker}:subject',
+                'body_html': mark_safe(f'{self.marker}:body'),
+                'sender_name': document.sender_name,
+                'sent_at': document.sent_at,
+                'job_title': document.job_title,
+                'company': document.company,
+            })
+            self._shells[key] = self.slot_pattern.split(html)
+        return self._shells[key]
+
+    def render(self, document):
+        slots = {
+            'subject': escape(document.subject),
+            'body': render_body_html(document.paragraphs),
+        }
+        html = ''.join(
+            slots[part] if index % 2 else part
+            for index, part in enumerate(self.shell(document))
+        )
+        return render_text(document), html
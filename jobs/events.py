@@ -0,0 +1,130 @@
+# jobs/events.py
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Per-subscriber buffer; a board that falls this far behind is told to resync
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class InMemoryBackend:
+    """
+    Pub/sub inside one process. Publishers may run in any thread (sync views
+    run in a thread pool under ASGI); each subscriber's queue is fed on its
+    own event loop. Deployments with several worker processes need a
+    backend that shares events between them.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)  # channel -> {(loop, queue)}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, event)
+            except RuntimeError:
+                # The subscriber's event loop has already shut down
+                self.unsubscribe(channel, queue)
+
+    def subscribe(self, channel):
+        """Must be called from inside the subscriber's event loop"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[channel].add((loop, queue))
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if not subscribers:
+                return
+            subscribers.difference_update(
+                {entry for entry in subscribers if entry[1] is queue}
+            )
+            if not subscribers:
+                del self._subscribers[channel]
+
+
+def _deliver(queue, event):
+    """Queue event, replacing the backlog with a resync marker if it is full"""
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({'type': 'resync'})
+
+
+class PipelineEventBroker:
+    """Publishes compact pipeline board events per job"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def channel_for_job(job_id):
+        return f'pipeline:{job_id}'
+
+    def publish(self, job_id, event):
+        self.backend.publish(self.channel_for_job(job_id), event)
+
+    def publish_on_commit(self, job_id, event):
+        """Publish once the surrounding transaction commits (now if there is none)"""
+        transaction.on_commit(lambda: self.publish(job_id, event))
+
+    @asynccontextmanager
+    async def subscribe(self, job_id):
+        channel = self.channel_for_job(job_id)
+        queue = self.backend.subscribe(channel)
+        try:
+            yield queue
+        finally:
+            self.backend.unsubscribe(channel, queue)
+
+
+def pipeline_events_enabled(request):
+    """
+    Whether request can be answered with a live event stream. The stream
+    is open-ended, so under WSGI it would hold a worker thread for as long
+    as the board stays open; boards there poll the JSON endpoint instead.
+    """
+    return getattr(settings, 'PIPELINE_EVENTS_ENABLED', False) and isinstance(request, ASGIRequest)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    backend_path = getattr(
+        settings, 'PIPELINE_EVENTS_BACKEND', 'jobs.events.InMemoryBackend'
+    )
+    return PipelineEventBroker(import_string(backend_path)())
+
+
+def publish_stage_change(job_id, stage_id, applicants):
+    """
+    Tell connected boards that applicants moved into stage_id.
+    applicants: iterable of (application_id, new_version)
+    """
+    get_broker().publish_on_commit(job_id, {
+        'type': 'move',
+        'stage_id': stage_id,
+        'applicants': [
+            {'id': application_id, 'version': version}
+            for application_id, version in applicants
+        ],
+    })
+
+
+def publish_new_application(job_id, card):
+    """Tell connected boards about a new applicant card"""
+    get_broker().publish_on_commit(job_id, {'type': 'new_application', 'card': card})
@@ -0,0 +1,76 @@
+# jobs/fulltext.py
+"""
+Shared pieces for the SQLite FTS5 searches over messages and resumes.
+Each index is an external-content FTS5 table kept in step with its source
+table by triggers. SQLite rebuilds a table for most field alterations,
+dropping its triggers, so such migrations must recreate them (see 0016).
+"""
+import re
+
+from django.db import connection
+
+TERM_PATTERN = re.compile(r'\w+')
+
+
+def build_match_query(text):
+    """
+    Turn what a user typed into an FTS5 query: every word must match, as a
+    prefix so partial words still find something. Quoting each term keeps
+    FTS5 operators and stray punctuation from being parsed as syntax.
+    Returns: the query, or '' when text has no searchable words
+    """
+    return ' '.join(f'"{term}"*' for term in TERM_PATTERN.findall(text.lower()))
+
+
+class RankedSearchResults:
+    """
+    Ranked matches for one search, sliced lazily so Paginator only loads
+    the page being shown. Subclasses provide:
+    - from_sql: joins and filters after SELECT, with a %s for the MATCH
+      query first and then from_params
+    - rank_sql: the ORDER BY expression, with its own rank_params
+    - select_sql: the columns for one page of rows
+    - load(rows): turn a page of rows into objects, in order
+    """
+    from_sql = ''
+    from_params = ()
+    rank_sql = ''
+    rank_params = ()
+    select_sql = ''
+
+    def __init__(self, text):
+        self.match = build_match_query(text)
+        self._count = None
+
+    def _run(self, select, tail='', params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {select} {self.from_sql} {tail}',
+                [self.match, *self.from_params, *params],
+            )
+            return cursor.fetchall()
+
+    def count(self):
+        if self._count is None:
+            self._count = self._run('COUNT(*)')[0][0] if self.match else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, page):
+        if not isinstance(page, slice):
+            raise TypeError(f'{type(self).__name__} only supports slicing')
+        if not self.match:
+            return []
+        start = page.start or 0
+        limit = (page.stop - start) if page.stop is not None else -1
+        rows = self._run(
+            self.select_sql,
+            f'ORDER BY {self.rank_sql} LIMIT %s OFFSET %s',
+            [*self.rank_params, limit, start],
+        )
+        return self.load(rows)
+
+    def load(self, rows):
+        raise NotImplementedError
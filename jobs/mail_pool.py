@@ -0,0 +1,161 @@
+# jobs/mail_pool.py
+import smtplib
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.core.mail import get_connection
+
+# Close pooled connections that have sat unused this long (seconds)
+IDLE_TIMEOUT = 60
+# NOOP a pooled connection before reuse if it has been idle this long
+HEALTH_CHECK_AFTER = 5
+# Idle connections kept per (host, port, user)
+MAX_IDLE_PER_KEY = 4
+
+
+def connection_key(profile):
+    """Pool key for a recruiter's SMTP settings"""
+    return (profile.email_host, profile.email_port, profile.email_host_user)
+
+
+class SMTPConnectionPool:
+    """
+    Keeps authenticated SMTP connections open between sends, keyed by
+    (host, port, user), so each email does not pay for TCP, STARTTLS and
+    login again. Safe to share between threads; a connection is only ever
+    used by one thread at a time.
+    """
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, health_check_after=HEALTH_CHECK_AFTER,
+                 max_idle_per_key=MAX_IDLE_PER_KEY):
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.max_idle_per_key = max_idle_per_key
+        self._idle = defaultdict(list)  # key -> [(backend, last_used)]
+        self._lock = threading.Lock()
+
+    def open_connection(self, profile):
+        backend = get_connection(
+            backend='django.core.mail.backends.smtp.EmailBackend',
+            host=profile.email_host,
+            port=profile.email_port,
+            username=profile.email_host_user,
+            password=profile.get_email_password(),
+            use_tls=profile.email_use_tls,
+        )
+        backend.open()
+        return backend
+
+    def _checkout(self, key):
+        """Most recently used healthy idle connection for key, or None"""
+        while True:
+            with self._lock:
+                if not self._idle.get(key):
+                    return None
+                backend, last_used = self._idle[key].pop()
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.idle_timeout:
+                self._close(backend)
+                continue
+            if idle_for > self.health_check_after and not self._is_alive(backend):
+                self._close(backend)
+                continue
+            return backend
+
+    def _checkin(self, key, backend):
+        with self._lock:
+            idle = self._idle[key]
+            if len(idle) < self.max_idle_per_key:
+                idle.append((backend, time.monotonic()))
+                return
+        self._close(backend)
+
+    @staticmethod
+    def _is_alive(backend):
+        try:
+            return backend.connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _close(backend):
+        try:
+            backend.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self, profile):
+        """
+        Yield an open EmailBackend for profile's SMTP settings. It goes back
+        to the pool afterwards unless the block raised.
+        """
+        self.evict_idle()
+        key = connection_key(profile)
+        backend = self._checkout(key) or self.open_connection(profile)
+        try:
+            yield backend
+        except BaseException:
+            self._close(backend)
+            raise
+        self._checkin(key, backend)
+
+    def send_messages(self, profile, emails):
+        """
+        Send EmailMessages over a pooled connection for profile.
+        A pooled connection the server dropped since its health check is
+        retried once on a fresh connection.
+        Returns: number of emails sent
+        """
+        key = connection_key(profile)
+        backend = self._checkout(key)
+        if backend is not None:
+            try:
+                sent = backend.send_messages(emails)
+            except smtplib.SMTPServerDisconnected:
+                self._close(backend)
+            except BaseException:
+                self._close(backend)
+                raise
+            else:
+                self._checkin(key, backend)
+                return sent
+
+        with self.connection(profile) as backend:
+            return backend.send_messages(emails)
+
+    def evict_idle(self):
+        """Close every pooled connection idle for longer than idle_timeout"""
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        with self._lock:
+            for key, idle in list(self._idle.items()):
+                expired.extend(backend for backend, last_used in idle if last_used < cutoff)
+                idle[:] = [entry for entry in idle if entry[1] >= cutoff]
+                if not idle:
+                    del self._idle[key]
+        for backend in expired:
+            self._close(backend)
+        return len(expired)
+
+    def discard(self, profile):
+        """Close pooled connections for profile, e.g. after its settings change"""
+        with self._lock:
+            idle = self._idle.pop(connection_key(profile), [])
+        for backend, _ in idle:
+            self._close(backend)
+
+    def close_all(self):
+        with self._lock:
+            idle = [backend for entries in self._idle.values() for backend, _ in entries]
+            self._idle.clear()
+        for backend in idle:
+            self._close(backend)
+
+
+@lru_cache(maxsize=None)
+def get_smtp_pool():
+    return SMTPConnectionPool()
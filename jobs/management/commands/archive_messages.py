@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from jobs.archival import ARCHIVE_CHUNK_SIZE, archive_after, archive_messages
+
+
+class Command(BaseCommand):
+    help = 'Move read messages older than MESSAGE_ARCHIVE_AFTER_DAYS out of the hot Message table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int,
+            help='Archive read messages older than this (default: MESSAGE_ARCHIVE_AFTER_DAYS)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        older_than = archive_after()
+        if options['older_than_days'] is not None:
+            older_than = timedelta(days=options['older_than_days'])
+
+        archived = archive_messages(older_than=older_than, chunk_size=options['chunk_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Archived {archived} messages older than {older_than.days} days')
+        )
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.async_delivery import MAX_CONNECTIONS_PER_HOST, process_due_entries_async
+from jobs.mail_pool import get_smtp_pool
+from jobs.models import EmailOutbox, Message
+from jobs.outbox import process_due_entries
+
+USERNAME_PREFIX = 'bench-'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure send_message to delivered latency and throughput against a local '
+        'aiosmtpd stand-in, optionally with injected SMTP faults. Runs in a '
+        'throwaway database so real outbox entries are never touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recruiters', type=int, default=4)
+        parser.add_argument('--messages', type=int, default=25, help='Messages per recruiter')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent send_message requests')
+        parser.add_argument('--async', action='store_true', dest='use_async')
+        parser.add_argument('--connections-per-host', type=int, default=MAX_CONNECTIONS_PER_HOST)
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--accept-delay', type=float, default=0.0)
+        parser.add_argument('--data-delay', type=float, default=0.0)
+        parser.add_argument('--auth-failure-rate', type=float, default=0.0)
+        parser.add_argument('--disconnect-rate', type=float, default=0.0)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            from jobs.smtp_standin import FaultInjection, LocalSMTPServer
+        except ImportError:
+            raise CommandError('The benchmark needs aiosmtpd: pip install aiosmtpd')
+
+        faults = FaultInjection(
+            accept_delay=options['accept_delay'],
+            data_delay=options['data_delay'],
+            auth_failure_rate=options['auth_failure_rate'],
+            disconnect_rate=options['disconnect_rate'],
+            seed=options['seed'],
+        )
+        self.options = options
+
+        with throwaway_database(), LocalSMTPServer(faults=faults) as server:
+            try:
+                pairs = self.create_users(server, options['recruiters'])
+                self.run(server, pairs)
+            finally:
+                get_smtp_pool().close_all()
+
+    def create_users(self, server, count):
+        """(recruiter, candidate) pairs with the recruiters pointed at server"""
+        pairs = []
+        for number in range(count):
+            recruiter = User.objects.create(username=f'{USERNAME_PREFIX}recruiter-{number}')
+            recruiter.profile.user_type = 'recruiter'
+            server.configure_profile(recruiter.profile)
+            candidate = User.objects.create(
+                username=f'{USERNAME_PREFIX}candidate-{number}',
+                email=f'candidate-{number}@example.com',
+            )
+            candidate.profile.email = candidate.email
+            candidate.profile.save()
+            pairs.append((recruiter, candidate))
+        self.recruiter_ids = [recruiter.id for recruiter, _ in pairs]
+        return pairs
+
+    def bench_messages(self):
+        return Message.objects.filter(sender_id__in=self.recruiter_ids)
+
+    def bench_entries(self):
+        return EmailOutbox.objects.filter(message__sender_id__in=self.recruiter_ids)
+
+    def run(self, server, pairs):
+        options = self.options
+        jobs = [
+            (recruiter, candidate, f'bench {recruiter.id}-{number}')
+            for recruiter, candidate in pairs
+            for number in range(options['messages'])
+        ]
+        posting_done = threading.Event()
+        worker = threading.Thread(target=self.drain, args=(posting_done,))
+
+        started = time.time()
+        worker.start()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            request_times = list(executor.map(lambda job: self.post(*job), jobs))
+        posting_done.set()
+        worker.join()
+
+        sent_at = dict(self.bench_messages().values_list('subject', 'sent_at'))
+        latencies = [
+            received_at - sent_at[subject].timestamp()
+            for received_at, subject, _ in server.delivered
+            if subject in sent_at
+        ]
+        failed = self.bench_messages().filter(email_failed=True).count()
+        elapsed = max((max(entry[0] for entry in server.delivered) if latencies else time.time()) - started, 1e-6)
+
+        handler = server.handler
+        self.stdout.write(
+            f'  {len(jobs)} messages from {len(pairs)} recruiters, '
+            f"{options['concurrency']} concurrent requests, "
+            f"{'async' if options['use_async'] else 'threaded'} worker"
+        )
+        self.stdout.write(
+            f'  send_message: median {statistics.median(request_times) * 1000:.1f}ms, '
+            f'max {max(request_times) * 1000:.1f}ms'
+        )
+        if latencies:
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f'  delivered: {len(latencies)} ({len(latencies) / elapsed:.1f}/s), '
+                f'latency median {statistics.median(latencies) * 1000:.0f}ms, '
+                f'p95 {p95 * 1000:.0f}ms'
+            )
+        self.stdout.write(
+            f'  faults: {handler.auth_failures} auth failures, {handler.disconnects} disconnects; '
+            f'{failed} messages gave up'
+        )
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
+
+    def post(self, recruiter, candidate, subject):
+        client = Client()
+        client.force_login(recruiter)
+        started = time.perf_counter()
+        client.post(reverse('send_message'), {
+            'candidate_id': candidate.id,
+            'subject': subject,
+            'content': 'Benchmark message',
+            'message_type': 'general',
+            'send_email': 'on',
+        })
+        elapsed = time.perf_counter() - started
+        close_old_connections()
+        return elapsed
+
+    def drain(self, posting_done):
+        """Run the outbox worker until posting is over and nothing is left to send"""
+        options = self.options
+        while True:
+            # Retries are due at once so fault runs finish in benchmark time
+            self.bench_entries().filter(status='pending').update(next_attempt_at=timezone.now())
+            if options['use_async']:
+                results = asyncio.run(process_due_entries_async(
+                    limit=options['batch_size'],
+                    max_connections_per_host=options['connections_per_host'],
+                    queryset=self.bench_entries(),
+                ))
+            else:
+                results = process_due_entries(limit=options['batch_size'], queryset=self.bench_entries())
+            if not sum(results.values()):
+                if posting_done.is_set() and not self.bench_entries().filter(
+                    status__in=['pending', 'sending']
+                ).exists():
+                    break
+                time.sleep(0.05)
+        close_old_connections()
+
+
+class throwaway_database:
+    """
+    Point the default connection at a freshly migrated SQLite file for the
+    duration of the benchmark and delete it afterwards. Request threads open
+    their own connections from the same settings, so they use it too.
+    """
+
+    def __enter__(self):
+        directory = tempfile.mkdtemp(prefix='benchmark-delivery-')
+        connection.settings_dict['TEST'] = {
+            **connection.settings_dict.get('TEST', {}),
+            'NAME': os.path.join(directory, 'db.sqlite3'),
+        }
+        self.directory = directory
+        self.old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection.creation.destroy_test_db(self.old_name, verbosity=0)
+        os.rmdir(self.directory)
@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from jobs.email_rendering import (
+    CANDIDATE_EMAIL_TEMPLATE,
+    CandidateEmailDocument,
+    CandidateEmailRenderer,
+    render_body_html,
+)
+
+SAMPLE_CONTENT = (
+    "Dear {name},\n\n"
+    "Thank you for applying. We would like to invite you to an interview "
+    "next week to talk about the role & your experience.\n\n"
+    "Please reply with a few times that work for you.\nBest regards,\nThe hiring team"
+)
+
+
+class Command(BaseCommand):
+    help = 'Time candidate email rendering per message (render_to_string + strip_tags) against the batch renderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1,100,10000',
+            help='Comma-separated batch sizes to time',
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        self.stdout.write(f"{'batch':>8} {'per message':>14} {'renderer':>14} {'speedup':>8}")
+
+        for size in sizes:
+            documents = [
+                CandidateEmailDocument(
+                    subject=f'Interview invitation #{number}',
+                    paragraphs=tuple(SAMPLE_CONTENT.format(name=f'Candidate {number}').split('\n\n')),
+                    sender_name='Rita Recruiter',
+                    sent_at='October 19, 2026 9:30 AM',
+                    job_title='Backend Engineer',
+                    company='ACME',
+                )
+                for number in range(size)
+            ]
+            baseline = self.time(lambda: [self.render_per_message(document) for document in documents])
+            batched = self.time(lambda: self.render_batch(documents))
+            self.stdout.write(
+                f'{size:>8} {baseline * 1000:>12.1f}ms {batched * 1000:>12.1f}ms {baseline / batched:>7.1f}x'
+            )
+
+    @staticmethod
+    def render_per_message(document):
+        """The old path: a full template render, then strip_tags for the text part"""
+        html = render_to_string(CANDIDATE_EMAIL_TEMPLATE, {
+            'subject': document.subject,
+            'body_html': render_body_html(document.paragraphs),
+            'sender_name': document.sender_name,
+            'sent_at': document.sent_at,
+            'job_title': document.job_title,
+            'company': document.company,
+        })
+        return strip_tags(html), html
+
+    @staticmethod
+    def render_batch(documents):
+        renderer = CandidateEmailRenderer()
+        return [renderer.render(document) for document in documents]
+
+    @staticmethod
+    def time(run):
+        started = time.perf_counter()
+        run()
+        return time.perf_counter() - started
@@ -0,0 +1,77 @@
+import time
+from types import SimpleNamespace
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.mail_pool import SMTPConnectionPool
+
+
+class Command(BaseCommand):
+    help = 'Compare messages per second with and without SMTP connection pooling against a local aiosmtpd server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--port', type=int, help='Port for the stand-in server (default: any free port)')
+
+    def handle(self, *args, **options):
+        try:
+            from jobs.smtp_standin import STANDIN_PASSWORD, LocalSMTPServer
+        except ImportError:
+            raise CommandError('The benchmark needs aiosmtpd: pip install aiosmtpd')
+
+        server = LocalSMTPServer(port=options['port']).start()
+
+        # Stands in for a recruiter's UserProfile
+        profile = SimpleNamespace(
+            email_host=server.hostname,
+            email_port=server.port,
+            email_host_user='recruiter@example.com',
+            email_use_tls=False,
+            get_email_password=lambda: STANDIN_PASSWORD,
+        )
+        count = options['messages']
+
+        try:
+            unpooled = self.run(count, lambda email: self.send_unpooled(profile, email))
+            pool = SMTPConnectionPool()
+            pooled = self.run(count, lambda email: pool.send_messages(profile, [email]))
+            pool.close_all()
+        finally:
+            server.stop()
+
+        self.stdout.write(f'  without pooling: {unpooled:.0f} messages/s')
+        self.stdout.write(f'  with pooling:    {pooled:.0f} messages/s')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Pooling speedup {pooled / unpooled:.1f}x over {count} messages '
+                f'({len(server.delivered)} delivered)'
+            )
+        )
+
+    @staticmethod
+    def send_unpooled(profile, email):
+        """The unpooled baseline: a fresh connection per message"""
+        email.connection = get_connection(
+            backend='django.core.mail.backends.smtp.EmailBackend',
+            host=profile.email_host,
+            port=profile.email_port,
+            username=profile.email_host_user,
+            password=profile.get_email_password(),
+            use_tls=profile.email_use_tls,
+        )
+        email.send()
+
+    @staticmethod
+    def run(count, send):
+        started = time.perf_counter()
+        for number in range(count):
+            email = EmailMultiAlternatives(
+                subject=f'Benchmark {number}',
+                body='Hello from the benchmark',
+                from_email='recruiter@example.com',
+                to=['candidate@example.com'],
+            )
+            email.attach_alternative('<p>Hello from the benchmark</p>', 'text/html')
+            send(email)
+        return count / max(time.perf_counter() - started, 1e-6)
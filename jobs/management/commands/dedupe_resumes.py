@@ -0,0 +1,61 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from jobs.models import Application
+from jobs.storage import acquire_blob, blob_name, hash_content, hash_from_name, release_blob, resume_storage
+
+
+class Command(BaseCommand):
+    help = 'Move resumes uploaded before content-addressed storage into it, keeping one file per distinct content'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would be moved and freed without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        legacy_names = [
+            name for name in
+            Application.objects.exclude(resume='').exclude(resume__isnull=True)
+            .order_by().values_list('resume', flat=True).distinct()
+            if not hash_from_name(name)
+        ]
+
+        moved = duplicates = freed = 0
+        new_blobs = set()
+        for name in legacy_names:
+            try:
+                with resume_storage.open(name, 'rb') as handle:
+                    blob = blob_name(hash_content(handle), os.path.splitext(name)[1])
+                    if blob in new_blobs or resume_storage.exists(blob):
+                        duplicates += 1
+                        freed += handle.size
+                    new_blobs.add(blob)
+                    if not dry_run:
+                        with transaction.atomic():
+                            # Saving counts one reference; the rest are the other applications
+                            blob = resume_storage.save(name, handle)
+                            repointed = Application.objects.filter(resume=name).update(resume=blob)
+                            if repointed > 1:
+                                acquire_blob(blob, repointed - 1)
+                            elif not repointed:
+                                release_blob(blob)
+            except FileNotFoundError:
+                self.stderr.write(f'  {name} is missing, leaving its applications as they are')
+                continue
+
+            if not dry_run:
+                resume_storage.delete(name)
+            moved += 1
+
+        verb = 'Would move' if dry_run else 'Moved'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{verb} {moved} resume files into {len(new_blobs)} blobs, '
+                f'{duplicates} duplicates ({freed / 1024:.0f} KiB) removed'
+            )
+        )
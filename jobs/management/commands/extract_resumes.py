@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.resume_index import process_resumes
+
+
+class Command(BaseCommand):
+    help = 'Hash uploaded resumes and extract their text into the resume search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument(
+            '--poll-interval', type=float, default=30,
+            help='Seconds to wait when there is nothing to extract',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Process what is waiting now and exit instead of polling forever',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            raise CommandError('Resume extraction needs pypdf: pip install pypdf')
+
+        batch_size = options['batch_size']
+
+        while True:
+            results = process_resumes(limit=batch_size)
+            processed = sum(results.values())
+            if processed:
+                self.stdout.write(
+                    f"  linked={results['linked']} extracted={results['extracted']} failed={results['failed']}"
+                )
+
+            if results['linked'] < batch_size and results['extracted'] + results['failed'] < batch_size:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS('Resumes indexed'))
@@ -0,0 +1,99 @@
+from collections import Counter, defaultdict
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.analytics import exit_counter_field, time_bucket_field
+from jobs.models import ApplicantPipeline, PipelineStage, PipelineStageDailyStats, PipelineTransition
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the pipeline analytics rollups from the full transition history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, help='Only rebuild rollups for this job id')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        job_id = options['job']
+        batch_size = options['batch_size']
+
+        stages = PipelineStage.objects.all()
+        pipelines = ApplicantPipeline.objects.all()
+        transitions = PipelineTransition.objects.all()
+        if job_id:
+            stages = stages.filter(job_id=job_id)
+            pipelines = pipelines.filter(current_stage__job_id=job_id)
+            transitions = transitions.filter(to_stage__job_id=job_id)
+
+        stage_info = {
+            stage.id: stage for stage in stages.only('id', 'job_id', 'order', 'name')
+        }
+        # pipeline id -> (current stage id, applied at)
+        pipeline_info = {
+            pipeline_id: (stage_id, applied_at)
+            for pipeline_id, stage_id, applied_at in pipelines.values_list(
+                'id', 'current_stage_id', 'application__applied_at'
+            ).iterator(chunk_size=batch_size)
+        }
+
+        # (stage id, day) -> Counter of rollup fields
+        rollups = defaultdict(Counter)
+
+        def add_entry(stage_id, at):
+            rollups[(stage_id, timezone.localdate(at))]['entered_count'] += 1
+
+        transition_rows = transitions.order_by(
+            'applicant_pipeline_id', 'moved_at', 'id'
+        ).values_list(
+            'applicant_pipeline_id', 'from_stage_id', 'to_stage_id', 'moved_at'
+        ).iterator(chunk_size=batch_size)
+
+        for pipeline_id, rows in groupby(transition_rows, key=lambda row: row[0]):
+            rows = list(rows)
+            _, applied_at = pipeline_info.pop(pipeline_id, (None, rows[0][3]))
+            entered_at = applied_at
+            add_entry(rows[0][1], entered_at)
+
+            for _, from_stage_id, to_stage_id, moved_at in rows:
+                seconds = max(int((moved_at - entered_at).total_seconds()), 0)
+                counters = rollups[(from_stage_id, timezone.localdate(moved_at))]
+                counters['exited_count'] += 1
+                counters['time_in_stage_seconds'] += seconds
+                counters[time_bucket_field(seconds)] += 1
+                from_stage = stage_info.get(from_stage_id)
+                to_stage = stage_info.get(to_stage_id)
+                if from_stage and to_stage:
+                    counter_field = exit_counter_field(from_stage.order, to_stage)
+                    if counter_field:
+                        counters[counter_field] += 1
+                add_entry(to_stage_id, moved_at)
+                entered_at = moved_at
+
+        # Applicants that never moved only entered their first stage
+        for stage_id, applied_at in pipeline_info.values():
+            add_entry(stage_id, applied_at)
+
+        new_rows = [
+            PipelineStageDailyStats(
+                job_id=stage_info[stage_id].job_id,
+                stage_id=stage_id,
+                day=day,
+                **counters,
+            )
+            for (stage_id, day), counters in rollups.items()
+            if stage_id in stage_info
+        ]
+
+        with transaction.atomic():
+            existing = PipelineStageDailyStats.objects.all()
+            if job_id:
+                existing = existing.filter(job_id=job_id)
+            existing.delete()
+            PipelineStageDailyStats.objects.bulk_create(new_rows, batch_size=batch_size)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {len(new_rows)} pipeline rollup rows')
+        )
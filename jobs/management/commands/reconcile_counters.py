@@ -0,0 +1,95 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import CandidateMatch, NotificationCounter
+from jobs.models import ApplicantPipeline, Application, Job, Message, PipelineStage
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute Job.application_count, PipelineStage.applicant_count and the '
+        'per-user notification counters from the source rows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, help='Only reconcile this job id')
+
+    def handle(self, *args, **options):
+        jobs = Job.objects.all()
+        stages = PipelineStage.objects.all()
+        if options['job']:
+            jobs = jobs.filter(id=options['job'])
+            stages = stages.filter(job_id=options['job'])
+
+        application_counts = (
+            Application.objects.filter(job=OuterRef('pk'))
+            .order_by().values('job').annotate(total=Count('pk')).values('total')
+        )
+        applicant_counts = (
+            ApplicantPipeline.objects.filter(current_stage=OuterRef('pk'))
+            .order_by().values('current_stage').annotate(total=Count('pk')).values('total')
+        )
+
+        # Only rewrite rows that have drifted, so the summary reports real fix-ups
+        drifted_job_ids = [
+            job_id for job_id, stored, actual in jobs.annotate(
+                actual=Coalesce(Subquery(application_counts), 0)
+            ).values_list('id', 'application_count', 'actual')
+            if stored != actual
+        ]
+        drifted_stage_ids = [
+            stage_id for stage_id, stored, actual in stages.annotate(
+                actual=Coalesce(Subquery(applicant_counts), 0)
+            ).values_list('id', 'applicant_count', 'actual')
+            if stored != actual
+        ]
+
+        Job.objects.filter(id__in=drifted_job_ids).update(
+            application_count=Coalesce(Subquery(application_counts), 0)
+        )
+        PipelineStage.objects.filter(id__in=drifted_stage_ids).update(
+            applicant_count=Coalesce(Subquery(applicant_counts), 0)
+        )
+
+        drifted_user_count = 0 if options['job'] else self.reconcile_notification_counters()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Reconciled {len(drifted_job_ids)} job counts, '
+                f'{len(drifted_stage_ids)} stage counts and '
+                f'{drifted_user_count} notification counters'
+            )
+        )
+
+    def reconcile_notification_counters(self):
+        # Users created without the post_save signal (fixtures, bulk_create) have no row yet
+        NotificationCounter.objects.bulk_create(
+            [
+                NotificationCounter(user_id=user_id)
+                for user_id in User.objects.filter(notification_counter__isnull=True).values_list('id', flat=True)
+            ]
+        )
+
+        unread_counts = (
+            Message.objects.filter(recipient=OuterRef('user'), is_read=False)
+            .order_by().values('recipient').annotate(total=Count('pk')).values('total')
+        )
+        unseen_counts = (
+            CandidateMatch.objects.filter(search__recruiter=OuterRef('user'), seen=False)
+            .order_by().values('search__recruiter').annotate(total=Count('pk')).values('total')
+        )
+        drifted_ids = [
+            counter_id for counter_id, unread, unseen, actual_unread, actual_unseen in
+            NotificationCounter.objects.annotate(
+                actual_unread=Coalesce(Subquery(unread_counts), 0),
+                actual_unseen=Coalesce(Subquery(unseen_counts), 0),
+            ).values_list('id', 'unread_messages', 'unseen_matches', 'actual_unread', 'actual_unseen')
+            if (unread, unseen) != (actual_unread, actual_unseen)
+        ]
+        NotificationCounter.objects.filter(id__in=drifted_ids).update(
+            unread_messages=Coalesce(Subquery(unread_counts), 0),
+            unseen_matches=Coalesce(Subquery(unseen_counts), 0),
+        )
+        return len(drifted_ids)
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.async_delivery import MAX_CONNECTIONS_PER_HOST, process_due_entries_async
+from jobs.outbox import process_due_entries
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued candidate emails from the outbox, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument(
+            '--poll-interval', type=float, default=5,
+            help='Seconds to wait when the outbox has nothing due',
+        )
+        parser.add_argument(
+            '--async', action='store_true', dest='use_async',
+            help='Deliver each batch over concurrent asyncio SMTP sessions',
+        )
+        parser.add_argument(
+            '--connections-per-host', type=int, default=MAX_CONNECTIONS_PER_HOST,
+            help='With --async, the most SMTP sessions open to one server at a time',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Drain what is due now and exit instead of polling forever',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        while True:
+            if options['use_async']:
+                results = asyncio.run(process_due_entries_async(
+                    limit=batch_size,
+                    max_connections_per_host=options['connections_per_host'],
+                ))
+            else:
+                results = process_due_entries(limit=batch_size)
+            processed = sum(results.values())
+            if processed:
+                self.stdout.write(
+                    f"  sent={results['sent']} retrying={results['pending']} failed={results['failed']}"
+                )
+
+            if processed < batch_size:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS('Outbox drained'))
@@ -1,27 +1,147 @@
+import os
+import time
+from collections import Counter
+
 from django.core.management.base import BaseCommand
-from jobs.models import Job, Application
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.analytics import record_stage_entry_counts
+from jobs.models import DEFAULT_PIPELINE_STAGES, ApplicantPipeline, Application, Job, PipelineStage
+from jobs.pipeline import shift_stage_counts
+
 
 class Command(BaseCommand):
     help = 'Setup pipeline stages for existing jobs and applications'
-    
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help='File that records progress so an interrupted run resumes where it stopped',
+        )
+
     def handle(self, *args, **options):
-        # Create pipeline stages for existing jobs without stages
-        jobs_without_stages = Job.objects.filter(pipeline_stages__isnull=True)
-        
-        for job in jobs_without_stages:
-            job.create_default_pipeline_stages()
-            self.stdout.write(
-                self.style.SUCCESS(f'Created pipeline stages for: {job.title}')
+        self.chunk_size = options['chunk_size']
+        self.checkpoint_path = options['checkpoint']
+        checkpoint = self.read_checkpoint()
+
+        if checkpoint['phase'] == 'stages':
+            self.create_missing_stages(after_id=checkpoint['last_id'])
+            checkpoint = {'phase': 'pipelines', 'last_id': 0}
+            self.write_checkpoint(checkpoint)
+
+        self.create_missing_pipelines(after_id=checkpoint['last_id'])
+
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def create_missing_stages(self, after_id):
+        """Create the default stages for every job that has none, chunk by chunk"""
+        started = time.monotonic()
+        total_jobs = 0
+        last_id = after_id
+
+        while True:
+            job_ids = list(
+                Job.objects.filter(id__gt=last_id, pipeline_stages__isnull=True)
+                .order_by('id')
+                .values_list('id', flat=True)[:self.chunk_size]
             )
-        
-        # Create pipeline entries for existing applications without pipelines
-        applications_without_pipeline = Application.objects.filter(pipeline__isnull=True)
-        
-        for application in applications_without_pipeline:
-            application.create_pipeline_entry()
-        
+            if not job_ids:
+                break
+
+            with transaction.atomic():
+                PipelineStage.objects.bulk_create(
+                    [
+                        PipelineStage(job_id=job_id, **stage_data)
+                        for job_id in job_ids
+                        for stage_data in DEFAULT_PIPELINE_STAGES
+                    ],
+                    ignore_conflicts=True,
+                )
+            last_id = job_ids[-1]
+            self.write_checkpoint({'phase': 'stages', 'last_id': last_id})
+
+            total_jobs += len(job_ids)
+            self.report_progress('jobs', total_jobs, started)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Created pipeline stages for {total_jobs} jobs')
+        )
+
+    def create_missing_pipelines(self, after_id):
+        """Put every application without a pipeline into its job's first stage"""
+        started = time.monotonic()
+        total_pipelines = 0
+        last_id = after_id
+
+        # job id -> first stage id, one query for all jobs
+        first_stage_ids = {}
+        for job_id, stage_id in PipelineStage.objects.order_by('job_id', 'order').values_list('job_id', 'id'):
+            first_stage_ids.setdefault(job_id, stage_id)
+
+        while True:
+            rows = list(
+                Application.objects.filter(id__gt=last_id, pipeline__isnull=True)
+                .order_by('id')
+                .values_list('id', 'job_id', 'applied_at')[:self.chunk_size]
+            )
+            if not rows:
+                break
+
+            with transaction.atomic():
+                # Another process may have created some since they were read;
+                # skip those so the counters only see rows inserted here
+                existing = set(
+                    ApplicantPipeline.objects.filter(
+                        application_id__in=[row[0] for row in rows]
+                    ).values_list('application_id', flat=True)
+                )
+                new_pipelines = []
+                entry_counts = Counter()
+                stage_counts = Counter()
+                for application_id, job_id, applied_at in rows:
+                    stage_id = first_stage_ids.get(job_id)
+                    if stage_id is None or application_id in existing:
+                        continue
+                    # Applicants entered the first stage when they applied, as
+                    # rebuild_pipeline_stats assumes
+                    new_pipelines.append(ApplicantPipeline(
+                        application_id=application_id, current_stage_id=stage_id, date_moved=applied_at,
+                    ))
+                    entry_counts[(job_id, stage_id, timezone.localdate(applied_at))] += 1
+                    stage_counts[stage_id] += 1
+
+                ApplicantPipeline.objects.bulk_create(new_pipelines)
+                record_stage_entry_counts(entry_counts)
+                shift_stage_counts(stage_counts)
+            last_id = rows[-1][0]
+            self.write_checkpoint({'phase': 'pipelines', 'last_id': last_id})
+
+            total_pipelines += len(new_pipelines)
+            self.report_progress('pipeline entries', total_pipelines, started)
+
         self.stdout.write(
             self.style.SUCCESS(
-                f'Created pipeline entries for {applications_without_pipeline.count()} applications'
+                f'Created pipeline entries for {total_pipelines} applications'
             )
-        )
\ No newline at end of file
+        )
+
+    def report_progress(self, label, count, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f'  {count} {label} ({count / elapsed:.0f}/s)')
+
+    def read_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as checkpoint_file:
+                phase, last_id = checkpoint_file.read().split()
+            self.stdout.write(f'Resuming {phase} after id {last_id}')
+            return {'phase': phase, 'last_id': int(last_id)}
+        return {'phase': 'stages', 'last_id': 0}
+
+    def write_checkpoint(self, checkpoint):
+        if not self.checkpoint_path:
+            return
+        with open(self.checkpoint_path, 'w') as checkpoint_file:
+            checkpoint_file.write(f"{checkpoint['phase']} {checkpoint['last_id']}")
@@ -0,0 +1,42 @@
+# jobs/message_search.py
+"""
+Full-text search over Message.subject and content, backed by the FTS5
+table jobs_message_fts (migration 0015). Its triggers also index rows
+written by bulk_create.
+"""
+from .fulltext import RankedSearchResults
+from .models import Message
+
+FTS_TABLE = 'jobs_message_fts'
+# bm25 column weights: a hit in the subject counts for more than one in the body
+SUBJECT_WEIGHT = 5.0
+CONTENT_WEIGHT = 1.0
+
+
+class MessageSearchResults(RankedSearchResults):
+    """
+    One user's matching messages, best first.
+    sent: True for messages the user sent, False for ones they received,
+    None for both
+    """
+    select_sql = 'm.id'
+    rank_sql = f'bm25({FTS_TABLE}, %s, %s), m.sent_at DESC'
+    rank_params = (SUBJECT_WEIGHT, CONTENT_WEIGHT)
+
+    def __init__(self, user, text, sent=None):
+        super().__init__(text)
+        if sent is None:
+            scope = '(m.sender_id = %s OR m.recipient_id = %s)'
+            self.from_params = (user.id, user.id)
+        else:
+            scope = f"m.{'sender_id' if sent else 'recipient_id'} = %s"
+            self.from_params = (user.id,)
+        self.from_sql = (
+            f'FROM {FTS_TABLE} JOIN jobs_message m ON m.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND {scope}'
+        )
+
+    def load(self, rows):
+        ranked_ids = [row[0] for row in rows]
+        found = Message.objects.with_parties().in_bulk(ranked_ids)
+        return [found[message_id] for message_id in ranked_ids if message_id in found]
@@ -0,0 +1,84 @@
+# jobs/messaging.py
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from accounts.notifications import change_counts
+
+from .models import Message, Thread
+from .outbox import enqueue_candidate_emails
+
+# Mail-merge fields recruiters can put in a bulk subject or message
+MERGE_FIELDS = ('candidate_name', 'job_title', 'company')
+MERGE_FIELD_PATTERN = re.compile(r'\{(%s)\}' % '|'.join(MERGE_FIELDS))
+
+
+def merge_fields(text, values):
+    """Replace {candidate_name}-style fields in text; other braces are left alone"""
+    return MERGE_FIELD_PATTERN.sub(lambda match: values[match.group(1)], text)
+
+
+def compose_bulk_messages(sender, applications, subject, content, message_type, send_email=False):
+    """
+    Send one merged message to the applicant of each application.
+    Each message starts its own thread. Threads, their participants and
+    the Messages are each written with one bulk INSERT, and when send_email is
+    set their emails are queued with another; the outbox worker renders and
+    delivers them as a batch.
+    applications: Applications with job and applicant__profile loaded
+    Returns: (messages, number of emails queued)
+    """
+    new_messages = []
+    for application in applications:
+        values = {
+            'candidate_name': application.candidate_name,
+            'job_title': application.job.title,
+            'company': application.job.company,
+        }
+        new_messages.append(Message(
+            sender=sender,
+            recipient=application.applicant,
+            application=application,
+            subject=merge_fields(subject, values),
+            content=merge_fields(content, values),
+            message_type=message_type,
+        ))
+
+    with transaction.atomic():
+        start_threads(new_messages)
+        new_messages = Message.objects.bulk_create(new_messages)
+        # bulk_create skips post_save, so point each new thread at its message here
+        Thread.objects.filter(id__in=[message.thread_id for message in new_messages]).update(
+            last_message=Subquery(
+                Message.objects.filter(thread=OuterRef('pk')).values('pk')[:1]
+            ),
+            last_message_at=Subquery(
+                Message.objects.filter(thread=OuterRef('pk')).values('sent_at')[:1]
+            ),
+        )
+        # bulk_create skips post_save, so count the unread messages here
+        change_counts('unread_messages', Counter(message.recipient_id for message in new_messages))
+        emailed = []
+        if send_email:
+            emailed = [message for message in new_messages if message.recipient_has_email]
+            enqueue_candidate_emails(emailed)
+
+    return new_messages, len(emailed)
+
+
+def start_threads(new_messages):
+    """Create a thread for each unsaved message in bulk and attach it"""
+    threads = Thread.objects.bulk_create([
+        Thread(subject=message.subject, application=message.application)
+        for message in new_messages
+    ])
+    Participant = Thread.participants.through
+    Participant.objects.bulk_create([
+        Participant(thread_id=thread.id, user_id=user_id)
+        for thread, message in zip(threads, new_messages)
+        for user_id in {message.sender.id, message.recipient.id}
+    ])
+    for thread, message in zip(threads, new_messages):
+        message.thread = thread
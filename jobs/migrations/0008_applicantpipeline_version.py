@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0007_alter_application_options_pipelinestage_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='applicantpipeline',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
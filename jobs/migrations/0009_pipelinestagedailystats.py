@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0008_applicantpipeline_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineStageDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('entered_count', models.PositiveIntegerField(default=0)),
+                ('exited_count', models.PositiveIntegerField(default=0)),
+                ('advanced_count', models.PositiveIntegerField(default=0)),
+                ('rejected_count', models.PositiveIntegerField(default=0)),
+                ('time_in_stage_seconds', models.BigIntegerField(default=0)),
+                ('time_under_1d', models.PositiveIntegerField(default=0)),
+                ('time_1d_3d', models.PositiveIntegerField(default=0)),
+                ('time_3d_7d', models.PositiveIntegerField(default=0)),
+                ('time_7d_14d', models.PositiveIntegerField(default=0)),
+                ('time_14d_30d', models.PositiveIntegerField(default=0)),
+                ('time_over_30d', models.PositiveIntegerField(default=0)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stage_daily_stats', to='jobs.job')),
+                ('stage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='jobs.pipelinestage')),
+            ],
+            options={
+                'ordering': ['job', 'stage', 'day'],
+                'indexes': [models.Index(fields=['job', 'day'], name='jobs_pipeli_job_id_b024b2_idx')],
+                'unique_together': {('stage', 'day')},
+            },
+        ),
+    ]
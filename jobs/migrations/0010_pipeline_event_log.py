@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0009_pipelinestagedailystats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('state', models.JSONField(default=dict)),
+                ('taken_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-version'],
+            },
+        ),
+        migrations.RemoveField(
+            model_name='applicantpipeline',
+            name='previous_stages',
+        ),
+        migrations.AddIndex(
+            model_name='pipelinetransition',
+            index=models.Index(fields=['applicant_pipeline', 'moved_at'], name='jobs_pipeli_applica_ed148e_idx'),
+        ),
+        migrations.AddField(
+            model_name='pipelinesnapshot',
+            name='applicant_pipeline',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='jobs.applicantpipeline'),
+        ),
+        migrations.AddField(
+            model_name='pipelinesnapshot',
+            name='last_transition',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='jobs.pipelinetransition'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='pipelinesnapshot',
+            unique_together={('applicant_pipeline', 'version')},
+        ),
+    ]
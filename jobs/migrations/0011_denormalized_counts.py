@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counts(apps, schema_editor):
+    Job = apps.get_model('jobs', 'Job')
+    Application = apps.get_model('jobs', 'Application')
+    PipelineStage = apps.get_model('jobs', 'PipelineStage')
+    ApplicantPipeline = apps.get_model('jobs', 'ApplicantPipeline')
+
+    application_counts = (
+        Application.objects.filter(job=OuterRef('pk'))
+        .order_by().values('job').annotate(total=Count('pk')).values('total')
+    )
+    Job.objects.update(application_count=Coalesce(Subquery(application_counts), 0))
+
+    applicant_counts = (
+        ApplicantPipeline.objects.filter(current_stage=OuterRef('pk'))
+        .order_by().values('current_stage').annotate(total=Count('pk')).values('total')
+    )
+    PipelineStage.objects.update(applicant_count=Coalesce(Subquery(applicant_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0010_pipeline_event_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='application_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pipelinestage',
+            name='applicant_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
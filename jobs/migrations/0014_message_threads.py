@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def base_subject(subject):
+    while subject.lower().startswith('re:'):
+        subject = subject[3:].strip()
+    return subject
+
+
+def thread_existing_messages(apps, schema_editor):
+    """
+    Group existing messages into threads by application, the pair of users
+    and the subject without its "Re:" prefixes. Each message's parent is the
+    latest earlier message in its thread that it answers.
+    """
+    Message = apps.get_model('jobs', 'Message')
+    Thread = apps.get_model('jobs', 'Thread')
+    Participant = Thread.participants.through
+
+    threads = {}  # grouping key -> (thread, latest message)
+    for message in Message.objects.order_by('sent_at', 'id').iterator():
+        key = (
+            message.application_id,
+            frozenset((message.sender_id, message.recipient_id)),
+            base_subject(message.subject),
+        )
+        if key in threads:
+            thread, previous = threads[key]
+            if previous.recipient_id == message.sender_id:
+                message.parent_id = previous.id
+        else:
+            thread = Thread.objects.create(subject=message.subject, application_id=message.application_id)
+            Participant.objects.bulk_create(
+                [Participant(thread_id=thread.id, user_id=user_id) for user_id in key[1]]
+            )
+        message.thread_id = thread.id
+        message.save(update_fields=['thread', 'parent'])
+        threads[key] = (thread, message)
+
+    for thread, message in threads.values():
+        thread.last_message_id = message.id
+        thread.last_message_at = message.sent_at
+        thread.save(update_fields=['last_message', 'last_message_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0013_emailoutbox_lock_token'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='replies', to='jobs.message'),
+        ),
+        migrations.CreateModel(
+            name='Thread',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_message_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('application', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='threads', to='jobs.application')),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='jobs.message')),
+                ('participants', models.ManyToManyField(related_name='message_threads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_message_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='thread',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='jobs.thread'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['thread', 'sent_at'], name='jobs_messag_thread__3fa561_idx'),
+        ),
+        migrations.RunPython(thread_existing_messages, migrations.RunPython.noop),
+    ]
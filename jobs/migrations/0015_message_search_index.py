@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:10
+
+from django.db import migrations
+
+CREATE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE jobs_message_fts USING fts5(
+        subject, content,
+        content='jobs_message', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER jobs_message_fts_insert AFTER INSERT ON jobs_message BEGIN
+        INSERT INTO jobs_message_fts(rowid, subject, content)
+        VALUES (new.id, new.subject, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER jobs_message_fts_delete AFTER DELETE ON jobs_message BEGIN
+        INSERT INTO jobs_message_fts(jobs_message_fts, rowid, subject, content)
+        VALUES ('delete', old.id, old.subject, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER jobs_message_fts_update AFTER UPDATE OF subject, content ON jobs_message BEGIN
+        INSERT INTO jobs_message_fts(jobs_message_fts, rowid, subject, content)
+        VALUES ('delete', old.id, old.subject, old.content);
+        INSERT INTO jobs_message_fts(rowid, subject, content)
+        VALUES (new.id, new.subject, new.content);
+    END
+    """,
+    # Index the messages that already exist
+    "INSERT INTO jobs_message_fts(jobs_message_fts) VALUES ('rebuild')",
+]
+
+DROP_INDEX = [
+    'DROP TRIGGER IF EXISTS jobs_message_fts_update',
+    'DROP TRIGGER IF EXISTS jobs_message_fts_delete',
+    'DROP TRIGGER IF EXISTS jobs_message_fts_insert',
+    'DROP TABLE IF EXISTS jobs_message_fts',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0014_message_threads'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEX, DROP_INDEX),
+    ]
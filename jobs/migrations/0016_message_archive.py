@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Altering Message.parent makes SQLite rebuild jobs_message, which drops the
+# search index triggers from 0015; put them back
+RESTORE_SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_message_fts_insert AFTER INSERT ON jobs_message BEGIN
+        INSERT INTO jobs_message_fts(rowid, subject, content)
+        VALUES (new.id, new.subject, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_message_fts_delete AFTER DELETE ON jobs_message BEGIN
+        INSERT INTO jobs_message_fts(jobs_message_fts, rowid, subject, content)
+        VALUES ('delete', old.id, old.subject, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_message_fts_update AFTER UPDATE OF subject, content ON jobs_message BEGIN
+        INSERT INTO jobs_message_fts(jobs_message_fts, rowid, subject, content)
+        VALUES ('delete', old.id, old.subject, old.content);
+        INSERT INTO jobs_message_fts(rowid, subject, content)
+        VALUES (new.id, new.subject, new.content);
+    END
+    """,
+    "INSERT INTO jobs_message_fts(jobs_message_fts) VALUES ('rebuild')",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0015_message_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('parent_id', models.BigIntegerField(blank=True, null=True)),
+                ('subject', models.CharField(max_length=200)),
+                ('content', models.TextField()),
+                ('message_type', models.CharField(choices=[('application', 'Application Related'), ('interview', 'Interview Invitation'), ('offer', 'Job Offer'), ('general', 'General Inquiry'), ('rejection', 'Rejection')], max_length=20)),
+                ('sent_at', models.DateTimeField()),
+                ('email_sent', models.BooleanField(default=False)),
+                ('email_sent_at', models.DateTimeField(blank=True, null=True)),
+                ('email_failed', models.BooleanField(default=False)),
+                ('email_failure_reason', models.TextField(blank=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='parent',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='replies', to='jobs.message'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['is_read', 'sent_at'], name='jobs_messag_is_read_b894ab_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='application',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='jobs.application'),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='recipient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='sender',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='thread',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='jobs.thread'),
+        ),
+        migrations.RunSQL(RESTORE_SEARCH_TRIGGERS, migrations.RunSQL.noop),
+    ]
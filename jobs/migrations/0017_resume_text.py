@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CREATE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE jobs_resume_fts USING fts5(
+        text,
+        content='jobs_resumetext', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER jobs_resume_fts_insert AFTER INSERT ON jobs_resumetext BEGIN
+        INSERT INTO jobs_resume_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER jobs_resume_fts_delete AFTER DELETE ON jobs_resumetext BEGIN
+        INSERT INTO jobs_resume_fts(jobs_resume_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER jobs_resume_fts_update AFTER UPDATE OF text ON jobs_resumetext BEGIN
+        INSERT INTO jobs_resume_fts(jobs_resume_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO jobs_resume_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+DROP_INDEX = [
+    'DROP TRIGGER IF EXISTS jobs_resume_fts_update',
+    'DROP TRIGGER IF EXISTS jobs_resume_fts_delete',
+    'DROP TRIGGER IF EXISTS jobs_resume_fts_insert',
+    'DROP TABLE IF EXISTS jobs_resume_fts',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0016_message_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('extracted', 'Extracted'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('text', models.TextField(blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('extracted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='jobs_resume_status_4c0f09_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='resume_text',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='applications', to='jobs.resumetext'),
+        ),
+        migrations.RunSQL(CREATE_INDEX, DROP_INDEX),
+    ]
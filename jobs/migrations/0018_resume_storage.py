@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:11
+
+import jobs.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0017_resume_text'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='application',
+            name='resume',
+            field=models.FileField(blank=True, db_index=True, null=True, storage=jobs.storage.ContentAddressedStorage(), upload_to='resumes/'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:23
+
+import re
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Mirrors jobs.storage.BLOB_NAME_PATTERN at the time of this migration
+BLOB_NAME_PATTERN = re.compile(r'^resumes/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def count_existing_references(apps, schema_editor):
+    Application = apps.get_model('jobs', 'Application')
+    ResumeBlob = apps.get_model('jobs', 'ResumeBlob')
+    counts = (
+        Application.objects.exclude(resume='').exclude(resume__isnull=True)
+        .order_by().values_list('resume').annotate(total=Count('id'))
+    )
+    ResumeBlob.objects.bulk_create(
+        [ResumeBlob(name=name, ref_count=total) for name, total in counts if BLOB_NAME_PATTERN.match(name)],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0018_resume_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_existing_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0020_pipeline_entry_time'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pipelinetransition',
+            name='moved_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
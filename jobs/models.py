@@ -1,13 +1,32 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from accounts.notifications import change_count
+
+from .storage import release_blob, resume_storage
+
+DEFAULT_PIPELINE_STAGES = [
+    {'name': 'Applied', 'order': 0, 'color': '#3498db'},
+    {'name': 'Screening', 'order': 1, 'color': '#9b59b6'},
+    {'name': 'Interview', 'order': 2, 'color': '#f39c12'},
+    {'name': 'Offer', 'order': 3, 'color': '#2ecc71'},
+    {'name': 'Hired', 'order': 4, 'color': '#27ae60'},
+    {'name': 'Rejected', 'order': 5, 'color': '#e74c3c'},
+]
+
+
 class PipelineStage(models.Model):
     """Kanban board stages for organizing applicants"""
     name = models.CharField(max_length=100)
     order = models.IntegerField(default=0)
     job = models.ForeignKey('Job', on_delete=models.CASCADE, related_name='pipeline_stages')
     color = models.CharField(max_length=7, default='#3498db')  # Hex color
+    # Denormalized number of applicants currently in this stage
+    applicant_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['job', 'order']
@@ -64,6 +83,8 @@ class Job(models.Model):
         blank=True
     )
     application_email = models.EmailField(blank=True)
+    # Denormalized number of applications, kept exact by the Application signals below
+    application_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"{self.title} at {self.company}"
@@ -80,16 +101,7 @@ class Job(models.Model):
     
     def create_default_pipeline_stages(self):
         """Create default pipeline stages for this job"""
-        default_stages = [
-            {'name': 'Applied', 'order': 0, 'color': '#3498db'},
-            {'name': 'Screening', 'order': 1, 'color': '#9b59b6'},
-            {'name': 'Interview', 'order': 2, 'color': '#f39c12'},
-            {'name': 'Offer', 'order': 3, 'color': '#2ecc71'},
-            {'name': 'Hired', 'order': 4, 'color': '#27ae60'},
-            {'name': 'Rejected', 'order': 5, 'color': '#e74c3c'},
-        ]
-        
-        for stage_data in default_stages:
+        for stage_data in DEFAULT_PIPELINE_STAGES:
             PipelineStage.objects.get_or_create(
                 job=self,
                 name=stage_data['name'],
@@ -100,6 +112,53 @@ class Job(models.Model):
             )
 
 
+class ResumeText(models.Model):
+    """
+    Text pulled from a resume PDF by the extract_resumes worker, stored once
+    per distinct file content and indexed in jobs_resume_fts for search.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('extracted', 'Extracted'),
+        ('failed', 'Failed'),
+    ]
+
+    content_hash = models.CharField(max_length=64, unique=True)  # sha256 of the file
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    text = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    extracted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'id'])]
+
+    def __str__(self):
+        return f"Resume text {self.content_hash[:12]} ({self.status})"
+
+
+class ResumeBlob(models.Model):
+    """
+    One stored resume file in ContentAddressedStorage and how many
+    applications point at it. The file is deleted with the row once the
+    count reaches zero (see jobs/storage.py).
+    """
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+
+class ApplicationQuerySet(models.QuerySet):
+    def with_candidate(self):
+        """
+        Join in what candidate_email, candidate_name and
+        current_pipeline_stage read, so listing applications costs one query
+        """
+        return self.select_related('job', 'applicant__profile', 'pipeline__current_stage')
+
+
 class Application(models.Model):
     APPLICATION_STATUS_CHOICES = [
         ("applied", "Applied"),
@@ -120,7 +179,20 @@ class Application(models.Model):
     status = models.CharField(
         max_length=20, choices=APPLICATION_STATUS_CHOICES, default="applied"
     )
-    resume = models.FileField(upload_to="resumes/", blank=True, null=True)
+    # Content-addressed: applications with the same PDF share one file
+    resume = models.FileField(
+        upload_to="resumes/", storage=resume_storage, blank=True, null=True, db_index=True
+    )
+    # Set by the extract_resumes worker once it has hashed the resume
+    resume_text = models.ForeignKey(
+        ResumeText,
+        on_delete=models.SET_NULL,
+        related_name='applications',
+        null=True,
+        blank=True
+    )
+
+    objects = ApplicationQuerySet.as_manager()
 
     class Meta:
         unique_together = ["job", "applicant"]
@@ -129,6 +201,21 @@ class Application(models.Model):
     def __str__(self):
         return f"Application for {self.job.title} by {self.applicant.username}"
 
+    def save(self, *args, **kwargs):
+        replaced_resume = None
+        # A newly uploaded resume needs hashing and extracting again
+        if self.resume and not self.resume._committed:
+            self.resume_text = None
+            if self.pk:
+                replaced_resume = (
+                    Application.objects.filter(pk=self.pk).values_list('resume', flat=True).first()
+                )
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Storing the new file took a reference even if the content is unchanged
+            if replaced_resume:
+                release_blob(replaced_resume)
+
     # Properties to get candidate's current email from profile
     @property
     def candidate_email(self):
@@ -175,10 +262,20 @@ class Application(models.Model):
         ).order_by('order').first()
         
         if first_stage:
+            # Applicants enter the first stage when they apply
             pipeline, created = ApplicantPipeline.objects.get_or_create(
                 application=self,
-                defaults={'current_stage': first_stage}
+                defaults={'current_stage': first_stage, 'date_moved': self.applied_at}
             )
+            if created:
+                PipelineStage.objects.filter(pk=first_stage.pk).update(
+                    applicant_count=F('applicant_count') + 1
+                )
+                from .analytics import record_stage_entries
+                from .events import publish_new_application
+                from .pipeline import serialize_pipeline_card
+                record_stage_entries(first_stage, pipeline.date_moved)
+                publish_new_application(self.job_id, serialize_pipeline_card(pipeline))
             return pipeline
         return None
 
@@ -195,13 +292,12 @@ class ApplicantPipeline(models.Model):
         on_delete=models.CASCADE, 
         related_name='applicants'
     )
-    previous_stages = models.ManyToManyField(
-        PipelineStage, 
-        related_name='moved_from_applicants', 
-        blank=True
-    )
-    date_moved = models.DateTimeField(auto_now=True)
+    # When the applicant entered current_stage. Moves set it explicitly, so
+    # saving notes does not reset it
+    date_moved = models.DateTimeField(default=timezone.now)
     notes = models.TextField(blank=True, help_text="Internal notes about this candidate")
+    # Bumped on every move so concurrent moves of the same card can be detected
+    version = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-date_moved']
@@ -209,16 +305,16 @@ class ApplicantPipeline(models.Model):
     def __str__(self):
         return f"{self.application.applicant.username} - {self.current_stage.name}"
     
-    def move_to_stage(self, new_stage):
-        """Move applicant to a new stage and update history"""
-        if self.current_stage != new_stage:
-            self.previous_stages.add(self.current_stage)
-            self.current_stage = new_stage
-            self.save()
+    def move_to_stage(self, new_stage, moved_by=None):
+        """Move applicant to a new stage, recording the transition"""
+        from .pipeline import move_applicant_to_stage
+        return move_applicant_to_stage(self, new_stage, moved_by)
     
     def get_stage_history(self):
-        """Get chronological history of stage movements"""
-        return self.previous_stages.all().order_by('pipelinetransition__moved_at')
+        """Chronological stage transitions, read from the indexed transition log"""
+        return self.transitions.select_related(
+            'from_stage', 'to_stage', 'moved_by'
+        ).order_by('moved_at', 'id')
 
 
 class PipelineTransition(models.Model):
@@ -238,7 +334,9 @@ class PipelineTransition(models.Model):
         on_delete=models.CASCADE, 
         related_name='transitions_to'
     )
-    moved_at = models.DateTimeField(auto_now_add=True)
+    # Set by the move to the same instant as ApplicantPipeline.date_moved and
+    # the analytics rollups, so rebuilding them from this log gives the same numbers
+    moved_at = models.DateTimeField(default=timezone.now)
     moved_by = models.ForeignKey(
         User, 
         on_delete=models.SET_NULL, 
@@ -249,6 +347,109 @@ class PipelineTransition(models.Model):
     
     class Meta:
         ordering = ['-moved_at']
+        indexes = [models.Index(fields=['applicant_pipeline', 'moved_at'])]
+
+
+class PipelineSnapshot(models.Model):
+    """Compact fold of an applicant's transition log, taken every few moves"""
+    applicant_pipeline = models.ForeignKey(
+        ApplicantPipeline,
+        on_delete=models.CASCADE,
+        related_name='snapshots'
+    )
+    version = models.PositiveIntegerField()
+    last_transition = models.ForeignKey(
+        PipelineTransition,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    # {'stage_id': ..., 'entered_at': iso, 'stages': {stage_id: [visits, seconds]}}
+    state = models.JSONField(default=dict)
+    taken_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-version']
+        unique_together = ['applicant_pipeline', 'version']
+    
+    def __str__(self):
+        return f"Snapshot of {self.applicant_pipeline_id} at v{self.version}"
+
+
+class PipelineStageDailyStats(models.Model):
+    """Per job, per stage, per day rollup of pipeline transitions for analytics"""
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='stage_daily_stats')
+    stage = models.ForeignKey(PipelineStage, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    
+    entered_count = models.PositiveIntegerField(default=0)
+    exited_count = models.PositiveIntegerField(default=0)
+    advanced_count = models.PositiveIntegerField(default=0)  # Exits to a later stage
+    rejected_count = models.PositiveIntegerField(default=0)
+    
+    # Time spent in the stage by applicants who exited it on this day
+    time_in_stage_seconds = models.BigIntegerField(default=0)
+    time_under_1d = models.PositiveIntegerField(default=0)
+    time_1d_3d = models.PositiveIntegerField(default=0)
+    time_3d_7d = models.PositiveIntegerField(default=0)
+    time_7d_14d = models.PositiveIntegerField(default=0)
+    time_14d_30d = models.PositiveIntegerField(default=0)
+    time_over_30d = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['job', 'stage', 'day']
+        unique_together = ['stage', 'day']
+        indexes = [models.Index(fields=['job', 'day'])]
+    
+    def __str__(self):
+        return f"{self.stage} - {self.day}"
+
+
+class Thread(models.Model):
+    """
+    A conversation between two or more users, optionally about an
+    application. last_message and last_message_at are kept current as
+    messages are posted, so the inbox can list threads without reading
+    their messages.
+    """
+    subject = models.CharField(max_length=200)
+    application = models.ForeignKey(
+        Application,
+        on_delete=models.CASCADE,
+        related_name='threads',
+        null=True,
+        blank=True
+    )
+    participants = models.ManyToManyField(User, related_name='message_threads')
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    
+    class Meta:
+        ordering = ['-last_message_at']
+    
+    def __str__(self):
+        return self.subject
+    
+    @classmethod
+    def start(cls, subject, participants, application=None):
+        thread = cls.objects.create(subject=subject, application=application)
+        thread.participants.add(*participants)
+        return thread
+
+
+class MessageQuerySet(models.QuerySet):
+    def with_parties(self):
+        """
+        Join in both users' profiles and the application's job, which
+        sender_is_recruiter, recipient_email and the message lists read
+        """
+        return self.select_related('sender__profile', 'recipient__profile', 'application__job')
 
 
 class Message(models.Model):
@@ -269,6 +470,23 @@ class Message(models.Model):
         null=True, 
         blank=True
     )
+    thread = models.ForeignKey(
+        Thread,
+        on_delete=models.CASCADE,
+        related_name='messages',
+        null=True,
+        blank=True
+    )
+    # The message this one answers; its body is shown from here, never copied.
+    # No constraint, because the parent may since have moved to ArchivedMessage
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='replies',
+        null=True,
+        blank=True
+    )
     subject = models.CharField(max_length=200)
     content = models.TextField()
     message_type = models.CharField(max_length=20, choices=MESSAGE_TYPES, default='application')
@@ -281,11 +499,28 @@ class Message(models.Model):
     email_failed = models.BooleanField(default=False)
     email_failure_reason = models.TextField(blank=True)
     
+    objects = MessageQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['thread', 'sent_at']),
+            models.Index(fields=['is_read', 'sent_at']),  # For the archiver
+        ]
     
     def __str__(self):
         return f"Message from {self.sender} to {self.recipient} - {self.subject}"
+    
+    def save(self, *args, **kwargs):
+        # Replies join their parent's conversation; anything else starts one
+        with transaction.atomic():
+            if self.thread_id is None and self.parent_id is not None:
+                self.thread_id = self.parent.thread_id
+            if self.thread_id is None:
+                self.thread = Thread.start(
+                    self.subject, [self.sender, self.recipient], self.application
+                )
+            super().save(*args, **kwargs)
 
     @property
     def sender_is_recruiter(self):
@@ -316,4 +551,157 @@ class Message(models.Model):
     @property
     def recipient_has_email(self):
         """Check if recipient currently has an email"""
-        return bool(self.recipient_email)
\ No newline at end of file
+        return bool(self.recipient_email)
+
+
+class ArchivedMessage(models.Model):
+    """
+    A read message moved out of Message by the archive_messages command,
+    keeping its original id so links to it still resolve. Only read by id,
+    so it carries no indexes beyond its foreign keys.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    application = models.ForeignKey(
+        Application, on_delete=models.CASCADE, related_name='+', null=True, blank=True
+    )
+    thread = models.ForeignKey(
+        Thread, on_delete=models.CASCADE, related_name='+', null=True, blank=True
+    )
+    parent_id = models.BigIntegerField(null=True, blank=True)
+    subject = models.CharField(max_length=200)
+    content = models.TextField()
+    message_type = models.CharField(max_length=20, choices=Message.MESSAGE_TYPES)
+    sent_at = models.DateTimeField()
+    email_sent = models.BooleanField(default=False)
+    email_sent_at = models.DateTimeField(null=True, blank=True)
+    email_failed = models.BooleanField(default=False)
+    email_failure_reason = models.TextField(blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Archived messages were read before they were moved
+    is_read = True
+
+    def __str__(self):
+        return f"Archived message from {self.sender} to {self.recipient} - {self.subject}"
+
+
+class EmailOutbox(models.Model):
+    """
+    Email waiting to be delivered for a Message. Written in the same
+    transaction as the Message and drained by the send_outbox_emails command.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    message = models.OneToOneField(Message, on_delete=models.CASCADE, related_name='outbox')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)  # When a worker claimed it
+    lock_token = models.CharField(max_length=32, blank=True)  # Which claim holds it
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"Email for message {self.message_id} ({self.status})"
+
+
+# SIGNALS - keep the denormalized counters exact
+@receiver(post_save, sender=Application)
+def increment_job_application_count(sender, instance, created, **kwargs):
+    """Count a new application on its job"""
+    if created:
+        Job.objects.filter(pk=instance.job_id).update(
+            application_count=F('application_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Application)
+def decrement_job_application_count(sender, instance, **kwargs):
+    """Uncount a deleted application from its job"""
+    Job.objects.filter(pk=instance.job_id, application_count__gt=0).update(
+        application_count=F('application_count') - 1
+    )
+
+
+def deleted_by_cascade_from(origin, *model_classes):
+    """Whether a delete signal was fired by deleting an instance or queryset of model_classes"""
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return model in model_classes
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_delete, sender=Application)
+def invalidate_stats_for_application(sender, instance, origin=None, **kwargs):
+    """Drop the employer's cached dashboard stats and applicant map"""
+    # Deleting a job or user invalidates once from its own receiver rather
+    # than loading the job of every application it cascades to
+    if origin is not None and deleted_by_cascade_from(origin, Job, User):
+        return
+    from .dashboard import invalidate_recruiter_stats
+    invalidate_recruiter_stats(instance.job.employer_id)
+
+
+@receiver(pre_delete, sender=User)
+def invalidate_stats_for_applicant(sender, instance, **kwargs):
+    """Drop the cached stats of every recruiter the deleted user applied to"""
+    from .dashboard import invalidate_recruiter_stats
+    for employer_id in (
+        Job.objects.filter(applications__applicant=instance)
+        .order_by().values_list('employer_id', flat=True).distinct()
+    ):
+        invalidate_recruiter_stats(employer_id)
+
+
+@receiver(post_delete, sender=Application)
+def release_deleted_resume(sender, instance, **kwargs):
+    if instance.resume:
+        release_blob(instance.resume.name)
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def invalidate_stats_for_job(sender, instance, **kwargs):
+    from .dashboard import invalidate_recruiter_stats
+    invalidate_recruiter_stats(instance.employer_id)
+
+
+@receiver(post_delete, sender=ApplicantPipeline)
+def decrement_stage_applicant_count(sender, instance, **kwargs):
+    """Uncount a removed applicant from the stage they were in"""
+    PipelineStage.objects.filter(pk=instance.current_stage_id, applicant_count__gt=0).update(
+        applicant_count=F('applicant_count') - 1
+    )
+
+
+@receiver(post_save, sender=Message)
+def count_unread_message(sender, instance, created, **kwargs):
+    """Count a new message against its recipient's unread badge"""
+    if created and not instance.is_read:
+        change_count('unread_messages', 1, user_id=instance.recipient_id)
+
+
+@receiver(post_save, sender=Message)
+def advance_thread(sender, instance, created, **kwargs):
+    """Point the thread at its newest message"""
+    if created:
+        Thread.objects.filter(
+            models.Q(last_message_at__isnull=True) | models.Q(last_message_at__lte=instance.sent_at),
+            pk=instance.thread_id,
+        ).update(last_message=instance, last_message_at=instance.sent_at)
+
+
+@receiver(post_delete, sender=Message)
+def uncount_deleted_message(sender, instance, **kwargs):
+    if not instance.is_read:
+        change_count('unread_messages', -1, user_id=instance.recipient_id)
@@ -0,0 +1,195 @@
+# jobs/outbox.py
+import random
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .mail_pool import get_smtp_pool
+from .models import EmailOutbox, Message
+from .utils import build_candidate_emails
+
+# Give up on an email after this many failed attempts
+MAX_ATTEMPTS = 6
+# Retry delays double from BACKOFF_BASE up to BACKOFF_MAX
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+# A 'sending' entry older than this belongs to a worker that died mid-send
+STALE_LOCK_AFTER = timedelta(minutes=10)
+
+
+def enqueue_candidate_email(message):
+    """Queue message for email delivery; delivered once the transaction commits"""
+    return EmailOutbox.objects.create(message=message)
+
+
+def enqueue_candidate_emails(messages):
+    """Queue many saved messages with one INSERT"""
+    return EmailOutbox.objects.bulk_create(
+        [EmailOutbox(message=message) for message in messages]
+    )
+
+
+def backoff_delay(attempts):
+    """Delay before the next try after `attempts` failures, with 10% jitter"""
+    delay = min(BACKOFF_BASE * (2 ** (attempts - 1)), BACKOFF_MAX)
+    return delay + delay * random.uniform(0, 0.1)
+
+
+def release_stale_locks(now=None, queryset=None):
+    """Put entries abandoned by a crashed worker back in the queue"""
+    now = now or timezone.now()
+    entries = EmailOutbox.objects.all() if queryset is None else queryset
+    return entries.filter(
+        status='sending', locked_at__lt=now - STALE_LOCK_AFTER
+    ).update(status='pending', locked_at=None, lock_token='')
+
+
+def claim_due_entries(limit, now=None, queryset=None):
+    """
+    Claim up to limit entries that are due, only from queryset if given.
+    The claim is one conditional UPDATE tagged with a fresh token, so
+    several workers can drain the same table without sending anything twice.
+    Returns: list of claimed EmailOutbox ids
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    entries = EmailOutbox.objects.all() if queryset is None else queryset
+    due_ids = list(
+        entries.filter(status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not due_ids:
+        return []
+    EmailOutbox.objects.filter(id__in=due_ids, status='pending').update(
+        status='sending', locked_at=now, lock_token=token
+    )
+    return list(
+        EmailOutbox.objects.filter(lock_token=token, status='sending')
+        .values_list('id', flat=True)
+    )
+
+
+def prepare_entries(entries):
+    """
+    Build the emails for claimed entries. Entries that can never be emailed
+    are marked failed straight away.
+    Returns: (list of (entry, email) to send, number marked failed)
+    """
+    built = build_candidate_emails([entry.message for entry in entries])
+    sendable = []
+    failed = 0
+    for entry, (email, error_message) in zip(entries, built):
+        if email is None:
+            # Nothing a retry could fix
+            record_failure(entry, error_message, permanent=True)
+            failed += 1
+        else:
+            sendable.append((entry, email))
+    return sendable, failed
+
+
+def deliver_entries(entries):
+    """
+    Send claimed entries and record each outcome on the entry and its
+    Message. Emails are built together, so the template renders once per
+    sender and job, and each sender's emails share one pooled connection.
+    Returns: {status: count}
+    """
+    results = {'sent': 0, 'pending': 0, 'failed': 0}
+    sendable, results['failed'] = prepare_entries(entries)
+    pool = get_smtp_pool()
+    sent_entries = []
+
+    for entry, email in sendable:
+        try:
+            pool.send_messages(entry.message.sender.profile, [email])
+        except Exception as e:
+            results[record_failure(entry, str(e))] += 1
+        else:
+            sent_entries.append(entry)
+
+    record_sent(sent_entries)
+    results['sent'] += len(sent_entries)
+    return results
+
+
+def record_sent(entries):
+    """Mark entries and their Messages as sent, one UPDATE each"""
+    if not entries:
+        return
+    with transaction.atomic():
+        EmailOutbox.objects.filter(id__in=[entry.id for entry in entries]).update(
+            status='sent',
+            attempts=F('attempts') + 1,
+            locked_at=None,
+            lock_token='',
+            last_error='',
+        )
+        Message.objects.filter(id__in=[entry.message_id for entry in entries]).update(
+            email_sent=True,
+            email_sent_at=timezone.now(),
+            email_failed=False,
+            email_failure_reason='',
+        )
+
+
+def record_failure(entry, error_message, permanent=False):
+    """
+    Schedule a retry with backoff, or mark the entry and its Message failed
+    once it is permanent or out of attempts.
+    Returns: the entry's new status
+    """
+    if not permanent:
+        entry.attempts += 1
+        if entry.attempts < MAX_ATTEMPTS:
+            EmailOutbox.objects.filter(id=entry.id).update(
+                status='pending',
+                attempts=entry.attempts,
+                next_attempt_at=timezone.now() + backoff_delay(entry.attempts),
+                locked_at=None,
+                lock_token='',
+                last_error=error_message,
+            )
+            return 'pending'
+
+    with transaction.atomic():
+        EmailOutbox.objects.filter(id=entry.id).update(
+            status='failed',
+            attempts=entry.attempts,
+            locked_at=None,
+            lock_token='',
+            last_error=error_message,
+        )
+        Message.objects.filter(id=entry.message_id).update(
+            email_sent=False,
+            email_failed=True,
+            email_failure_reason=error_message,
+        )
+    return 'failed'
+
+
+def claim_entries(limit, queryset=None):
+    """Release stale locks, then claim and load up to limit due entries"""
+    release_stale_locks(queryset=queryset)
+    claimed_ids = claim_due_entries(limit, queryset=queryset)
+    if not claimed_ids:
+        return []
+    return list(
+        EmailOutbox.objects.filter(id__in=claimed_ids).select_related(
+            'message__sender__profile',
+            'message__recipient__profile',
+            'message__application__job',
+        )
+    )
+
+
+def process_due_entries(limit=50, queryset=None):
+    """
+    Claim and deliver one batch of due entries, only from queryset if given
+    Returns: {status: count} for the batch
+    """
+    return deliver_entries(claim_entries(limit, queryset=queryset))
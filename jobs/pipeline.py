@@ -0,0 +1,308 @@
+# jobs/pipeline.py
+from collections import Counter
+from datetime import datetime
+
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .analytics import record_transitions
+from .events import publish_stage_change
+from .models import ApplicantPipeline, PipelineSnapshot, PipelineStage, PipelineTransition
+
+# Fold the transition log into a PipelineSnapshot every this many moves
+SNAPSHOT_INTERVAL = 10
+
+
+def build_pipeline_board(job):
+    """
+    Build the Kanban board for a job.
+    Loads every applicant for the job in one joined query and groups them
+    by stage in Python.
+    Returns: list of {'stage': PipelineStage, 'applicants': [ApplicantPipeline]}
+    """
+    stages = list(job.pipeline_stages.all())
+
+    applicants_by_stage = {stage.id: [] for stage in stages}
+    pipeline_applicants = (
+        ApplicantPipeline.objects.filter(current_stage__job=job)
+        .select_related('application__applicant__profile')
+        .order_by('-date_moved')
+    )
+    for pipeline_applicant in pipeline_applicants:
+        applicants_by_stage.setdefault(pipeline_applicant.current_stage_id, []).append(
+            pipeline_applicant
+        )
+
+    return [
+        {'stage': stage, 'applicants': applicants_by_stage[stage.id]}
+        for stage in stages
+    ]
+
+
+def serialize_pipeline_board(board):
+    """Compact JSON-ready version of a board built by build_pipeline_board"""
+    columns = []
+    for column in board:
+        stage = column['stage']
+        columns.append({
+            'id': stage.id,
+            'name': stage.name,
+            'color': stage.color,
+            'order': stage.order,
+            'count': stage.applicant_count,
+            'applicants': [
+                serialize_pipeline_card(pipeline_applicant)
+                for pipeline_applicant in column['applicants']
+            ],
+        })
+    return columns
+
+
+def serialize_pipeline_card(pipeline_applicant):
+    """JSON-ready version of a single applicant card"""
+    application = pipeline_applicant.application
+    return {
+        'application_id': application.id,
+        'candidate_name': application.candidate_name,
+        'candidate_email': application.candidate_email,
+        'applied_at': application.applied_at.isoformat(),
+        'note': Truncator(application.application_note).words(10),
+        'stage_id': pipeline_applicant.current_stage_id,
+        'version': pipeline_applicant.version,
+        'detail_url': reverse('applicant_detail', kwargs={'pk': application.id}),
+    }
+
+
+def shift_stage_counts(deltas):
+    """
+    Apply {stage_id: change} to PipelineStage.applicant_count in one UPDATE
+    """
+    deltas = {stage_id: delta for stage_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    PipelineStage.objects.filter(id__in=deltas).update(
+        applicant_count=Case(
+            *[
+                When(id=stage_id, then=F('applicant_count') + Value(delta))
+                for stage_id, delta in deltas.items()
+            ],
+            default=F('applicant_count'),
+            output_field=models.PositiveIntegerField(),
+        )
+    )
+
+
+def move_applicant_to_stage(pipeline_applicant, new_stage, moved_by, expected_version=None):
+    """
+    Move one applicant to new_stage with optimistic concurrency.
+    expected_version is the version the client last saw; it defaults to the
+    version loaded on pipeline_applicant.
+    Returns: True if moved, False if someone else moved the applicant first
+    """
+    if expected_version is None:
+        expected_version = pipeline_applicant.version
+    from_stage_id = pipeline_applicant.current_stage_id
+
+    if new_stage.id == from_stage_id:
+        return expected_version == pipeline_applicant.version
+
+    moved_at = timezone.now()
+    with transaction.atomic():
+        updated = ApplicantPipeline.objects.filter(
+            id=pipeline_applicant.id,
+            version=expected_version,
+        ).update(
+            current_stage=new_stage,
+            date_moved=moved_at,
+            version=F('version') + 1,
+        )
+        if not updated:
+            return False
+
+        PipelineTransition.objects.create(
+            applicant_pipeline=pipeline_applicant,
+            from_stage_id=from_stage_id,
+            to_stage=new_stage,
+            moved_by=moved_by,
+            moved_at=moved_at,
+        )
+        shift_stage_counts({from_stage_id: -1, new_stage.id: 1})
+        if (expected_version + 1) % SNAPSHOT_INTERVAL == 0:
+            take_snapshot(pipeline_applicant, expected_version + 1)
+        # date_moved is when the applicant entered the stage they are leaving
+        record_transitions(
+            [(from_stage_id, pipeline_applicant.current_stage.order, pipeline_applicant.date_moved)],
+            new_stage,
+            moved_at,
+        )
+        publish_stage_change(
+            new_stage.job_id,
+            new_stage.id,
+            [(pipeline_applicant.application_id, expected_version + 1)],
+        )
+
+    pipeline_applicant.current_stage = new_stage
+    pipeline_applicant.date_moved = moved_at
+    pipeline_applicant.version = expected_version + 1
+    return True
+
+
+def move_applicants_to_stage(stage, application_ids, moved_by):
+    """
+    Move many applicants of stage.job into stage at once.
+    Applications that are not in this job's pipeline are ignored, and
+    applicants already in the stage are left alone.
+    Returns: number of applicants moved
+    """
+    with transaction.atomic():
+        rows = list(
+            ApplicantPipeline.objects.select_for_update()
+            .filter(application_id__in=application_ids, current_stage__job_id=stage.job_id)
+            .exclude(current_stage=stage)
+            .values_list(
+                'id', 'application_id', 'version',
+                'current_stage_id', 'current_stage__order', 'date_moved',
+            )
+        )
+        if not rows:
+            return 0
+
+        moved_at = timezone.now()
+        pipeline_ids = [row[0] for row in rows]
+
+        PipelineTransition.objects.bulk_create([
+            PipelineTransition(
+                applicant_pipeline_id=pipeline_id,
+                from_stage_id=from_stage_id,
+                to_stage=stage,
+                moved_by=moved_by,
+                moved_at=moved_at,
+            )
+            for pipeline_id, _, _, from_stage_id, _, _ in rows
+        ])
+
+        ApplicantPipeline.objects.filter(id__in=pipeline_ids).update(
+            current_stage=stage,
+            date_moved=moved_at,
+            version=F('version') + 1,
+        )
+
+        stage_deltas = Counter({stage.id: len(rows)})
+        for _, _, _, from_stage_id, _, _ in rows:
+            stage_deltas[from_stage_id] -= 1
+        shift_stage_counts(stage_deltas)
+
+        snapshot_due = {
+            pipeline_id: version + 1
+            for pipeline_id, _, version, _, _, _ in rows
+            if (version + 1) % SNAPSHOT_INTERVAL == 0
+        }
+        if snapshot_due:
+            for pipeline_applicant in ApplicantPipeline.objects.filter(
+                id__in=snapshot_due
+            ).select_related('application'):
+                take_snapshot(pipeline_applicant, snapshot_due[pipeline_applicant.id])
+
+        record_transitions(
+            [
+                (from_stage_id, from_order, entered_at)
+                for _, _, _, from_stage_id, from_order, entered_at in rows
+            ],
+            stage,
+            moved_at,
+        )
+        publish_stage_change(
+            stage.job_id,
+            stage.id,
+            [(application_id, version + 1) for _, application_id, version, _, _, _ in rows],
+        )
+
+    return len(rows)
+
+
+def fold_transitions(state, transitions):
+    """
+    Apply transitions (oldest first) to a snapshot state.
+    State: {'stage_id', 'entered_at' (iso), 'stages': {stage_id: [visits, seconds]}}
+    """
+    stages = {stage_id: list(totals) for stage_id, totals in state['stages'].items()}
+    stage_id = state['stage_id']
+    entered_at = datetime.fromisoformat(state['entered_at'])
+
+    for transition in transitions:
+        totals = stages.setdefault(str(transition.from_stage_id), [1, 0])
+        totals[1] += max(int((transition.moved_at - entered_at).total_seconds()), 0)
+        stages.setdefault(str(transition.to_stage_id), [0, 0])[0] += 1
+        stage_id = transition.to_stage_id
+        entered_at = transition.moved_at
+
+    return {'stage_id': stage_id, 'entered_at': entered_at.isoformat(), 'stages': stages}
+
+
+def replay_pipeline_state(pipeline_applicant):
+    """
+    Rebuild an applicant's folded history from the latest snapshot plus the
+    transitions logged after it (at most SNAPSHOT_INTERVAL of them).
+    Returns: (state, id of the last transition folded in or None)
+    """
+    snapshot = pipeline_applicant.snapshots.first()
+    tail = pipeline_applicant.transitions.order_by('moved_at', 'id')
+    if snapshot:
+        tail = tail.filter(id__gt=snapshot.last_transition_id)
+    tail = list(tail)
+
+    if snapshot:
+        state = snapshot.state
+        last_transition_id = snapshot.last_transition_id
+    else:
+        first_stage_id = tail[0].from_stage_id if tail else pipeline_applicant.current_stage_id
+        state = {
+            'stage_id': first_stage_id,
+            'entered_at': pipeline_applicant.application.applied_at.isoformat(),
+            'stages': {str(first_stage_id): [1, 0]},
+        }
+        last_transition_id = None
+
+    if tail:
+        last_transition_id = tail[-1].id
+    return fold_transitions(state, tail), last_transition_id
+
+
+def take_snapshot(pipeline_applicant, version):
+    """Store the folded history of pipeline_applicant as of version"""
+    state, last_transition_id = replay_pipeline_state(pipeline_applicant)
+    if last_transition_id is None:
+        return None
+    snapshot, _ = PipelineSnapshot.objects.get_or_create(
+        applicant_pipeline=pipeline_applicant,
+        version=version,
+        defaults={'last_transition_id': last_transition_id, 'state': state},
+    )
+    return snapshot
+
+
+def stage_time_summary(state, stages, now=None):
+    """
+    Visits and days spent per stage from a folded state, counting the time
+    in the current stage up to now.
+    Returns: list of {'stage', 'visits', 'days'} in stage order
+    """
+    now = now or timezone.now()
+    current_seconds = max(
+        int((now - datetime.fromisoformat(state['entered_at'])).total_seconds()), 0
+    )
+    summary = []
+    for stage in stages:
+        visits, seconds = state['stages'].get(str(stage.id), [0, 0])
+        if stage.id == state['stage_id']:
+            seconds += current_seconds
+        if visits:
+            summary.append({
+                'stage': stage,
+                'visits': visits,
+                'days': round(seconds / 86400, 1),
+            })
+    return summary
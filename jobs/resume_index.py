@@ -0,0 +1,145 @@
+# jobs/resume_index.py
+"""
+Background extraction of resume text into the jobs_resume_fts index
+(migration 0017), so recruiters can search resumes without any PDF being
+opened at request time. Extraction needs pypdf (pip install pypdf).
+"""
+import logging
+
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .fulltext import RankedSearchResults
+from .models import Application, ResumeText
+from .storage import hash_content, hash_from_name
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'jobs_resume_fts'
+# Longest text kept per resume; anything past this is almost never a resume
+MAX_TEXT_LENGTH = 200_000
+# Marks the matched words in snippets; swapped for <mark> after escaping
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+
+
+def hash_resume(field_file):
+    """
+    sha256 hex digest of a stored resume. Content-addressed names already
+    carry it, so only legacy files are read.
+    """
+    content_hash = hash_from_name(field_file.name)
+    if content_hash:
+        return content_hash
+    with field_file.open('rb') as handle:
+        return hash_content(handle)
+
+
+def extract_pdf_text(field_file):
+    from pypdf import PdfReader
+
+    with field_file.open('rb') as handle:
+        reader = PdfReader(handle)
+        text = '\n'.join(page.extract_text() or '' for page in reader.pages)
+    return text[:MAX_TEXT_LENGTH]
+
+
+def link_resumes(limit):
+    """
+    Hash resumes that have no ResumeText yet and point their applications at
+    the one for that content, creating it as pending if it is new. Missing
+    files get a failed row of their own so they are not retried forever.
+    Returns: number of applications linked
+    """
+    applications = list(
+        Application.objects.filter(resume_text__isnull=True)
+        .exclude(resume='').exclude(resume__isnull=True)
+        .order_by('id')[:limit]
+    )
+    for application in applications:
+        try:
+            content_hash = hash_resume(application.resume)
+            defaults = {}
+        except FileNotFoundError:
+            content_hash = f'missing:{application.id}'
+            defaults = {'status': 'failed', 'error': f'{application.resume.name} not found'}
+        resume_text, _ = ResumeText.objects.get_or_create(content_hash=content_hash, defaults=defaults)
+        Application.objects.filter(pk=application.pk).update(resume_text=resume_text)
+    return len(applications)
+
+
+def extract_pending(limit):
+    """
+    Extract text for pending ResumeTexts from any application's copy of the
+    file. Each distinct file is only ever read once.
+    Returns: {'extracted': n, 'failed': n}
+    """
+    results = {'extracted': 0, 'failed': 0}
+    pending = ResumeText.objects.filter(status='pending').order_by('id')[:limit]
+    for resume_text in pending:
+        source = resume_text.applications.exclude(resume='').first()
+        try:
+            if source is None:
+                raise FileNotFoundError('No application has this resume any more')
+            text = extract_pdf_text(source.resume)
+        except ImportError:
+            raise
+        except Exception as e:
+            logger.warning('Could not extract resume %s: %s', resume_text.content_hash, e)
+            ResumeText.objects.filter(pk=resume_text.pk).update(status='failed', error=str(e))
+            results['failed'] += 1
+            continue
+        ResumeText.objects.filter(pk=resume_text.pk).update(
+            status='extracted', text=text, error='', extracted_at=timezone.now()
+        )
+        results['extracted'] += 1
+    return results
+
+
+def process_resumes(limit=50):
+    """
+    One worker pass: link up to limit new resumes, then extract up to limit
+    pending ones.
+    Returns: {'linked': n, 'extracted': n, 'failed': n}
+    """
+    results = {'linked': link_resumes(limit)}
+    results.update(extract_pending(limit))
+    return results
+
+
+def highlight(snippet):
+    """Escape a search snippet and turn its match markers into <mark> tags"""
+    return mark_safe(
+        escape(snippet).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+class ResumeSearchResults(RankedSearchResults):
+    """
+    Applications to the recruiter's jobs whose resume matches, best first,
+    each with a .resume_snippet around the matched words
+    """
+    select_sql = (
+        f"a.id, snippet({FTS_TABLE}, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 16)"
+    )
+    rank_sql = f'bm25({FTS_TABLE}), a.applied_at DESC'
+
+    def __init__(self, recruiter, text):
+        super().__init__(text)
+        self.from_sql = (
+            f'FROM {FTS_TABLE} '
+            f'JOIN jobs_application a ON a.resume_text_id = {FTS_TABLE}.rowid '
+            f'JOIN jobs_job j ON j.id = a.job_id '
+            f'WHERE {FTS_TABLE} MATCH %s AND j.employer_id = %s'
+        )
+        self.from_params = (recruiter.id,)
+
+    def load(self, rows):
+        found = Application.objects.with_candidate().in_bulk([row[0] for row in rows])
+        applications = []
+        for application_id, snippet in rows:
+            if application_id in found:
+                application = found[application_id]
+                application.resume_snippet = highlight(snippet)
+                applications.append(application)
+        return applications
@@ -0,0 +1,148 @@
+# jobs/smtp_standin.py
+"""
+In-process SMTP server for tests and delivery benchmarks, so messaging can
+be exercised without Gmail or real recruiter credentials. Needs aiosmtpd
+(pip install aiosmtpd).
+"""
+import asyncio
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from email import message_from_bytes
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+STANDIN_PASSWORD = 'standin'
+
+
+@dataclass
+class FaultInjection:
+    """
+    Misbehaviour for the stand-in server. Rates are probabilities from 0 to 1,
+    drawn from a seeded generator so runs are repeatable.
+    """
+    accept_delay: float = 0.0  # Seconds before answering EHLO, like an overloaded server
+    data_delay: float = 0.0  # Seconds spent accepting each message
+    auth_failure_rate: float = 0.0
+    disconnect_rate: float = 0.0  # Drop the connection instead of accepting a message
+    fail_users: set = field(default_factory=set)  # Logins that always fail
+    seed: int = 0
+
+
+class StandinHandler:
+    def __init__(self, faults):
+        self.faults = faults
+        self.random = random.Random(faults.seed)
+        self.lock = threading.Lock()
+        self.delivered = []  # (received at, subject, recipients)
+        self.logins = 0
+        self.auth_failures = 0
+        self.disconnects = 0
+        self.receiving = 0  # Messages being accepted right now
+        self.peak_receiving = 0
+
+    def roll(self, rate):
+        with self.lock:
+            return rate and self.random.random() < rate
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        if self.faults.accept_delay:
+            await asyncio.sleep(self.faults.accept_delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        with self.lock:
+            self.receiving += 1
+            self.peak_receiving = max(self.peak_receiving, self.receiving)
+        try:
+            return await self.receive(server, envelope)
+        finally:
+            with self.lock:
+                self.receiving -= 1
+
+    async def receive(self, server, envelope):
+        if self.faults.data_delay:
+            await asyncio.sleep(self.faults.data_delay)
+        if self.roll(self.faults.disconnect_rate):
+            with self.lock:
+                self.disconnects += 1
+            server.transport.close()
+            return '421 Closing connection'
+        subject = message_from_bytes(envelope.content).get('Subject', '')
+        with self.lock:
+            self.delivered.append((time.time(), subject, list(envelope.rcpt_tos)))
+        return '250 OK'
+
+    def authenticate(self, server, session, envelope, mechanism, auth_data):
+        login = auth_data.login.decode() if isinstance(auth_data.login, bytes) else auth_data.login
+        failed = login in self.faults.fail_users or self.roll(self.faults.auth_failure_rate)
+        with self.lock:
+            self.logins += 1
+            if failed:
+                self.auth_failures += 1
+        # handled=False lets aiosmtpd send the 535 reply itself
+        return AuthResult(success=not failed, handled=False)
+
+
+def free_port(hostname='127.0.0.1'):
+    with socket.socket() as probe:
+        probe.bind((hostname, 0))
+        return probe.getsockname()[1]
+
+
+class LocalSMTPServer:
+    """
+    aiosmtpd server on a background thread, usable as a context manager:
+
+        with LocalSMTPServer(faults=FaultInjection(disconnect_rate=0.1)) as server:
+            server.configure_profile(recruiter.profile)
+            ...
+            server.delivered
+    """
+
+    def __init__(self, port=None, faults=None, hostname='127.0.0.1'):
+        self.hostname = hostname
+        self.port = port or free_port(hostname)
+        self.handler = StandinHandler(faults or FaultInjection())
+        self.controller = Controller(
+            self.handler,
+            hostname=hostname,
+            port=self.port,
+            auth_require_tls=False,
+            authenticator=self.handler.authenticate,
+        )
+
+    @property
+    def delivered(self):
+        with self.handler.lock:
+            return list(self.handler.delivered)
+
+    def start(self):
+        self.controller.start()
+        return self
+
+    def stop(self):
+        self.controller.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def configure_profile(self, profile, save=True):
+        """Point a recruiter's UserProfile at this server"""
+        profile.email_host = self.hostname
+        profile.email_port = self.port
+        profile.email_use_tls = False
+        profile.email_host_password = STANDIN_PASSWORD
+        profile.email_configured = True
+        if not profile.email_host_user:
+            profile.email_host_user = f'{profile.user.username}@example.com'
+        if save:
+            profile.save()
+        return profile
@@ -0,0 +1,112 @@
+# jobs/storage.py
+"""
+Content-addressed storage for Application.resume. Each upload is saved
+under the sha256 of its bytes, so the same PDF uploaded for ten
+applications is one file on disk.
+
+Every blob has a ResumeBlob row counting the applications that use it.
+Uploads and deletions both start with a write to that row, which locks
+it (the whole database on SQLite) until their transaction ends:
+
+- saving increments the count, then writes the file if it is missing;
+- releasing decrements it and, after commit, deletes the row and the
+  file together, but only while the count is still zero.
+
+So a blob can never be deleted between an upload finding it on disk and
+the upload's reference being counted.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = 'resumes'
+BLOB_NAME_PATTERN = re.compile(rf'^{BLOB_PREFIX}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.\w+)?$')
+
+
+def hash_content(content):
+    """sha256 hex digest of a File, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_name(content_hash, extension=''):
+    return f'{BLOB_PREFIX}/{content_hash[:2]}/{content_hash}{extension.lower()}'
+
+
+def hash_from_name(name):
+    """The content hash a blob name encodes, or None for other file names"""
+    match = BLOB_NAME_PATTERN.match(name or '')
+    return match.group(1) if match else None
+
+
+def acquire_blob(name, count=1):
+    """
+    Add count references to the blob, creating its row if needed. Call
+    inside a transaction; the row stays locked until it ends.
+    """
+    from .models import ResumeBlob
+
+    if ResumeBlob.objects.filter(name=name).update(ref_count=F('ref_count') + count):
+        return
+    try:
+        with transaction.atomic():
+            ResumeBlob.objects.create(name=name, ref_count=count)
+    except IntegrityError:
+        # Another upload created it first
+        ResumeBlob.objects.filter(name=name).update(ref_count=F('ref_count') + count)
+
+
+def release_blob(name):
+    """
+    Drop one reference to a content-addressed resume. Once the transaction
+    commits, the blob is deleted if nothing has taken a new reference.
+    Other file names are left alone.
+    """
+    from .models import ResumeBlob
+
+    if not hash_from_name(name):
+        return
+    ResumeBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    transaction.on_commit(lambda: collect_blob(name))
+
+
+def collect_blob(name):
+    """Delete the blob and its row if its count is zero. Returns: whether it was deleted"""
+    from .models import ResumeBlob
+
+    with transaction.atomic():
+        # The DELETE rechecks the count under the row lock, so it loses to an
+        # upload that took a reference after this blob was released
+        deleted, _ = ResumeBlob.objects.filter(name=name, ref_count=0).delete()
+        if deleted:
+            resume_storage.delete(name)
+    return bool(deleted)
+
+
+@deconstructible(path='jobs.storage.ContentAddressedStorage')
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each file as resumes/<first two hex digits>/<sha256><extension>,
+    ignoring the uploaded name. Each save is one counted reference; saving
+    content that is already stored does not write it again.
+    """
+
+    def _save(self, name, content):
+        name = blob_name(hash_content(content), os.path.splitext(name)[1])
+        with transaction.atomic():
+            acquire_blob(name)
+            # Checked while holding the row, so a concurrent release cannot
+            # delete the file after this finds it
+            if not self.exists(name):
+                super()._save(name, content)
+        return name
+
+
+resume_storage = ContentAddressedStorage()
@@ -1,3 +1,1462 @@
-from django.test import TestCase
+import shutil
+import socket
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.messages import get_messages
+from django.core.mail import EmailMessage
+from django.template import engines
+from django.template.loader import get_template
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import NotificationCounter, UserProfile
+
+from .analytics import build_stage_funnel
+from .archival import archive_messages
+from .async_delivery import process_due_entries_async
+from .dashboard import applicant_locations, recruiter_stats_key
+from .email_rendering import CANDIDATE_EMAIL_TEMPLATE, CandidateEmailRenderer, document_for_message
+from .events import PipelineEventBroker
+from .mail_pool import SMTPConnectionPool, get_smtp_pool
+from .messaging import compose_bulk_messages
+from .models import (
+    Job, Application, ApplicantPipeline, ArchivedMessage, EmailOutbox, Message, PipelineSnapshot, PipelineStage,
+    PipelineTransition, PipelineStageDailyStats, ResumeBlob, ResumeText, Thread,
+)
+from .outbox import MAX_ATTEMPTS, enqueue_candidate_emails, process_due_entries
+from .pipeline import (
+    SNAPSHOT_INTERVAL, build_pipeline_board, fold_transitions, move_applicant_to_stage, move_applicants_to_stage,
+    replay_pipeline_state,
+)
+from .resume_index import process_resumes
+from .storage import resume_storage
+
+
+def make_recruiter(username="recruiter", **fields):
+    """A user whose profile is marked as a recruiter"""
+    recruiter = User.objects.create(username=username, **fields)
+    recruiter.profile.user_type = "recruiter"
+    recruiter.profile.save()
+    return recruiter
+
+
+def make_job(employer, title="Backend Engineer", **fields):
+    """A job posted by employer, with the default pipeline stages"""
+    fields = {"company": "Jobify", "location": "Atlanta", "description": "Build", **fields}
+    job = Job.objects.create(title=title, employer=employer, **fields)
+    job.create_default_pipeline_stages()
+    return job
+
+
+def make_application(job, username, pipeline=True, applied_at=None, **fields):
+    """
+    An application to job from a new candidate called username, placed in
+    the first stage of the job's pipeline unless pipeline is False
+    """
+    fields.setdefault("application_note", "Hi")
+    application = Application.objects.create(job=job, applicant=User.objects.create(username=username), **fields)
+    if applied_at:
+        Application.objects.filter(pk=application.pk).update(applied_at=applied_at)
+        application.applied_at = applied_at
+    if pipeline:
+        application.create_pipeline_entry()
+    return application
+
+
+class PipelineBoardTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter()
+        self.job = make_job(self.recruiter)
+        self.client.force_login(self.recruiter)
+
+    def add_applicants(self, count, start=0):
+        return [
+            make_application(self.job, f"candidate-{number}").pipeline
+            for number in range(start, start + count)
+        ]
+
+    def test_board_groups_applicants_by_stage_in_fixed_queries(self):
+        pipelines = self.add_applicants(2)
+        screening = self.job.pipeline_stages.get(name="Screening")
+        ApplicantPipeline.objects.filter(pk=pipelines[1].pk).update(current_stage=screening)
+
+        with self.assertNumQueries(2):
+            board = build_pipeline_board(self.job)
+        self.assertEqual(
+            [column["stage"].name for column in board],
+            ["Applied", "Screening", "Interview", "Offer", "Hired", "Rejected"],
+        )
+        self.assertEqual([p.application.applicant.username for p in board[0]["applicants"]], ["candidate-0"])
+        self.assertEqual([p.application.applicant.username for p in board[1]["applicants"]], ["candidate-1"])
+
+        self.add_applicants(10, start=2)
+        with self.assertNumQueries(2):
+            board = build_pipeline_board(self.job)
+            # Rendering a card touches only what the board already joined
+            [p.application.candidate_name for column in board for p in column["applicants"]]
+        self.assertEqual(len(board[0]["applicants"]), 11)
+
+    def test_board_json_shape(self):
+        [pipeline] = self.add_applicants(1)
+        response = self.client.get(reverse("job_pipeline_data", kwargs={"pk": self.job.pk}))
+
+        data = response.json()
+        self.assertTrue(data["success"])
+        self.assertEqual(data["job_id"], self.job.id)
+        applied = data["stages"][0]
+        self.assertEqual(
+            set(applied), {"id", "name", "color", "order", "count", "applicants"}
+        )
+        self.assertEqual((applied["name"], applied["count"]), ("Applied", 1))
+        [card] = applied["applicants"]
+        self.assertEqual(card["application_id"], pipeline.application_id)
+        self.assertEqual(card["candidate_name"], "candidate-0")
+        self.assertEqual(card["version"], 0)
+        self.assertEqual(card["detail_url"], reverse("applicant_detail", kwargs={"pk": pipeline.application_id}))
+
+    def test_other_recruiter_cannot_see_the_board(self):
+        self.client.force_login(User.objects.create(username="other"))
+        self.assertEqual(self.client.get(reverse("job_pipeline", kwargs={"pk": self.job.pk})).status_code, 403)
+        self.assertEqual(self.client.get(reverse("job_pipeline_data", kwargs={"pk": self.job.pk})).status_code, 403)
+        self.assertEqual(self.client.get(reverse("job_pipeline_data", kwargs={"pk": 999})).status_code, 404)
+
+
+class RecordingBackend:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, event):
+        self.published.append((channel, event))
+
+
+class PipelineEventTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter()
+        self.job = make_job(self.recruiter)
+        self.url = reverse("pipeline_events", kwargs={"pk": self.job.pk})
+
+    def test_events_are_published_only_when_the_transaction_commits(self):
+        backend = RecordingBackend()
+        broker = PipelineEventBroker(backend)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    broker.publish_on_commit(self.job.id, {"type": "move"})
+                    raise RuntimeError("rolled back")
+            except RuntimeError:
+                pass
+        self.assertEqual(backend.published, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                broker.publish_on_commit(self.job.id, {"type": "move"})
+        self.assertEqual(backend.published, [(f"pipeline:{self.job.id}", {"type": "move"})])
+
+    def test_stream_is_refused_to_other_recruiters(self):
+        self.client.force_login(User.objects.create(username="other"))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    @override_settings(PIPELINE_EVENTS_ENABLED=True)
+    def test_stream_is_off_under_wsgi_and_the_board_polls(self):
+        self.client.force_login(self.recruiter)
+        # The test client is a WSGI request, like runserver or PythonAnywhere
+        self.assertEqual(self.client.get(self.url).status_code, 204)
+
+        response = self.client.get(reverse("job_pipeline", kwargs={"pk": self.job.pk}))
+        self.assertFalse(response.context["live_updates"])
+        self.assertNotContains(response, "data-events-url")
+
+    @override_settings(PIPELINE_EVENTS_ENABLED=True)
+    async def test_board_subscribes_when_served_over_asgi(self):
+        await self.async_client.aforce_login(self.recruiter)
+        response = await self.async_client.get(reverse("job_pipeline", kwargs={"pk": self.job.pk}))
+        self.assertTrue(response.context["live_updates"])
+        self.assertContains(response, f'data-events-url="{self.url}"')
+
+
+class MoveApplicantTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter()
+        self.job = make_job(self.recruiter)
+        self.applied = self.job.pipeline_stages.get(name="Applied")
+        self.interview = self.job.pipeline_stages.get(name="Interview")
+
+        self.application = make_application(self.job, "candidate")
+        self.pipeline = self.application.pipeline
+        self.url = reverse("move_applicant", args=[self.application.id])
+
+        self.client.force_login(self.recruiter)
+
+    def test_move_stays_within_query_budget(self):
+        # The first move of the day also creates today's rollup rows
+        self.client.post(self.url, {"new_stage_id": self.interview.id, "version": 0})
+
+        # session + user, joined ownership lookup, target stage,
+        # conditional UPDATE, transition INSERT, one stage counter UPDATE,
+        # two rollup UPDATEs (plus the savepoint pair around the move)
+        with self.assertNumQueries(11):
+            response = self.client.post(
+                self.url, {"new_stage_id": self.applied.id, "version": 1}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 2)
+        self.pipeline.refresh_from_db()
+        self.assertEqual(self.pipeline.current_stage, self.applied)
+        self.assertEqual(self.pipeline.version, 2)
+        self.assertEqual(PipelineTransition.objects.count(), 2)
+
+    def test_stale_version_returns_conflict(self):
+        ApplicantPipeline.objects.filter(pk=self.pipeline.pk).update(version=3)
+
+        response = self.client.post(
+            self.url, {"new_stage_id": self.interview.id, "version": 0}
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.json()["conflict"])
+        self.pipeline.refresh_from_db()
+        self.assertEqual(self.pipeline.current_stage, self.applied)
+        self.assertFalse(PipelineTransition.objects.exists())
+
+    def test_malformed_stage_is_rejected(self):
+        for new_stage_id in ("abc", "", "-1"):
+            with self.subTest(new_stage_id=new_stage_id):
+                response = self.client.post(self.url, {"new_stage_id": new_stage_id})
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["message"], "Invalid stage")
+        self.assertFalse(PipelineTransition.objects.exists())
+
+    def test_other_recruiter_cannot_move(self):
+        self.client.force_login(User.objects.create(username="other"))
+
+        response = self.client.post(self.url, {"new_stage_id": self.interview.id})
+
+        self.assertEqual(response.status_code, 403)
+
+
+class BulkMoveTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter()
+        self.job = make_job(self.recruiter)
+        self.applied = self.job.pipeline_stages.get(name="Applied")
+        self.rejected = self.job.pipeline_stages.get(name="Rejected")
+        self.other_job = make_job(make_recruiter("other-recruiter"), "Elsewhere", company="Other")
+        self.pipelines = [make_application(self.job, f"candidate-{number}").pipeline for number in range(3)]
+        self.outsider = make_application(self.other_job, "outsider").pipeline
+        self.url = reverse("bulk_move_applicants", kwargs={"pk": self.job.pk})
+        self.client.force_login(self.recruiter)
+
+    def move(self, pipelines, stage):
+        return self.client.post(self.url, {
+            "application_ids": [pipeline.application_id for pipeline in pipelines],
+            "new_stage_id": stage.id,
+        })
+
+    def counts(self, *stages):
+        return [PipelineStage.objects.get(pk=stage.pk).applicant_count for stage in stages]
+
+    def test_moves_each_applicant_once_and_keeps_counts(self):
+        first, second, third = self.pipelines
+        self.move([third], self.rejected)
+        self.assertEqual(self.counts(self.applied, self.rejected), [2, 1])
+
+        # third is already rejected and the outsider belongs to another job
+        response = self.move([first, second, third, self.outsider], self.rejected)
+
+        self.assertEqual(response.json()["moved_count"], 2)
+        self.assertEqual(self.counts(self.applied, self.rejected), [0, 3])
+        self.assertEqual(PipelineTransition.objects.filter(to_stage=self.rejected).count(), 3)
+        self.assertEqual(
+            dict(ApplicantPipeline.objects.filter(current_stage__job=self.job).values_list("id", "version")),
+            {first.id: 1, second.id: 1, third.id: 1},
+        )
+        self.outsider.refresh_from_db()
+        self.assertEqual((self.outsider.current_stage.name, self.outsider.version), ("Applied", 0))
+        self.assertFalse(PipelineTransition.objects.filter(applicant_pipeline=self.outsider).exists())
+
+    def test_malformed_stage_is_rejected(self):
+        response = self.client.post(self.url, {
+            "application_ids": [self.pipelines[0].application_id], "new_stage_id": "abc",
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Invalid stage")
+        self.assertFalse(PipelineTransition.objects.exists())
+
+    def test_other_recruiter_is_refused(self):
+        self.client.force_login(self.other_job.employer)
+        response = self.move(self.pipelines, self.rejected)
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.counts(self.applied, self.rejected), [3, 0])
+        self.assertFalse(PipelineTransition.objects.exists())
+
+    def test_bulk_message_only_reaches_this_jobs_applicants(self):
+        response = self.client.post(reverse("bulk_send_messages", kwargs={"pk": self.job.pk}), {
+            "application_ids": [self.pipelines[0].application_id, self.outsider.application_id],
+            "subject": "Hello {candidate_name}",
+            "content": "Thanks for applying to {job_title}",
+            "message_type": "application",
+        })
+
+        self.assertRedirects(response, reverse("sent_messages"))
+        self.assertEqual(
+            list(Message.objects.values_list("recipient__username", "subject")),
+            [("candidate-0", "Hello candidate-0")],
+        )
+
+        self.client.force_login(self.other_job.employer)
+        response = self.client.get(reverse("bulk_send_messages", kwargs={"pk": self.job.pk}))
+        self.assertEqual(response.status_code, 403)
+
+
+class DenormalizedCounterTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter()
+        self.job = make_job(self.recruiter)
+        self.applied = self.job.pipeline_stages.get(name="Applied")
+        self.screening = self.job.pipeline_stages.get(name="Screening")
+        self.applications = [make_application(self.job, f"candidate-{number}") for number in range(3)]
+
+    def counts(self):
+        job = Job.objects.get(pk=self.job.pk)
+        stages = dict(self.job.pipeline_stages.values_list("name", "applicant_count"))
+        return job.application_count, stages["Applied"], stages["Screening"]
+
+    def test_applying_and_deleting_applications(self):
+        self.assertEqual(self.counts(), (3, 3, 0))
+
+        self.applications[0].delete()
+
+        self.assertEqual(self.counts(), (2, 2, 0))
+
+    def test_single_and_bulk_moves_shift_stage_counts(self):
+        first, second, third = self.applications
+        move_applicant_to_stage(first.pipeline, self.screening, self.recruiter)
+        self.assertEqual(self.counts(), (3, 2, 1))
+
+        move_applicants_to_stage(self.screening, [first.id, second.id, third.id], self.recruiter)
+        self.assertEqual(self.counts(), (3, 0, 3))
+
+        move_applicants_to_stage(self.applied, [second.id], self.recruiter)
+        self.assertEqual(self.counts(), (3, 1, 2))
+
+    def test_cascade_deletes_leave_other_counts_alone(self):
+        other_job = make_job(self.recruiter, "Frontend Engineer")
+        make_application(other_job, "elsewhere")
+        move_applicant_to_stage(self.applications[0].pipeline, self.screening, self.recruiter)
+
+        # Deleting a stage takes its applicants with it
+        self.screening.delete()
+        self.assertEqual(
+            dict(self.job.pipeline_stages.values_list("name", "applicant_count"))["Applied"], 2
+        )
+        self.assertEqual(ApplicantPipeline.objects.filter(current_stage__job=self.job).count(), 2)
+
+        self.job.delete()
+        other_job.refresh_from_db()
+        self.assertEqual(other_job.application_count, 1)
+        self.assertEqual(other_job.pipeline_stages.get(name="Applied").applicant_count, 1)
+        self.assertEqual(PipelineStage.objects.filter(applicant_count__gt=0).count(), 1)
+
+    def test_reconcile_counters_repairs_drift(self):
+        Job.objects.filter(pk=self.job.pk).update(application_count=7)
+        PipelineStage.objects.filter(pk=self.applied.pk).update(applicant_count=0)
+        PipelineStage.objects.filter(pk=self.screening.pk).update(applicant_count=4)
+
+        out = StringIO()
+        call_command("reconcile_counters", job=self.job.pk, stdout=out)
+
+        self.assertEqual(self.counts(), (3, 3, 0))
+        self.assertIn("Reconciled 1 job counts, 2 stage counts", out.getvalue())
+
+        out = StringIO()
+        call_command("reconcile_counters", job=self.job.pk, stdout=out)
+        self.assertIn("Reconciled 0 job counts, 0 stage counts", out.getvalue())
+
+
+class PipelineSnapshotTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter()
+        self.job = make_job(self.recruiter)
+        self.applied = self.job.pipeline_stages.get(name="Applied")
+        self.screening = self.job.pipeline_stages.get(name="Screening")
+        applied_at = timezone.now() - timedelta(days=3)
+        self.pipelines = [
+            make_application(self.job, f"candidate-{number}", applied_at=applied_at).pipeline
+            for number in range(2)
+        ]
+
+    def bounce(self, pipeline, moves):
+        for number in range(moves):
+            move_applicant_to_stage(pipeline, self.screening if number % 2 == 0 else self.applied, self.recruiter)
+
+    def full_fold(self, pipeline):
+        initial = {
+            "stage_id": self.applied.id,
+            "entered_at": pipeline.application.applied_at.isoformat(),
+            "stages": {str(self.applied.id): [1, 0]},
+        }
+        return fold_transitions(initial, pipeline.transitions.order_by("moved_at", "id"))
+
+    def test_single_moves_snapshot_every_interval(self):
+        pipeline = self.pipelines[0]
+        self.bounce(pipeline, 2 * SNAPSHOT_INTERVAL + 3)
+
+        snapshots = list(pipeline.snapshots.order_by("version"))
+        self.assertEqual([snapshot.version for snapshot in snapshots], [SNAPSHOT_INTERVAL, 2 * SNAPSHOT_INTERVAL])
+        transitions = list(pipeline.transitions.order_by("moved_at", "id"))
+        self.assertEqual(
+            [snapshot.last_transition_id for snapshot in snapshots],
+            [transitions[SNAPSHOT_INTERVAL - 1].id, transitions[2 * SNAPSHOT_INTERVAL - 1].id],
+        )
+
+    def test_bulk_moves_snapshot_pipelines_reaching_the_interval(self):
+        ahead, behind = self.pipelines
+        move_applicant_to_stage(ahead, self.screening, self.recruiter)
+        application_ids = [pipeline.application_id for pipeline in self.pipelines]
+        for number in range(SNAPSHOT_INTERVAL - 1):
+            move_applicants_to_stage(self.applied if number % 2 == 0 else self.screening, application_ids, self.recruiter)
+
+        self.assertEqual(
+            list(PipelineSnapshot.objects.values_list("applicant_pipeline_id", "version")),
+            [(ahead.id, SNAPSHOT_INTERVAL)],
+        )
+        self.assertEqual(replay_pipeline_state(ahead)[0], self.full_fold(ahead))
+
+    def test_replay_from_snapshot_matches_a_full_fold(self):
+        pipeline = self.pipelines[0]
+        self.bounce(pipeline, SNAPSHOT_INTERVAL + 3)
+        last_transition = pipeline.transitions.latest("moved_at", "id")
+
+        # Latest snapshot, then the three transitions logged after it
+        with self.assertNumQueries(2):
+            state, last_transition_id = replay_pipeline_state(pipeline)
+
+        self.assertEqual(last_transition_id, last_transition.id)
+        self.assertEqual(state, self.full_fold(pipeline))
+        self.assertEqual(state["stage_id"], self.screening.id)
+        self.assertEqual(state["stages"][str(self.screening.id)][0], SNAPSHOT_INTERVAL // 2 + 2)
+        self.assertGreaterEqual(state["stages"][str(self.applied.id)][1], 3 * 86400)
+
+    def test_applicant_detail_shows_history_and_time_in_stage(self):
+        pipeline = self.pipelines[0]
+        self.bounce(pipeline, 3)
+        self.client.force_login(self.recruiter)
+
+        response = self.client.get(reverse("applicant_detail", kwargs={"pk": pipeline.application_id}))
+
+        self.assertContains(response, "Time in Each Stage")
+        self.assertContains(response, "(2 visits)")
+        self.assertEqual(len(response.context["stage_history"]), 3)
+        summary = {row["stage"].name: (row["visits"], row["days"]) for row in response.context["stage_time_summary"]}
+        self.assertEqual(summary, {"Applied": (2, 3.0), "Screening": (2, 0.0)})
+
+
+class PipelineAnalyticsTests(TestCase):
+    ROLLUP_FIELDS = [
+        "stage_id", "day", "entered_count", "exited_count", "advanced_count", "rejected_count",
+        "time_in_stage_seconds", "time_under_1d", "time_1d_3d", "time_3d_7d", "time_7d_14d",
+        "time_14d_30d", "time_over_30d",
+    ]
+
+    def setUp(self):
+        self.recruiter = make_recruiter()
+        self.job = make_job(self.recruiter)
+        self.stages = {stage.name: stage for stage in self.job.pipeline_stages.all()}
+        applied_at = timezone.now() - timedelta(days=2)
+        self.applications = [
+            make_application(self.job, f"candidate-{number}", applied_at=applied_at) for number in range(4)
+        ]
+        self.client.force_login(self.recruiter)
+
+    def move(self, application, stage_name):
+        self.client.post(reverse("move_applicant", args=[application.id]), {"new_stage_id": self.stages[stage_name].id})
+
+    def rollups(self):
+        return sorted(PipelineStageDailyStats.objects.values_list(*self.ROLLUP_FIELDS))
+
+    def test_incremental_rollups_match_a_full_rebuild(self):
+        first, second, third, _ = self.applications
+        self.move(first, "Screening")
+        self.client.post(reverse("bulk_move_applicants", kwargs={"pk": self.job.pk}), {
+            "application_ids": [second.id, third.id], "new_stage_id": self.stages["Rejected"].id,
+        })
+        self.move(first, "Interview")
+        self.move(first, "Screening")
+
+        incremental = self.rollups()
+        call_command("rebuild_pipeline_stats", stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+        funnel = {row["stage"].name: row for row in build_stage_funnel(self.job)}
+        applied = funnel["Applied"]
+        self.assertEqual((applied["entered"], applied["advanced"], applied["rejected"]), (4, 1, 2))
+        self.assertEqual(applied["median_days"], 2.0)
+        self.assertEqual((funnel["Screening"]["entered"], funnel["Screening"]["advanced"]), (2, 1))
+
+    def test_analytics_view(self):
+        self.move(self.applications[0], "Screening")
+        url = reverse("pipeline_analytics", kwargs={"pk": self.job.pk})
+
+        response = self.client.get(url)
+        self.assertContains(response, "25.0%")
+        self.assertContains(response, "~2.0 days")
+        self.assertEqual(self.client.get(url, {"days": 7}).status_code, 200)
+        self.assertEqual(self.client.get(url, {"days": 1}).context["funnel"][0]["entered"], 0)
+
+        self.client.force_login(User.objects.create(username="other"))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class SetupExistingPipelinesTests(TestCase):
+    def setUp(self):
+        recruiter = make_recruiter()
+        self.applied_at = timezone.now() - timedelta(days=3)
+        for job_number in range(3):
+            job = make_job(recruiter, f"Job {job_number}")
+            for number in range(4):
+                applicant, _ = User.objects.get_or_create(username=f"candidate-{number}")
+                Application.objects.create(job=job, applicant=applicant, application_note="Hi")
+        Application.objects.update(applied_at=self.applied_at)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.checkpoint = f"{directory}/checkpoint"
+
+    def run_command(self):
+        call_command("setup_exiting_pipelines", chunk_size=5, checkpoint=self.checkpoint, stdout=StringIO())
+
+    def state(self):
+        return (
+            sorted(PipelineStage.objects.values_list("id", "applicant_count")),
+            sorted(PipelineStageDailyStats.objects.values_list("stage_id", "day", "entered_count")),
+        )
+
+    def test_rerunning_or_resuming_does_not_inflate_counts(self):
+        self.run_command()
+        stage_counts, rollups = self.state()
+        self.assertEqual(ApplicantPipeline.objects.count(), 12)
+        self.assertEqual(sum(count for _, count in stage_counts), 12)
+        self.assertEqual(sum(count for _, _, count in rollups), 12)
+        self.assertEqual({day for _, day, _ in rollups}, {timezone.localdate(self.applied_at)})
+        self.assertEqual(set(ApplicantPipeline.objects.values_list("date_moved", flat=True)), {self.applied_at})
+
+        self.run_command()
+        # A crash after a chunk committed but before its checkpoint was written
+        with open(self.checkpoint, "w") as checkpoint:
+            checkpoint.write("pipelines 0")
+        self.run_command()
+
+        self.assertEqual(ApplicantPipeline.objects.count(), 12)
+        self.assertEqual(self.state(), (stage_counts, rollups))
+
+        call_command("rebuild_pipeline_stats", stdout=StringIO())
+        self.assertEqual(self.state(), (stage_counts, rollups))
+
+
+try:
+    from .smtp_standin import FaultInjection, LocalSMTPServer
+except ImportError:  # aiosmtpd is only needed for the delivery tests
+    LocalSMTPServer = None
+
+
+@skipUnless(LocalSMTPServer, "aiosmtpd is not installed")
+class OutboxDeliveryTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter(first_name="Rita")
+        self.candidate = User.objects.create(
+            username="candidate", email="candidate@example.com"
+        )
+        self.candidate.profile.email = "candidate@example.com"
+        self.candidate.profile.save()
+        self.client.force_login(self.recruiter)
+
+    def tearDown(self):
+        get_smtp_pool().close_all()
+
+    def send(self, subject="Interview invitation"):
+        self.client.post(
+            reverse("send_message"),
+            {
+                "candidate_id": self.candidate.id,
+                "subject": subject,
+                "content": "Are you free on Monday?",
+                "message_type": "interview",
+                "send_email": "on",
+            },
+        )
+        return Message.objects.get(subject=subject)
+
+    def test_queued_email_is_delivered_by_worker(self):
+        with LocalSMTPServer() as server:
+            server.configure_profile(self.recruiter.profile)
+            message = self.send()
+            self.assertEqual(message.outbox.status, "pending")
+
+            results = process_due_entries()
+
+        self.assertEqual(results["sent"], 1)
+        self.assertEqual(
+            [(subject, recipients) for _, subject, recipients in server.delivered],
+            [("Interview invitation", ["candidate@example.com"])],
+        )
+        message.refresh_from_db()
+        self.assertTrue(message.email_sent)
+        self.assertEqual(message.outbox.status, "sent")
+
+    def test_worker_can_be_scoped_to_some_entries(self):
+        with LocalSMTPServer() as server:
+            server.configure_profile(self.recruiter.profile)
+            message = self.send()
+            other = self.send("Offer letter")
+
+            results = process_due_entries(queryset=EmailOutbox.objects.filter(message=other))
+
+        self.assertEqual(results["sent"], 1)
+        self.assertEqual(EmailOutbox.objects.get(message=message).status, "pending")
+        self.assertEqual(EmailOutbox.objects.get(message=other).status, "sent")
+
+    def test_auth_failure_is_retried_with_backoff(self):
+        faults = FaultInjection(fail_users={"recruiter@example.com"})
+        with LocalSMTPServer(faults=faults) as server:
+            server.configure_profile(self.recruiter.profile)
+            message = self.send()
+
+            results = process_due_entries()
+
+        self.assertEqual(results["pending"], 1)
+        entry = EmailOutbox.objects.get(message=message)
+        self.assertEqual(entry.attempts, 1)
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+        message.refresh_from_db()
+        self.assertFalse(message.email_failed)
+
+    def test_disconnects_fail_the_message_after_max_attempts(self):
+        with LocalSMTPServer(faults=FaultInjection(disconnect_rate=1)) as server:
+            server.configure_profile(self.recruiter.profile)
+            message = self.send()
+
+            for _ in range(MAX_ATTEMPTS):
+                EmailOutbox.objects.update(next_attempt_at=timezone.now())
+                async_to_sync(process_due_entries_async)()
+
+        self.assertEqual(server.handler.disconnects, MAX_ATTEMPTS)
+        message.refresh_from_db()
+        self.assertTrue(message.email_failed)
+        self.assertEqual(message.outbox.status, "failed")
+
+    def test_async_worker_marks_entries_sent(self):
+        with LocalSMTPServer() as server:
+            server.configure_profile(self.recruiter.profile)
+            first, second = self.send(), self.send("Offer letter")
+
+            results = async_to_sync(process_due_entries_async)()
+
+        self.assertEqual(results, {"sent": 2, "pending": 0, "failed": 0})
+        self.assertEqual(sorted(subject for _, subject, _ in server.delivered), ["Interview invitation", "Offer letter"])
+        for message in (first, second):
+            message.refresh_from_db()
+            self.assertTrue(message.email_sent)
+            self.assertEqual(message.outbox.status, "sent")
+
+    def test_async_worker_backs_off_after_a_transient_failure(self):
+        faults = FaultInjection(fail_users={"recruiter@example.com"})
+        with LocalSMTPServer(faults=faults) as server:
+            server.configure_profile(self.recruiter.profile)
+            message = self.send()
+
+            results = async_to_sync(process_due_entries_async)()
+            # Not due again until the backoff has passed
+            again = async_to_sync(process_due_entries_async)()
+
+        self.assertEqual(results["pending"], 1)
+        self.assertEqual(again, {"sent": 0, "pending": 0, "failed": 0})
+        entry = EmailOutbox.objects.get(message=message)
+        self.assertEqual((entry.status, entry.attempts), ("pending", 1))
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+
+    def test_async_worker_caps_sessions_per_host(self):
+        other = make_recruiter("other-recruiter")
+        with LocalSMTPServer(faults=FaultInjection(data_delay=0.1)) as server:
+            messages = []
+            for sender in (self.recruiter, other):
+                server.configure_profile(sender.profile)
+                messages += [
+                    Message.objects.create(sender=sender, recipient=self.candidate, subject=f"Hello {number}", content="Hi")
+                    for number in range(3)
+                ]
+            enqueue_candidate_emails(messages)
+
+            # Each sender could open two sessions, but they share the server's two
+            results = async_to_sync(process_due_entries_async)(max_connections_per_host=2)
+
+        self.assertEqual(results["sent"], 6)
+        self.assertEqual(server.handler.peak_receiving, 2)
+
+
+@skipUnless(LocalSMTPServer, "aiosmtpd is not installed")
+class SetupRecruiterEmailTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter()
+        self.url = reverse("setup_recruiter_email")
+        self.client.force_login(self.recruiter)
+
+    def post(self, result):
+        async def connection_test(*args, **kwargs):
+            return result
+
+        with patch("accounts.views.test_email_connection", connection_test):
+            return self.client.post(self.url, {
+                "email_host_user": "rita@gmail.com", "email_host_password": "app-password",
+            })
+
+    def test_failed_connection_test_keeps_the_old_settings(self):
+        response = self.post((False, "Authentication failed."))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            ["Email configuration failed: Authentication failed."],
+        )
+        profile = UserProfile.objects.get(user=self.recruiter)
+        self.assertFalse(profile.email_configured)
+        self.assertFalse(profile.email_host_user)
+
+    def test_successful_connection_test_saves_and_drops_pooled_connections(self):
+        with LocalSMTPServer() as server:
+            previous = server.configure_profile(self.recruiter.profile)
+            email = EmailMessage("Hello", "Hi", previous.email_host_user, ["candidate@example.com"])
+            get_smtp_pool().send_messages(previous, [email])
+
+            response = self.post((True, "Email connection tested successfully!"))
+            # The connection logged in with the old settings was closed
+            get_smtp_pool().send_messages(previous, [email])
+
+        self.assertRedirects(response, reverse("recruiter_dashboard"), fetch_redirect_response=False)
+        self.assertEqual(server.handler.logins, 2)
+        profile = UserProfile.objects.get(user=self.recruiter)
+        self.assertTrue(profile.email_configured)
+        self.assertEqual(
+            (profile.email_host, profile.email_port, profile.email_host_user),
+            ("smtp.gmail.com", 587, "rita@gmail.com"),
+        )
+
+
+@skipUnless(LocalSMTPServer, "aiosmtpd is not installed")
+class SMTPConnectionPoolTests(TestCase):
+    def setUp(self):
+        self.profile = make_recruiter().profile
+        self.server = LocalSMTPServer().start()
+        self.addCleanup(self.server.stop)
+        self.server.configure_profile(self.profile)
+
+    def make_pool(self, **options):
+        pool = SMTPConnectionPool(**options)
+        self.addCleanup(pool.close_all)
+        return pool
+
+    def send(self, pool, subject="Hello"):
+        email = EmailMessage(subject, "Hi", "recruiter@example.com", ["candidate@example.com"])
+        return pool.send_messages(self.profile, [email])
+
+    def test_second_send_reuses_the_connection(self):
+        pool = self.make_pool()
+
+        self.assertEqual(self.send(pool, "First"), 1)
+        self.assertEqual(self.send(pool, "Second"), 1)
+
+        self.assertEqual(self.server.handler.logins, 1)
+        self.assertEqual([subject for _, subject, _ in self.server.delivered], ["First", "Second"])
+
+    def test_dead_connection_fails_noop_and_is_replaced(self):
+        pool = self.make_pool(health_check_after=0)
+        with pool.connection(self.profile) as backend:
+            pass
+        # As if the server had dropped it while idle
+        backend.connection.sock.shutdown(socket.SHUT_RDWR)
+
+        self.assertEqual(self.send(pool), 1)
+
+        self.assertEqual(self.server.handler.logins, 2)
+        with pool.connection(self.profile) as reused:
+            self.assertIsNot(reused, backend)
+
+    def test_idle_connections_are_evicted_after_the_timeout(self):
+        pool = self.make_pool(idle_timeout=0.2)
+        self.send(pool)
+        self.assertEqual(pool.evict_idle(), 0)
+
+        time.sleep(0.3)
+
+        self.assertEqual(pool.evict_idle(), 1)
+        self.send(pool)
+        self.assertEqual(self.server.handler.logins, 2)
+
+    def test_discard_drops_connections_after_credentials_change(self):
+        pool = self.make_pool()
+        self.send(pool)
+
+        self.profile.email_host_password = "rotated"
+        self.profile.save()
+        pool.discard(self.profile)
+        self.send(pool)
+
+        self.assertEqual(self.server.handler.logins, 2)
+        self.assertEqual(len(self.server.delivered), 2)
+
+
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        self.recruiter = User.objects.create(username="recruiter")
+        self.candidate = User.objects.create(username="candidate")
+        self.client.force_login(self.candidate)
+
+    def unread(self):
+        return NotificationCounter.objects.get(user=self.candidate).unread_messages
+
+    def send(self):
+        return Message.objects.create(
+            sender=self.recruiter, recipient=self.candidate, subject="Hello", content="Hi"
+        )
+
+    def test_reading_messages_clears_the_unread_count(self):
+        first = self.send()
+        self.send()
+        self.send()
+        self.assertEqual(self.unread(), 3)
+
+        self.client.get(reverse("message_detail", args=[first.id]))
+        self.client.get(reverse("message_detail", args=[first.id]))
+        self.assertEqual(self.unread(), 2)
+
+        response = self.client.get(reverse("inbox"))
+        self.assertEqual(response.context["unread_count"], 2)
+        self.assertEqual(self.unread(), 0)
+
+    def test_badges_are_read_once_per_request(self):
+        self.send()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("user_dashboard"))
+
+        self.assertEqual(response.context["unread_count"], 1)
+        self.assertContains(response, '<span class="badge bg-danger">1</span>', html=True)
+        table = NotificationCounter._meta.db_table
+        counter_reads = [query for query in queries.captured_queries if table in query["sql"]]
+        self.assertEqual(len(counter_reads), 1)
+
+
+class ComposeBulkMessagesTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter()
+        self.job = make_job(self.recruiter)
+        self.count = 0
+
+    def applications(self, count, with_email=True):
+        created = []
+        for _ in range(count):
+            self.count += 1
+            application = make_application(self.job, f"candidate-{self.count}", pipeline=False)
+            if with_email:
+                UserProfile.objects.filter(user=application.applicant).update(
+                    email=f"{application.applicant.username}@example.com"
+                )
+            created.append(application)
+        return list(Application.objects.filter(id__in=[app.id for app in created]).with_candidate())
+
+    def compose(self, applications, send_email=False):
+        return compose_bulk_messages(
+            self.recruiter, applications, "Hello {candidate_name}", "About {job_title} at {company}",
+            "application", send_email=send_email,
+        )
+
+    def test_each_recipient_gets_their_own_thread(self):
+        applications = self.applications(3)
+
+        sent, emailed = self.compose(applications)
+
+        self.assertEqual((len(sent), emailed), (3, 0))
+        self.assertFalse(EmailOutbox.objects.exists())
+        for application in applications:
+            thread = Thread.objects.get(application=application)
+            message = thread.messages.get()
+            self.assertEqual(thread.last_message, message)
+            self.assertEqual(thread.last_message_at, message.sent_at)
+            self.assertEqual(set(thread.participants.all()), {self.recruiter, application.applicant})
+            self.assertEqual(message.subject, f"Hello {application.applicant.username}")
+            self.assertEqual(message.content, "About Backend Engineer at Jobify")
+
+    def test_unread_counters_are_bumped_once_per_recipient(self):
+        applications = self.applications(3)
+
+        self.compose(applications)
+
+        self.assertEqual(
+            dict(NotificationCounter.objects.filter(unread_messages__gt=0).values_list("user__username", "unread_messages")),
+            {application.applicant.username: 1 for application in applications},
+        )
+
+    def test_emails_are_queued_only_when_asked_and_the_candidate_has_an_address(self):
+        with_email = self.applications(2)
+        without_email = self.applications(1, with_email=False)
+
+        sent, emailed = self.compose(with_email + without_email, send_email=True)
+
+        self.assertEqual(emailed, 2)
+        self.assertEqual(
+            set(EmailOutbox.objects.values_list("message__recipient_id", flat=True)),
+            {application.applicant_id for application in with_email},
+        )
+
+    def test_query_count_does_not_grow_with_recipients(self):
+        few, many = self.applications(2), self.applications(8)
+
+        with CaptureQueriesContext(connection) as few_queries:
+            self.compose(few, send_email=True)
+        with CaptureQueriesContext(connection) as many_queries:
+            self.compose(many, send_email=True)
+
+        self.assertEqual(len(many_queries), len(few_queries))
+        # Thread, participant, message and outbox INSERTs, the thread and
+        # counter UPDATEs, plus the savepoint pair
+        self.assertEqual(len(many_queries), 8)
+
+
+class CandidateEmailRenderingTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter(first_name="@@slot:subject@@")
+        job = make_job(self.recruiter, "Backend <Engineer>", company="Jobify & Co")
+        self.application = make_application(job, "candidate", pipeline=False)
+
+    def previous_render(self, message):
+        """What email_candidate.html rendered before it took body_html and a formatted sent_at"""
+        source = get_template(CANDIDATE_EMAIL_TEMPLATE).template.source
+        source = source.replace("{{ sent_at }}", '{{ sent_at|date:"F j, Y g:i A" }}')
+        source = source.replace("{{ body_html }}", "{{ content|linebreaks }}")
+        return engines["django"].from_string(source).render({
+            "subject": message.subject,
+            "content": message.content,
+            "sender_name": message.sender.get_full_name() or message.sender.username,
+            "sent_at": message.sent_at,
+            "job_title": self.application.job.title,
+            "company": self.application.job.company,
+        })
+
+    def test_html_matches_the_linebreaks_template(self):
+        contents = [
+            "Hi,\r\n\r\nCan you make <Monday>?\nSay @@slot:body@@ & we'll talk.\n\n\n\nThanks",
+            "One line, no breaks",
+            "\n\nLeading and trailing blank lines\n\n",
+        ]
+        renderer = CandidateEmailRenderer()
+        for number, content in enumerate(contents):
+            message = Message.objects.create(
+                sender=self.recruiter, recipient=self.application.applicant, application=self.application,
+                subject=f"Re: @@slot:body@@ <{number}>", content=content,
+            )
+            with self.subTest(content=content):
+                _, html = renderer.render(document_for_message(message))
+                self.assertEqual(html, self.previous_render(message))
+                self.assertNotIn(renderer.marker, html)
+
+
+class MessageThreadTests(TestCase):
+    def setUp(self):
+        self.recruiter = User.objects.create(username="recruiter")
+        self.candidate = User.objects.create(username="candidate")
+
+    def test_reply_joins_the_thread_without_quoting(self):
+        original = Message.objects.create(
+            sender=self.recruiter, recipient=self.candidate, subject="Interview", content="Are you free?"
+        )
+        self.client.force_login(self.candidate)
+        self.client.post(reverse("reply_message", args=[original.id]), {
+            "subject": "Re: Interview", "content": "Yes", "message_type": "general",
+        })
+
+        reply = Message.objects.get(parent=original)
+        self.assertEqual(reply.thread_id, original.thread_id)
+        self.assertEqual(reply.content, "Yes")
+        thread = Thread.objects.get()
+        self.assertEqual(thread.last_message, reply)
+        self.assertEqual(set(thread.participants.all()), {self.recruiter, self.candidate})
+
+    def test_inbox_lists_threads_in_constant_queries(self):
+        for number in range(5):
+            Message.objects.create(
+                sender=self.recruiter, recipient=self.candidate, subject=f"Hello {number}", content="Hi"
+            )
+        self.client.force_login(self.candidate)
+        # Session, user, thread list, mark read, counter update, then the nav's profile and badges
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse("inbox"))
+        self.assertEqual(len(response.context["threads"]), 5)
+        self.assertTrue(all(thread.has_unread for thread in response.context["threads"]))
+
+
+class MessageSearchTests(TestCase):
+    def setUp(self):
+        self.recruiter = User.objects.create(username="recruiter")
+        self.candidate = User.objects.create(username="candidate")
+        self.other = User.objects.create(username="other")
+        self.client.force_login(self.recruiter)
+
+    def send(self, sender, recipient, subject, content):
+        return Message.objects.create(sender=sender, recipient=recipient, subject=subject, content=content)
+
+    def test_results_are_ranked_and_scoped_to_the_user(self):
+        in_body = self.send(self.recruiter, self.candidate, "Next steps", "Let's schedule the interview")
+        in_subject = self.send(self.candidate, self.recruiter, "Interview availability", "Tuesday works")
+        self.send(self.other, self.candidate, "Interview", "Not the recruiter's message")
+
+        response = self.client.get(reverse("inbox"), {"q": "interview"})
+        self.assertEqual(list(response.context["results_page"].object_list), [in_subject, in_body])
+
+        response = self.client.get(reverse("sent_messages"), {"q": "interv"})
+        self.assertEqual(list(response.context["results_page"].object_list), [in_body])
+
+    def test_search_pages_through_edited_and_bulk_created_messages(self):
+        Message.objects.bulk_create([
+            Message(sender=self.recruiter, recipient=self.candidate, subject=f"Offer {n}", content="Details")
+            for n in range(25)
+        ])
+        edited = self.send(self.recruiter, self.candidate, "Draft", "Nothing yet")
+        edited.subject = "Offer letter"
+        edited.save()
+
+        response = self.client.get(reverse("inbox"), {"q": "offer", "page": 2})
+        page = response.context["results_page"]
+        self.assertEqual(page.paginator.count, 26)
+        self.assertEqual(len(page.object_list), 6)
+        # Punctuation and FTS syntax in the query are searched as plain words
+        response = self.client.get(reverse("inbox"), {"q": 'offer" -*'})
+        self.assertEqual(response.context["results_page"].paginator.count, 26)
+
+
+class MessageArchivalTests(TestCase):
+    def setUp(self):
+        self.recruiter = User.objects.create(username="recruiter")
+        self.candidate = User.objects.create(username="candidate")
+
+    def send(self, subject, days_ago, is_read=True, parent=None):
+        message = Message.objects.create(
+            sender=self.recruiter, recipient=self.candidate, subject=subject, content="Hi", parent=parent
+        )
+        Message.objects.filter(id=message.id).update(
+            is_read=is_read, sent_at=timezone.now() - timedelta(days=days_ago)
+        )
+        return message
+
+    def test_old_read_messages_move_to_the_archive(self):
+        old = self.send("Old", days_ago=400)
+        latest_in_thread = self.send("Old reply", days_ago=399, parent=old)
+        unread = self.send("Unread", days_ago=400, is_read=False)
+        recent = self.send("Recent", days_ago=1)
+
+        self.assertEqual(archive_messages(older_than=timedelta(days=365), chunk_size=1), 1)
+
+        self.assertEqual(list(ArchivedMessage.objects.values_list("id", flat=True)), [old.id])
+        self.assertEqual(
+            set(Message.objects.values_list("id", flat=True)), {latest_in_thread.id, unread.id, recent.id}
+        )
+
+        # Both the archived message and the reply that points at it still open
+        self.client.force_login(self.candidate)
+        response = self.client.get(reverse("message_detail", args=[old.id]))
+        self.assertTrue(response.context["archived"])
+        self.assertContains(response, "Old")
+        response = self.client.get(reverse("message_detail", args=[latest_in_thread.id]))
+        self.assertEqual(response.context["parent_message"].id, old.id)
+
+
+class RecruiterDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.recruiter = make_recruiter()
+        self.client.force_login(self.recruiter)
+
+    def add_job(self, applicants=1):
+        job = make_job(self.recruiter, "Engineer")
+        for _ in range(applicants):
+            make_application(job, f"candidate-{User.objects.count()}")
+        return job
+
+    def dashboard_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("recruiter_dashboard"))
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_jobs(self):
+        self.add_job()
+        one_job = self.dashboard_queries()
+        cache.clear()
+        for _ in range(4):
+            self.add_job(applicants=2)
+        self.assertEqual(self.dashboard_queries(), one_job)
+
+    def test_new_application_invalidates_cached_stats(self):
+        job = self.add_job()
+        response = self.client.get(reverse("recruiter_dashboard"))
+        self.assertEqual(response.context["total_applications"], 1)
+
+        make_application(job, "late", pipeline=False)
+        response = self.client.get(reverse("recruiter_dashboard"))
+        self.assertEqual(response.context["total_applications"], 2)
+
+    def test_deleting_a_job_loads_no_job_per_application(self):
+        job = self.add_job(applicants=1)
+        stats_key = recruiter_stats_key(self.recruiter.id)
+
+        def job_reads():
+            with CaptureQueriesContext(connection) as queries:
+                job.delete()
+            return len([query for query in queries if 'FROM "jobs_job"' in query["sql"]])
+
+        self.client.get(reverse("recruiter_dashboard"))
+        one_applicant = job_reads()
+        self.assertIsNone(cache.get(stats_key))
+
+        job = self.add_job(applicants=5)
+        self.client.get(reverse("recruiter_dashboard"))
+        self.assertEqual(job_reads(), one_applicant)
+        self.assertIsNone(cache.get(stats_key))
+
+    def test_deleting_an_applicant_invalidates_cached_stats(self):
+        job = self.add_job(applicants=2)
+        self.assertEqual(self.client.get(reverse("recruiter_dashboard")).context["total_applications"], 2)
+
+        job.applications.first().applicant.delete()
+
+        self.assertEqual(self.client.get(reverse("recruiter_dashboard")).context["total_applications"], 1)
+
+
+class RelatedLoadingTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter()
+        job = make_job(self.recruiter, "Engineer")
+        for number in range(3):
+            candidate = make_application(job, f"candidate-{number}").applicant
+            candidate.profile.email = f"candidate-{number}@example.com"
+            candidate.profile.save()
+            Message.objects.create(sender=self.recruiter, recipient=candidate, subject="Hi", content="Hi")
+
+    def test_with_candidate_loads_what_the_properties_read(self):
+        applications = list(Application.objects.with_candidate())
+        with self.assertNumQueries(0):
+            for application in applications:
+                application.candidate_email, application.candidate_name
+                application.current_pipeline_stage.name, application.job.title
+
+    def test_with_parties_loads_what_the_properties_read(self):
+        messages = list(Message.objects.with_parties())
+        with self.assertNumQueries(0):
+            for message in messages:
+                message.recipient_email, message.sender_is_recruiter, message.recipient_is_recruiter
+
+
+class SelectCandidateTests(TestCase):
+    def setUp(self):
+        self.recruiter = make_recruiter()
+        self.jobs = [make_job(self.recruiter, f"Engineer {n}") for n in range(3)]
+        self.other_job = make_job(make_recruiter("other-recruiter"), "Elsewhere", company="Other")
+        self.client.force_login(self.recruiter)
+
+    def add_candidate(self, name, skills="", jobs=None):
+        candidate = User.objects.create(username=name)
+        candidate.profile.skills = skills
+        candidate.profile.save()
+        for job in jobs or self.jobs:
+            Application.objects.create(job=job, applicant=candidate)
+        return candidate
+
+    def get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("select_candidate"), params)
+        return response, len(queries)
+
+    def test_counts_only_this_recruiters_applications_in_constant_queries(self):
+        self.add_candidate("ada", jobs=self.jobs + [self.other_job])
+        response, one_candidate = self.get()
+        [candidate] = response.context["candidates"]
+        self.assertEqual(candidate.application_count, 3)
+        self.assertEqual(len(candidate.recent_applications), 2)
+
+        for number in range(10):
+            self.add_candidate(f"candidate-{number}")
+        response, many_candidates = self.get()
+        self.assertEqual(len(response.context["candidates"]), 11)
+        self.assertEqual(many_candidates, one_candidate)
+
+    def test_filters_by_name_or_skill(self):
+        self.add_candidate("ada", skills="python, django")
+        self.add_candidate("grace", skills="cobol")
+        response, _ = self.get(q="django")
+        self.assertEqual([c.username for c in response.context["candidates"]], ["ada"])
+        response, _ = self.get(q="grac")
+        self.assertEqual([c.username for c in response.context["candidates"]], ["grace"])
+
+
+class ApplicantMapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.recruiter = make_recruiter()
+        self.job = make_job(self.recruiter, "Engineer")
+        self.client.force_login(self.recruiter)
+
+    def apply(self, name, lat, lng):
+        application = make_application(self.job, name, pipeline=False)
+        UserProfile.objects.filter(user=application.applicant).update(latitude=lat, longitude=lng)
+        return application
+
+    def test_groups_by_rounded_coordinates_and_caps_the_sample(self):
+        for number in range(12):
+            self.apply(f"atl-{number:02}", 33.74901, -84.38801)
+        self.apply("nyc", 40.7128, -74.0060)
+        self.apply("nowhere", None, None)
+
+        locations = self.client.get(reverse("recruiter_applicants_map")).context["location_counts"]
+        atlanta = locations[(33.749, -84.388)]
+        self.assertEqual(atlanta["count"], 12)
+        self.assertEqual(atlanta["applicants"], [f"atl-{number:02}" for number in range(10)])
+        self.assertEqual(locations[(40.7128, -74.006)], {"count": 1, "applicants": ["nyc"]})
+
+        # Cached until an application changes: one read from the cache table
+        with self.assertNumQueries(1):
+            applicant_locations(self.recruiter)
+        self.apply("sf", 37.7749, -122.4194)
+        self.assertIn((37.7749, -122.4194), applicant_locations(self.recruiter))
+
+
+def make_pdf(text):
+    """A one-page PDF showing text, enough for pypdf to extract it back"""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+
+def use_temporary_media_root(testcase):
+    """Point MEDIA_ROOT at an empty directory for the rest of the test"""
+    media_root = tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    media = override_settings(MEDIA_ROOT=media_root)
+    media.enable()
+    testcase.addCleanup(media.disable)
+
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+
+@skipUnless(pypdf, "resume extraction needs pypdf")
+class ResumeSearchTests(TestCase):
+    def setUp(self):
+        use_temporary_media_root(self)
+        self.recruiter = make_recruiter()
+        self.job = make_job(self.recruiter, "Engineer")
+        self.other_job = make_job(make_recruiter("other-recruiter"), "Elsewhere", company="Other")
+        self.client.force_login(self.recruiter)
+
+    def apply(self, name, text, job=None):
+        resume = SimpleUploadedFile(f"{name}.pdf", make_pdf(text), content_type="application/pdf")
+        return make_application(job or self.job, name, pipeline=False, resume=resume)
+
+    def search(self, q):
+        return self.client.get(reverse("search_resumes"), {"q": q}).context["results_page"]
+
+    def test_identical_resumes_are_extracted_once_and_search_is_scoped(self):
+        ada = self.apply("ada", "Kubernetes and Django at scale")
+        twin = self.apply("twin", "Kubernetes and Django at scale")
+        self.apply("elsewhere", "Kubernetes and Django at scale", job=self.other_job)
+        self.apply("grace", "COBOL compilers")
+
+        self.assertEqual(process_resumes(), {"linked": 4, "extracted": 2, "failed": 0})
+        self.assertEqual(ResumeText.objects.count(), 2)
+        self.assertEqual(process_resumes(), {"linked": 0, "extracted": 0, "failed": 0})
+
+        page = self.search("kubernetes")
+        self.assertEqual({a.id for a in page.object_list}, {ada.id, twin.id})
+        self.assertIn("<mark>Kubernetes</mark>", page.object_list[0].resume_snippet)
+        self.assertEqual([a.applicant.username for a in self.search("cobol").object_list], ["grace"])
+
+    def test_replaced_resume_is_indexed_again(self):
+        application = self.apply("ada", "Fortran numerics")
+        process_resumes()
+        application.resume = SimpleUploadedFile("new.pdf", make_pdf("Rust embedded"))
+        application.save()
+        self.assertIsNone(application.resume_text)
+
+        process_resumes()
+        self.assertEqual(len(self.search("rust").object_list), 1)
+        self.assertEqual(len(self.search("fortran").object_list), 0)
+
+
+class ResumeStorageTests(TestCase):
+    def setUp(self):
+        use_temporary_media_root(self)
+        self.job = make_job(make_recruiter(), "Engineer")
+
+    def apply(self, name, resume):
+        return make_application(self.job, name, pipeline=False, resume=resume)
+
+    def references(self, name):
+        return ResumeBlob.objects.filter(name=name).values_list("ref_count", flat=True).first()
+
+    def test_same_content_is_stored_once_and_freed_with_its_last_reference(self):
+        first = self.apply("ada", SimpleUploadedFile("AZhao.pdf", b"%PDF same resume"))
+        second = self.apply("twin", SimpleUploadedFile("AZhao.pdf", b"%PDF same resume"))
+        other = self.apply("grace", SimpleUploadedFile("grace.pdf", b"%PDF another resume"))
+        self.assertEqual(first.resume.name, second.resume.name)
+        self.assertNotEqual(first.resume.name, other.resume.name)
+        blob = first.resume.name
+        self.assertEqual(self.references(blob), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.references(blob), 1)
+        self.assertTrue(resume_storage.exists(blob))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertIsNone(self.references(blob))
+        self.assertFalse(resume_storage.exists(blob))
+
+        # Re-uploading the same content keeps one reference
+        other.resume = SimpleUploadedFile("grace-again.pdf", b"%PDF another resume")
+        with self.captureOnCommitCallbacks(execute=True):
+            other.save()
+        self.assertEqual(self.references(other.resume.name), 1)
+
+        # Replacing a resume releases the old blob
+        old_blob = other.resume.name
+        other.resume = SimpleUploadedFile("grace-v2.pdf", b"%PDF updated resume")
+        with self.captureOnCommitCallbacks(execute=True):
+            other.save()
+        self.assertFalse(resume_storage.exists(old_blob))
+        self.assertTrue(resume_storage.exists(other.resume.name))
+
+    def test_upload_racing_the_last_release_keeps_the_blob(self):
+        first = self.apply("ada", SimpleUploadedFile("cv.pdf", b"%PDF same resume"))
+        blob = first.resume.name
+
+        # The delete commits, but its cleanup has not run when an upload of
+        # the same content finds the file on disk and skips writing it. The
+        # cleanup then runs before that upload's application row exists.
+        with self.captureOnCommitCallbacks() as cleanups:
+            first.delete()
+        self.assertEqual(resume_storage.save("cv.pdf", ContentFile(b"%PDF same resume")), blob)
+        for cleanup in cleanups:
+            cleanup()
+        second = self.apply("twin", None)
+        Application.objects.filter(pk=second.pk).update(resume=blob)
+        second.refresh_from_db()
+
+        self.assertEqual(second.resume.name, blob)
+        self.assertEqual(self.references(blob), 1)
+        self.assertTrue(resume_storage.exists(blob))
+
+        # The other order: cleanup wins, and the upload writes the file again
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(resume_storage.exists(blob))
+        self.apply("third", SimpleUploadedFile("cv.pdf", b"%PDF same resume"))
+        self.assertTrue(resume_storage.exists(blob))
+        self.assertEqual(self.references(blob), 1)
+
+    def test_dedupe_command_moves_legacy_files_into_blobs(self):
+        legacy = ["resumes/Nha.pdf", "resumes/Nha_GNGhdOb.pdf", "resumes/Nha_LuMEnP2.pdf"]
+        for number, name in enumerate(legacy):
+            # What the default storage used to write, collision suffixes and all
+            FileSystemStorage().save(name, ContentFile(b"%PDF Nha resume"))
+            Application.objects.filter(pk=self.apply(f"nha-{number}", None).pk).update(resume=name)
+
+        call_command("dedupe_resumes", stdout=StringIO())
+
+        names = set(Application.objects.values_list("resume", flat=True))
+        self.assertEqual(len(names), 1)
+        blob = names.pop()
+        self.assertTrue(resume_storage.exists(blob))
+        self.assertEqual(self.references(blob), 3)
+        for name in legacy:
+            self.assertFalse(resume_storage.exists(name))
+
+
+class ResumeDownloadTests(TestCase):
+    def setUp(self):
+        use_temporary_media_root(self)
+        self.recruiter = make_recruiter()
+        self.application = make_application(
+            make_job(self.recruiter, "Engineer"), "ada", pipeline=False,
+            resume=SimpleUploadedFile("cv.pdf", b"%PDF-0123456789"),
+        )
+        self.url = reverse("download_resume", args=[self.application.id])
+        self.client.force_login(self.recruiter)
+
+    def test_streams_ranges_and_honours_etags(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-0123456789")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("ada-resume.pdf", response["Content-Disposition"])
+        etag = response["ETag"]
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=5-9")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 5-9/15")
+        self.assertEqual(b"".join(response.streaming_content), b"01234")
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-3")
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+        response = self.client.get(self.url, HTTP_RANGE="bytes=5-9", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_RANGE="bytes=99-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */15")
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    @override_settings(RESUME_SENDFILE="x-accel-redirect", RESUME_ACCEL_PREFIX="/protected-media/")
+    def test_offloads_the_transfer_to_the_front_end_server(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.application.resume.name}")
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["Content-Type"], "application/pdf")
+
+    def test_only_the_recruiter_and_applicant_can_download(self):
+        self.client.force_login(self.application.applicant)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.client.force_login(User.objects.create(username="someone-else"))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
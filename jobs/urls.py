@@ -38,6 +38,11 @@ urlpatterns = [
         views.view_application,
         name="view_application",
     ),
+    path(
+        "application/<int:application_id>/resume/",
+        views.download_resume,
+        name="download_resume",
+    ),
     # small helper endpoint for location autocomplete
     path("api/geocode/", views.geocode_ajax, name="geocode_ajax"),
     # role-based redirect (decides recruiter vs candidate)
@@ -59,11 +64,18 @@ urlpatterns = [
     ),
     # recruiter picks which candidate to message
     path("messages/select-candidate/", views.select_candidate, name="select_candidate"),
+    # full-text search over applicants' resumes
+    path("recruiter/resumes/search/", views.search_resumes, name="search_resumes"),
     path("recruiter/jobs/", views.recruiter_job_list, name="recruiter_job_list"),
     # Candidate recommendations for recruiters
     path("recruiter/job/<int:job_id>/recommendations/", views.candidate_recommendations, name="candidate_recommendations"),
     #kanan-board
     path('job/<int:pk>/pipeline/', views.JobPipelineView.as_view(), name='job_pipeline'),
+    path('job/<int:pk>/pipeline/data/', views.job_pipeline_data, name='job_pipeline_data'),
+    path('job/<int:pk>/pipeline/bulk-move/', views.bulk_move_applicants, name='bulk_move_applicants'),
+    path('job/<int:pk>/pipeline/analytics/', views.pipeline_analytics, name='pipeline_analytics'),
+    path('job/<int:pk>/pipeline/events/', views.pipeline_events, name='pipeline_events'),
+    path('job/<int:pk>/messages/bulk/', views.bulk_send_messages, name='bulk_send_messages'),
     path('applicant/<int:applicant_id>/move/', views.move_applicant, name='move_applicant'),
     path('applicant/<int:pk>/', views.ApplicantDetailView.as_view(), name='applicant_detail'),
 ]
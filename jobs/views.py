@@ -1,12 +1,20 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Prefetch, Q
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+import asyncio
 import json
+import logging
+import os
 import requests
-from .models import Job, Application, Message
+from datetime import timedelta
+from django.utils import timezone
+from .models import Job, Application, Message, Thread
 from .forms import QuickApplyForm, TraditionalApplyForm, JobCreationForm, MessageForm
 from django.contrib.auth.models import User
 from geopy.geocoders import Nominatim
@@ -15,9 +23,33 @@ from django.core.exceptions import PermissionDenied
 from django.views.decorators.http import require_http_methods
 from django.views.generic import DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from .models import PipelineStage, ApplicantPipeline, PipelineTransition
+from .models import PipelineStage, ApplicantPipeline
+from .analytics import build_stage_funnel
+from .archival import get_message_or_archived
+from .dashboard import applicant_locations, recruiter_stats
+from .downloads import serve_resume
+from .events import get_broker, pipeline_events_enabled
+from .message_search import MessageSearchResults
+from .messaging import MERGE_FIELDS, compose_bulk_messages
+from .outbox import enqueue_candidate_email
+from .resume_index import ResumeSearchResults
+from .pipeline import (
+    build_pipeline_board,
+    serialize_pipeline_board,
+    move_applicant_to_stage,
+    move_applicants_to_stage,
+    replay_pipeline_state,
+    stage_time_summary,
+)
 from django.shortcuts import get_object_or_404
-from accounts.models import CandidateMatch, SavedCandidateSearch, UserProfile
+from accounts.models import SavedCandidateSearch, UserProfile
+from accounts.notifications import change_count, get_notification_counts
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_PER_PAGE = 20
+CANDIDATES_PER_PAGE = 20
+RESUMES_PER_PAGE = 20
 
 class JobPipelineView(LoginRequiredMixin, DetailView):
     model = Job
@@ -26,52 +58,71 @@ class JobPipelineView(LoginRequiredMixin, DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        job = self.get_object()
+        job = self.object
         
         # Verify the user owns this job
-        if job.employer != self.request.user:
+        if job.employer_id != self.request.user.id:
             raise PermissionDenied("You don't have permission to view this pipeline")
         
-        stages = job.pipeline_stages.all()
-        applicants_by_stage = {}
-        
-        for stage in stages:
-            applicants_by_stage[stage.id] = ApplicantPipeline.objects.filter(
-                current_stage=stage
-            ).select_related(
-                'application__applicant',
-                'application__applicant__profile'
-            )
+        board = build_pipeline_board(job)
         
-        context['stages'] = stages
-        context['applicants_by_stage'] = applicants_by_stage
+        context['stages'] = [column['stage'] for column in board]
+        context['board'] = board
+        context['live_updates'] = pipeline_events_enabled(self.request)
+        context['poll_seconds'] = getattr(settings, 'PIPELINE_POLL_SECONDS', 30)
         return context
+
+
+@login_required
+def job_pipeline_data(request, pk):
+    """JSON version of the pipeline board so it can refresh without a page render"""
+    job = get_object_or_404(Job, pk=pk)
+    
+    if job.employer_id != request.user.id:
+        return JsonResponse({
+            'success': False,
+            'message': 'Permission denied'
+        }, status=403)
+    
+    board = build_pipeline_board(job)
+    return JsonResponse({
+        'success': True,
+        'job_id': job.id,
+        'stages': serialize_pipeline_board(board),
+    })
     
 class ApplicantDetailView(LoginRequiredMixin, DetailView):
     model = Application
     template_name = 'jobs/applicant_detail.html'
     context_object_name = 'application'
     
+    # Most recent transitions shown in the stage history timeline
+    history_limit = 50
+    
     def get_queryset(self):
         # Users can only see applicants for their own jobs
-        return Application.objects.filter(job__employer=self.request.user)
+        return Application.objects.filter(job__employer=self.request.user).with_candidate()
     
     def get_context_data(self, **kwargs):
             context = super().get_context_data(**kwargs)
-            application = self.get_object()
+            application = self.object
             
             # Add additional context for the applicant profile
             context['applicant_profile'] = getattr(application.applicant, 'profile', None)
             context['current_stage'] = application.current_pipeline_stage
+            context['stages'] = list(application.job.pipeline_stages.all())
+            context['stage_history'] = []
+            context['stage_time_summary'] = []
             
-            # Get stage history if pipeline exists
-            if hasattr(application, 'pipeline_info'):
-                try:
-                    context['stage_history'] = application.pipeline_info.get_stage_history()
-                except:
-                    context['stage_history'] = []
-            else:
-                context['stage_history'] = []
+            pipeline = application.pipeline_info
+            if pipeline:
+                # One indexed (applicant_pipeline, moved_at) query, newest first
+                history = list(pipeline.get_stage_history().reverse()[:self.history_limit])
+                history.reverse()
+                context['stage_history'] = history
+                
+                state, _ = replay_pipeline_state(pipeline)
+                context['stage_time_summary'] = stage_time_summary(state, context['stages'])
             
             return context
 
@@ -269,8 +320,10 @@ def apply_to_job(request, job_id):
 @login_required
 def my_applications(request):
     """View for users to see their applications"""
-    applications = Application.objects.filter(applicant=request.user).order_by(
-        "-applied_at"
+    applications = (
+        Application.objects.filter(applicant=request.user)
+        .with_candidate()
+        .order_by("-applied_at")
     )
 
     context = {
@@ -506,89 +559,44 @@ def recruiter_dashboard(request):
         )
         return redirect("user_dashboard")
 
-    # Jobs posted by this recruiter
-    jobs = Job.objects.filter(employer=request.user).order_by("-posted_at")
+    # Job cards and totals come from the short-lived per-recruiter cache
+    stats = recruiter_stats(request.user)
 
-    # All applications to those jobs (not sliced yet)
-    applications_qs = (
+    # Recent applicants, with the stage badge joined in rather than looked up per row
+    recent_applications = (
         Application.objects.filter(job__employer=request.user)
-        .select_related("job", "applicant")
-        .order_by("-applied_at")
+        .with_candidate()
+        .order_by("-applied_at")[:5]
     )
 
-    # Count new matches for this recruiter
-    match_count = CandidateMatch.objects.filter(
-        search__recruiter=request.user,
-        seen=False
-    ).count()
-
     # Messages sent TO this recruiter
-    inbox_qs = (
+    recent_messages = (
         Message.objects.filter(recipient=request.user)
-        .select_related("sender", "application")
-        .order_by("-sent_at")
+        .with_parties()
+        .order_by("-sent_at")[:5]
     )
 
-    # Count unread BEFORE slicing
-    unread_count = inbox_qs.filter(is_read=False).count()
-
-    # Slice for display
-    recent_messages = inbox_qs[:5]
-    recent_applications = applications_qs[:5]
+    # Badge counts are stored per user; the nav reuses this same read
+    counts = get_notification_counts(request)
 
     context = {
-        "jobs": jobs,
         "applications": recent_applications,  # recent applicants preview
         "recent_messages": recent_messages,  # last 5 inbox messages
-        "unread_count": unread_count,
-        # stats for cards
-        "total_jobs": jobs.count(),
-        "total_applications": applications_qs.count(),
-        #pipeline data
-        "jobs_with_applicants": [job for job in jobs if job.applications.exists()],
-        "match_count": match_count, 
+        "unread_count": counts["unread_messages"],
+        "match_count": counts["unseen_matches"],
+        # jobs, total_jobs, total_applications, jobs_with_applicants
+        **stats,
     }
     return render(request, "jobs/recruiter_dashboard.html", context)
 
 
 @login_required
 def recruiter_applicants_map(request):
-    # Get all applications
-    applications = Application.objects.filter(job__employer=request.user).order_by(
-        "-applied_at"
-    )
-    print("applications:", applications)  # Debugging line
-    # Collect applicants with valid zip codes
-    applicants = []
-    for app in applications:
-        profile = getattr(app.applicant, "profile", None)
-        if profile and profile.latitude and profile.longitude:
-            applicants.append(
-                {
-                    "username": app.applicant.username,
-                    "lat": profile.latitude,
-                    "lng": profile.longitude,
-                }
-            )
-    print("applicants:", applicants)  # Debugging line
-    
-    # Group applicants by location (latitude, longitude rounded to avoid floating point issues)
-    location_counts = {}
-    for applicant in applicants:
-        # Round to 4 decimal places (approximately 11 meters precision)
-        key = (round(applicant['lat'], 4), round(applicant['lng'], 4))
-        if key not in location_counts:
-            location_counts[key] = {'count': 0, 'applicants': []}
-        location_counts[key]['count'] += 1
-        location_counts[key]['applicants'].append(applicant['username'])
-    
+    """Map of where this recruiter's applicants are, one marker per location"""
     return render(
         request,
         "jobs/recruiter_applicants_map.html",
-        {
-            "applicants": applicants,
-            "location_counts": location_counts,
-        },
+        {"location_counts": applicant_locations(request.user)},
     )
 
 
@@ -634,15 +642,19 @@ def user_dashboard(request):
         return redirect("recruiter_dashboard")
 
     # Get user's applications
-    applications = Application.objects.filter(applicant=request.user).order_by(
-        "-applied_at"
+    applications = (
+        Application.objects.filter(applicant=request.user)
+        .with_candidate()
+        .order_by("-applied_at")
     )
 
     # Get recent messages
-    recent_messages = Message.objects.filter(recipient=request.user).order_by(
-        "-sent_at"
-    )[:5]
-    unread_count = Message.objects.filter(recipient=request.user, is_read=False).count()
+    recent_messages = (
+        Message.objects.filter(recipient=request.user)
+        .with_parties()
+        .order_by("-sent_at")[:5]
+    )
+    unread_count = get_notification_counts(request)["unread_messages"]
 
     # Get job recommendations
     profile = request.user.profile
@@ -709,7 +721,7 @@ def send_message(request, application_id=None):
     candidate = None
 
     if application_id:
-        application = get_object_or_404(Application, id=application_id)
+        application = get_object_or_404(Application.objects.with_candidate(), id=application_id)
         # Verify the recruiter has access to this application
         if application.job.employer != request.user:
             messages.error(
@@ -752,38 +764,30 @@ def send_message(request, application_id=None):
                         f"Re: Your application for {application.job.title}"
                     )
 
-            # Save the message first
-            message.save()
-
-            # NEW: Send email if checkbox is checked
             send_email = request.POST.get("send_email", False)
             recipient_name = (
                 message.recipient.get_full_name() or message.recipient.username
             )
 
-            if send_email and candidate.email:
-                # Import the email utility function
-                from .utils import send_candidate_email
-
-                email_success, email_message = send_candidate_email(message)
+            # Save the message and queue its email together; the
+            # send_outbox_emails worker delivers it outside the request
+            with transaction.atomic():
+                message.save()
+                if send_email and candidate.email:
+                    enqueue_candidate_email(message)
 
-                if email_success:
-                    messages.success(
-                        request,
-                        f"Message sent and email delivered to {candidate.email}!",
-                    )
-                else:
-                    messages.warning(
-                        request, f"Message saved but email failed: {email_message}"
-                    )
+            if send_email and candidate.email:
+                messages.success(
+                    request,
+                    f"Message sent! Email to {candidate.email} is queued for delivery.",
+                )
+            elif send_email:
+                messages.warning(
+                    request,
+                    f"Message sent to {recipient_name}! (No email sent - candidate has no email address)",
+                )
             else:
-                if send_email and not candidate.email:
-                    messages.warning(
-                        request,
-                        f"Message sent to {recipient_name}! (No email sent - candidate has no email address)",
-                    )
-                else:
-                    messages.success(request, f"Message sent to {recipient_name}!")
+                messages.success(request, f"Message sent to {recipient_name}!")
 
             return redirect("sent_messages")
     else:
@@ -836,48 +840,121 @@ def select_candidate(request):
         messages.error(request, "Only recruiters can send messages.")
         return redirect("user_dashboard")
 
-    # Get all unique candidates who applied to this recruiter's jobs
-    candidates = User.objects.filter(
-        job_applications__job__employer=request.user
-    ).distinct()
+    # One row per candidate who applied to this recruiter's jobs. The count
+    # is constrained by the same join as the filter, so it only counts
+    # applications to this recruiter's jobs.
+    candidates = (
+        User.objects.filter(job_applications__job__employer=request.user)
+        .annotate(
+            application_count=Count("job_applications"),
+            last_applied_at=Max("job_applications__applied_at"),
+        )
+        .order_by("-last_applied_at", "id")
+    )
 
-    # Get application counts for each candidate
-    candidate_data = []
-    for candidate in candidates:
-        applications = Application.objects.filter(
-            applicant=candidate, job__employer=request.user
+    query = request.GET.get("q", "").strip()
+    if query:
+        candidates = candidates.filter(
+            Q(username__icontains=query)
+            | Q(first_name__icontains=query)
+            | Q(last_name__icontains=query)
+            | Q(profile__skills__icontains=query)
         )
-        candidate_data.append(
-            {
-                "candidate": candidate,
-                "applications": applications,
-                "application_count": applications.count(),
-            }
+
+    # The two latest applications per candidate on the page, in one query
+    candidates = candidates.prefetch_related(
+        Prefetch(
+            "job_applications",
+            queryset=Application.objects.filter(job__employer=request.user)
+            .select_related("job")
+            .order_by("-applied_at")[:2],
+            to_attr="recent_applications",
         )
+    )
+    page = Paginator(candidates, CANDIDATES_PER_PAGE).get_page(request.GET.get("page"))
 
     context = {
-        "candidates": candidate_data,
+        "candidates": page.object_list,
+        "page": page,
+        "query": query,
     }
     return render(request, "jobs/select_candidate.html", context)
 
 
+@login_required
+def search_resumes(request):
+    """
+    Search the text of resumes sent to the recruiter's jobs. The text was
+    extracted ahead of time by extract_resumes, so no PDF is opened here.
+    """
+    if (
+        not hasattr(request.user, "profile")
+        or request.user.profile.user_type != "recruiter"
+    ):
+        messages.error(request, "Only recruiters can search resumes.")
+        return redirect("user_dashboard")
+
+    query = request.GET.get("q", "").strip()
+    page = None
+    if query:
+        page = Paginator(
+            ResumeSearchResults(request.user, query), RESUMES_PER_PAGE
+        ).get_page(request.GET.get("page"))
+    return render(request, "jobs/resume_search.html", {"query": query, "results_page": page})
+
+
+def message_search_context(request, sent=None):
+    """Context for ?q= on inbox and sent_messages: one page of ranked matches"""
+    query = request.GET.get("q", "").strip()
+    page = Paginator(
+        MessageSearchResults(request.user, query, sent=sent), MESSAGES_PER_PAGE
+    ).get_page(request.GET.get("page"))
+    return {"query": query, "results_page": page}
+
+
 @login_required
 def inbox(request):
-    """View received messages"""
-    user_messages = Message.objects.filter(recipient=request.user).order_by("-sent_at")
-    unread_count = user_messages.filter(is_read=False).count()
+    """View the user's conversations, newest activity first, or search them"""
+    if request.GET.get("q", "").strip():
+        context = message_search_context(request)
+        return render(request, "jobs/inbox.html", context)
+
+    # One query: each thread row carries its last message and an unread flag
+    threads = list(
+        Thread.objects.filter(participants=request.user)
+        .select_related(
+            "last_message__sender__profile", "application__job"
+        )
+        .annotate(
+            has_unread=Exists(
+                Message.objects.filter(
+                    thread=OuterRef("pk"), recipient=request.user, is_read=False
+                )
+            )
+        )
+        .order_by("-last_message_at")
+    )
 
-    # Mark messages as read when viewing inbox
-    user_messages.filter(is_read=False).update(is_read=True)
+    # Mark messages as read when viewing inbox; the rows changed are the unread count
+    unread_count = Message.objects.filter(
+        recipient=request.user, is_read=False
+    ).update(is_read=True)
+    change_count("unread_messages", -unread_count, user_id=request.user.id)
 
-    context = {"user_messages": user_messages, "unread_count": unread_count}
+    context = {"threads": threads, "unread_count": unread_count}
     return render(request, "jobs/inbox.html", context)
 
 
 @login_required
 def sent_messages(request):
-    """View sent messages"""
-    sent_messages = Message.objects.filter(sender=request.user).order_by("-sent_at")
+    """View sent messages, or search them"""
+    if request.GET.get("q", "").strip():
+        context = message_search_context(request, sent=True)
+        return render(request, "jobs/sent_messages.html", context)
+
+    sent_messages = (
+        Message.objects.filter(sender=request.user).with_parties().order_by("-sent_at")
+    )
 
     context = {"sent_messages": sent_messages}
     return render(request, "jobs/sent_messages.html", context)
@@ -885,8 +962,8 @@ def sent_messages(request):
 
 @login_required
 def message_detail(request, message_id):
-    """View a specific message"""
-    message = get_object_or_404(Message, id=message_id)
+    """View a specific message, reading through to the archive for old ones"""
+    message, archived = get_message_or_archived(message_id)
 
     # Verify user has permission to view this message
     if message.recipient != request.user and message.sender != request.user:
@@ -895,17 +972,39 @@ def message_detail(request, message_id):
 
     # Mark as read if recipient is viewing
     if message.recipient == request.user and not message.is_read:
+        # Conditional so a concurrent read cannot uncount the message twice
+        if Message.objects.filter(id=message.id, is_read=False).update(is_read=True):
+            change_count("unread_messages", -1, user_id=request.user.id)
         message.is_read = True
-        message.save()
 
-    context = {"message": message}
+    # The rest of the conversation, read in (thread, sent_at) index order
+    thread_messages = (
+        Message.objects.filter(thread_id=message.thread_id)
+        .exclude(id=message.id)
+        .with_parties()
+        .order_by("sent_at")
+    )
+
+    parent_message = None
+    if message.parent_id:
+        try:
+            parent_message, _ = get_message_or_archived(message.parent_id)
+        except Http404:
+            pass
+
+    context = {
+        "message": message,
+        "archived": archived,
+        "parent_message": parent_message,
+        "thread_messages": thread_messages,
+    }
     return render(request, "jobs/message_detail.html", context)
 
 
 @login_required
 def reply_message(request, message_id):
     """Reply to a message"""
-    original_message = get_object_or_404(Message, id=message_id)
+    original_message = get_object_or_404(Message.objects.with_parties(), id=message_id)
 
     if original_message.recipient != request.user:
         messages.error(request, "You can only reply to messages sent to you.")
@@ -918,6 +1017,9 @@ def reply_message(request, message_id):
             message.sender = request.user
             message.recipient = original_message.sender
             message.application = original_message.application
+            # Joins the original's thread; the original is shown from there, not quoted
+            message.parent = original_message
+            message.thread_id = original_message.thread_id
             message.save()
 
             messages.success(request, "Reply sent successfully!")
@@ -926,8 +1028,9 @@ def reply_message(request, message_id):
         # Pre-fill the form with reply information
         form = MessageForm(
             initial={
-                "subject": f"Re: {original_message.subject}",
-                "content": f"\n\n--- Original Message ---\nFrom: {original_message.sender.get_full_name() or original_message.sender.username}\nSent: {original_message.sent_at.strftime('%Y-%m-%d %H:%M')}\n\n{original_message.content}",
+                "subject": original_message.subject
+                if original_message.subject.startswith("Re:")
+                else f"Re: {original_message.subject}",
                 "message_type": "application",
             }
         )
@@ -943,25 +1046,46 @@ def reply_message(request, message_id):
 @login_required
 def view_application(request, application_id):
     """View application details (for recruiters)"""
-    application = get_object_or_404(Application, id=application_id)
+    application = get_object_or_404(Application.objects.with_candidate(), id=application_id)
 
     # Verify the employer has access to this application
     if application.job.employer != request.user and not request.user.is_superuser:
         messages.error(request, "You do not have permission to view this application.")
         return redirect("recruiter_dashboard")
 
-    # Get messages related to this application
-    application_messages = Message.objects.filter(application=application).order_by(
-        "sent_at"
-    )  # CHANGED variable name
+    # One row per conversation about this application, with its latest message
+    application_threads = (
+        application.threads.select_related(
+            "last_message__sender", "last_message__recipient"
+        )
+        .annotate(message_count=Count("messages"))
+        .order_by("-last_message_at")
+    )
 
     context = {
         "application": application,
-        "application_messages": application_messages,  # CHANGED from 'messages'
+        "application_threads": application_threads,
     }
     return render(request, "jobs/view_application.html", context)
 
 
+@login_required
+def download_resume(request, application_id):
+    """Serve an application's resume to the job's recruiter or the applicant"""
+    application = get_object_or_404(Application.objects.select_related("applicant", "job"), id=application_id)
+    if (
+        request.user.id not in (application.applicant_id, application.job.employer_id)
+        and not request.user.is_superuser
+    ):
+        raise PermissionDenied
+    if not application.resume:
+        raise Http404("This application has no resume.")
+
+    extension = os.path.splitext(application.resume.name)[1]
+    filename = f"{application.applicant.username}-resume{extension}"
+    return serve_resume(request, application.resume, filename)
+
+
 @login_required
 def dashboard(request):
     """Universal dashboard that redirects based on user type"""
@@ -1066,68 +1190,233 @@ def recruiter_job_list(request):
 @require_http_methods(["POST"])
 def move_applicant(request, applicant_id):
     """Move applicant to a new stage via AJAX"""
-    print(f"=== MOVE APPLICANT REQUEST ===")
-    print(f"Applicant ID: {applicant_id}")
-    print(f"User: {request.user}")
-    print(f"POST data: {request.POST}")
+    # One joined query loads the applicant, its stage and the owning job
+    pipeline_applicant = (
+        ApplicantPipeline.objects.select_related('current_stage__job')
+        .filter(application_id=applicant_id)
+        .first()
+    )
+    if pipeline_applicant is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Applicant not found'
+        }, status=404)
     
-    try:
-        pipeline_applicant = get_object_or_404(
-            ApplicantPipeline, 
-            application_id=applicant_id
-        )
-        
-        print(f"Found applicant: {pipeline_applicant}")
-        print(f"Current stage: {pipeline_applicant.current_stage.name}")
-        print(f"Job employer: {pipeline_applicant.current_stage.job.employer}")
-        
-        # Verify the user owns the job
-        if pipeline_applicant.current_stage.job.employer != request.user:
-            print("PERMISSION DENIED: User doesn't own this job")
-            return JsonResponse({
-                'success': False,
-                'message': 'Permission denied'
-            }, status=403)
-        
-        new_stage_id = request.POST.get('new_stage_id')
-        print(f"New stage ID: {new_stage_id}")
-        
-        new_stage = get_object_or_404(
-            PipelineStage, 
-            id=new_stage_id,
-            job=pipeline_applicant.current_stage.job
+    job = pipeline_applicant.current_stage.job
+    
+    # Verify the user owns the job
+    if job.employer_id != request.user.id:
+        logger.warning(
+            "pipeline.move denied application=%s user=%s",
+            applicant_id, request.user.id,
         )
-        
-        print(f"New stage: {new_stage.name}")
-        
-        # Create transition record
-        PipelineTransition.objects.create(
-            applicant_pipeline=pipeline_applicant,
-            from_stage=pipeline_applicant.current_stage,
-            to_stage=new_stage,
-            moved_by=request.user
+        return JsonResponse({
+            'success': False,
+            'message': 'Permission denied'
+        }, status=403)
+    
+    new_stage_id = request.POST.get('new_stage_id', '')
+    new_stage = PipelineStage.objects.filter(
+        id=int(new_stage_id),
+        job_id=job.id,
+    ).first() if new_stage_id.isdigit() else None
+    if new_stage is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid stage'
+        }, status=400)
+    
+    expected_version = request.POST.get('version')
+    expected_version = int(expected_version) if expected_version and expected_version.isdigit() else None
+    
+    old_stage_id = pipeline_applicant.current_stage_id
+    if not move_applicant_to_stage(pipeline_applicant, new_stage, request.user, expected_version):
+        logger.info(
+            "pipeline.move conflict application=%s expected_version=%s user=%s",
+            applicant_id, expected_version, request.user.id,
         )
-        
-        # Move the applicant
-        old_stage = pipeline_applicant.current_stage
-        pipeline_applicant.move_to_stage(new_stage)
-        
-        print(f"SUCCESS: Moved from {old_stage.name} to {new_stage.name}")
-        
         return JsonResponse({
-            'success': True,
-            'message': 'Applicant moved successfully',
-            'new_stage_name': new_stage.name
-        })
-        
-    except Exception as e:
-        print(f"ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+            'success': False,
+            'message': 'This applicant was moved by someone else. The board has been refreshed.',
+            'conflict': True
+        }, status=409)
+    
+    logger.info(
+        "pipeline.move application=%s job=%s from_stage=%s to_stage=%s version=%s user=%s",
+        applicant_id, job.id, old_stage_id, new_stage.id,
+        pipeline_applicant.version, request.user.id,
+    )
+    
+    return JsonResponse({
+        'success': True,
+        'message': 'Applicant moved successfully',
+        'new_stage_name': new_stage.name,
+        'version': pipeline_applicant.version
+    })
+
+
+PIPELINE_EVENTS_KEEPALIVE_SECONDS = 15
+
+
+async def pipeline_events(request, pk):
+    """
+    Server-Sent Events stream of board changes for a job. Answers 204,
+    which tells EventSource not to reconnect, unless PIPELINE_EVENTS_ENABLED
+    is set and the site is served over ASGI.
+    """
+    user = await request.auser()
+    if not user.is_authenticated or not await Job.objects.filter(pk=pk, employer=user).aexists():
         return JsonResponse({
             'success': False,
-            'message': str(e)
+            'message': 'Permission denied'
+        }, status=403)
+    if not pipeline_events_enabled(request):
+        return HttpResponse(status=204)
+    
+    response = StreamingHttpResponse(
+        _pipeline_event_stream(pk), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
+
+
+async def _pipeline_event_stream(job_id):
+    yield "retry: 5000\n\n"
+    async with get_broker().subscribe(job_id) as events:
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    events.get(), timeout=PIPELINE_EVENTS_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_move_applicants(request, pk):
+    """Move (or reject) many applicants of a job to one stage via AJAX"""
+    application_ids = [
+        int(application_id)
+        for application_id in request.POST.getlist('application_ids')
+        if application_id.isdigit()
+    ]
+    if not application_ids:
+        return JsonResponse({
+            'success': False,
+            'message': 'No applicants selected'
+        }, status=400)
+    
+    new_stage_id = request.POST.get('new_stage_id', '')
+    if not new_stage_id.isdigit():
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid stage'
         }, status=400)
+    
+    # One query checks both the target stage and that the user owns the job
+    new_stage = PipelineStage.objects.filter(
+        id=int(new_stage_id),
+        job_id=pk,
+        job__employer=request.user,
+    ).first()
+    if new_stage is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Permission denied'
+        }, status=403)
+    
+    moved_count = move_applicants_to_stage(new_stage, application_ids, request.user)
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'{moved_count} applicant(s) moved successfully',
+        'moved_count': moved_count,
+        'new_stage_name': new_stage.name
+    })
+
+
+@login_required
+def bulk_send_messages(request, pk):
+    """Send one mail-merged message to many applicants of a job"""
+    job = get_object_or_404(Job, pk=pk)
+    
+    if job.employer_id != request.user.id:
+        raise PermissionDenied("You don't have permission to message these applicants")
+    
+    applications = (
+        Application.objects.filter(job=job)
+        .with_candidate()
+        .order_by("-applied_at")
+    )
+    selected_ids = {
+        int(application_id)
+        for application_id in request.POST.getlist("application_ids")
+        or request.GET.getlist("application_ids")
+        if application_id.isdigit()
+    }
+    
+    if request.method == "POST":
+        form = MessageForm(request.POST)
+        if not selected_ids:
+            messages.error(request, "Select at least one applicant to message.")
+        elif form.is_valid():
+            selected = [app for app in applications if app.id in selected_ids]
+            sent, emailed = compose_bulk_messages(
+                request.user,
+                selected,
+                form.cleaned_data["subject"],
+                form.cleaned_data["content"],
+                form.cleaned_data["message_type"],
+                send_email=bool(request.POST.get("send_email")),
+            )
+            if emailed:
+                messages.success(
+                    request,
+                    f"Message sent to {len(sent)} applicant(s); {emailed} email(s) queued for delivery.",
+                )
+            else:
+                messages.success(request, f"Message sent to {len(sent)} applicant(s)!")
+            return redirect("sent_messages")
+    else:
+        form = MessageForm(initial={"message_type": "application"})
+    
+    context = {
+        "job": job,
+        "form": form,
+        "applications": applications,
+        "selected_ids": selected_ids,
+        "merge_fields": MERGE_FIELDS,
+        "has_email_setup": (
+            hasattr(request.user, "profile") and request.user.profile.has_email_setup
+        ),
+    }
+    return render(request, "jobs/bulk_send_message.html", context)
+
+
+@login_required
+def pipeline_analytics(request, pk):
+    """Funnel conversion and time-in-stage for a job, read from the daily rollups"""
+    job = get_object_or_404(Job, pk=pk)
+    
+    if job.employer_id != request.user.id:
+        raise PermissionDenied("You don't have permission to view this pipeline")
+    
+    days = request.GET.get("days", "")
+    since = None
+    if days.isdigit():
+        since = timezone.localdate() - timedelta(days=int(days))
+    
+    context = {
+        "job": job,
+        "funnel": build_stage_funnel(job, since=since),
+        "selected_days": days,
+        "day_options": [("7", "Last 7 days"), ("30", "Last 30 days"), ("90", "Last 90 days")],
+    }
+    return render(request, "jobs/pipeline_analytics.html", context)
 
 
 @login_required
@@ -2,6 +2,8 @@
 ASGI config for jobsite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the site through this entry point so the pipeline board's live
+update stream (an async view) doesn't tie up a worker per connection.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -65,6 +65,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'accounts.context_processors.notifications',
             ],
         },
     },
@@ -146,6 +147,54 @@ EMAIL_HOST_USER = 'platform-dummy@gmail.com'  # This won't be used for recruiter
 EMAIL_HOST_PASSWORD = 'dummy-password'        # This won't be used for recruiter emails
 DEFAULT_FROM_EMAIL = 'Jobify <noreply@jobify.com>'
 
+# ============================================================================
+# CACHE
+# ============================================================================
+
+# Shared by every worker process, so when a signal in one process drops a
+# recruiter's cached dashboard the others stop serving it too. The table is
+# created by `migrate` (jobs migration 0022_cache_table).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'jobify_cache',
+    }
+}
+
+# ============================================================================
+# PIPELINE LIVE UPDATES (Server-Sent Events)
+# ============================================================================
+
+# The board's event stream is an open-ended async view. Turn it on only when
+# the site is served through jobsite.asgi (e.g. `uvicorn jobsite.asgi:application`);
+# under WSGI each open board would hold a worker thread, so the stream stays
+# off there regardless and boards poll the JSON endpoint every
+# PIPELINE_POLL_SECONDS instead. The in-memory backend only reaches boards
+# connected to the same process; swap in a shared backend when running
+# several worker processes.
+PIPELINE_EVENTS_ENABLED = False
+PIPELINE_EVENTS_BACKEND = 'jobs.events.InMemoryBackend'
+PIPELINE_POLL_SECONDS = 30
+
+# ============================================================================
+# MESSAGE ARCHIVAL
+# ============================================================================
+
+# `manage.py archive_messages` moves read messages older than this into
+# ArchivedMessage; message_detail still finds them by id
+MESSAGE_ARCHIVE_AFTER_DAYS = 365
+
+# ============================================================================
+# RESUME DOWNLOADS
+# ============================================================================
+
+# Hand resume transfers to the front-end server instead of streaming them
+# through Django: 'x-sendfile' (Apache/lighttpd) or 'x-accel-redirect'
+# (nginx). None streams from Django with Range support.
+RESUME_SENDFILE = None
+# With 'x-accel-redirect': an nginx `internal` location aliased to MEDIA_ROOT
+RESUME_ACCEL_PREFIX = '/protected-media/'
+
 # ============================================================================
 
 # Production settings for PythonAnywhere